@@ -0,0 +1,267 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Pattern, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.metrics import ADMISSION_REJECTED, ADMISSION_WAIT
+
+# "false" admits every request straight away
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+# Memory all admitted requests together may use, 0 for a share of the
+# container's (or machine's) memory
+ADMISSION_MEMORY_BUDGET_MB = int(os.getenv("ADMISSION_MEMORY_BUDGET_MB", "0"))
+ADMISSION_MEMORY_FRACTION = 0.75
+# Longest Retry-After sent with a 429
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+def available_memory() -> int:
+    """
+    Bytes of memory this process may use: the cgroup v2 memory limit when
+    running in a container, otherwise the machine's memory
+    """
+    memory = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            memory = min(memory, int(limit))
+    except (OSError, ValueError):
+        pass
+    return memory
+
+
+def default_memory_budget() -> int:
+    return int(available_memory() * ADMISSION_MEMORY_FRACTION)
+
+
+@dataclass
+class AdmissionClass:
+    """
+    A kind of request, with how many may run at once, how much memory each
+    is assumed to need, and how many may wait (and for how long) when it's full
+    """
+    name: str
+    concurrency: int
+    memory_bytes: int
+    max_waiting: int
+    timeout: float
+    active: int = 0
+    waiting: Deque[asyncio.Future] = field(default_factory=deque)
+    rejected: int = 0
+    # Moving average of how long requests hold their slot, for Retry-After
+    average_seconds: float = 1.0
+
+
+def _admission_class(name: str, concurrency: int, memory_mb: int, max_waiting: int, timeout: float) -> AdmissionClass:
+    """
+    A class with its defaults overridden by ADMISSION_<NAME>_CONCURRENCY,
+    _MEMORY_MB, _MAX_WAITING and _TIMEOUT_SECONDS
+    """
+    prefix = f"ADMISSION_{name.upper()}_"
+    return AdmissionClass(
+        name=name,
+        concurrency=max(1, int(os.getenv(prefix + "CONCURRENCY", str(concurrency)))),
+        memory_bytes=int(os.getenv(prefix + "MEMORY_MB", str(memory_mb))) * 1024 ** 2,
+        max_waiting=int(os.getenv(prefix + "MAX_WAITING", str(max_waiting))),
+        timeout=float(os.getenv(prefix + "TIMEOUT_SECONDS", str(timeout)))
+    )
+
+
+# Requests that stream a video to disk, that decode one, and that page
+# through the database
+ADMISSION_CLASSES = [
+    _admission_class("uploads", concurrency=8, memory_mb=32, max_waiting=64, timeout=30),
+    _admission_class("processing", concurrency=4, memory_mb=512, max_waiting=16, timeout=30),
+    _admission_class("listing", concurrency=32, memory_mb=8, max_waiting=128, timeout=10)
+]
+
+# (method, path) patterns of each class; other requests aren't limited
+ADMISSION_ROUTES: List[Tuple[str, str, str]] = [
+    ("POST", r"/api/recordings/?", "uploads"),
+    ("PUT", r"/api/recordings/uploads/[^/]+/chunks/\d+", "uploads"),
+    ("POST", r"/api/recordings/uploads/[^/]+/complete", "uploads"),
+    ("POST", r"/api/video-processing/\d+/(process|summary)", "processing"),
+    ("POST", r"/api/video-processing/batch", "processing"),
+    ("GET", r"/api/video-processing/\d+/(frames|motion)", "processing"),
+    ("GET", r"/api/recordings/?", "listing"),
+    ("GET", r"/api/recordings/storage/stats", "listing"),
+    ("GET", r"/api/candidates/?", "listing")
+]
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, admission_class: str, reason: str, retry_after: int):
+        super().__init__(f"{admission_class} requests are saturated ({reason})")
+        self.admission_class = admission_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits how many requests of each class run at once and how much memory
+    they may use together.
+
+    A request that doesn't fit waits in its class's queue, first come first
+    served, until one finishes. If the queue is full, or it waits longer than
+    the class's timeout, it's rejected with a Retry-After estimated from how
+    long requests of the class take, so the service sheds load instead of
+    running out of memory. A request needing more than the whole budget is
+    still admitted when nothing else runs.
+    """
+
+    def __init__(self, classes: List[AdmissionClass], memory_budget: int):
+        self.classes = {admission_class.name: admission_class for admission_class in classes}
+        self.memory_budget = memory_budget
+        self.memory_in_use = 0
+
+    def _fits(self, admission_class: AdmissionClass) -> bool:
+        if admission_class.active >= admission_class.concurrency:
+            return False
+        return not self.memory_in_use or self.memory_in_use + admission_class.memory_bytes <= self.memory_budget
+
+    def _grant(self, admission_class: AdmissionClass) -> None:
+        admission_class.active += 1
+        self.memory_in_use += admission_class.memory_bytes
+
+    def _release(self, admission_class: AdmissionClass) -> None:
+        admission_class.active -= 1
+        self.memory_in_use -= admission_class.memory_bytes
+        self._admit_waiting()
+
+    def _admit_waiting(self) -> None:
+        """
+        Admit waiting requests, in order within each class, while they fit
+        """
+        for admission_class in self.classes.values():
+            while admission_class.waiting and self._fits(admission_class):
+                waiter = admission_class.waiting.popleft()
+                if waiter.done():
+                    continue
+                self._grant(admission_class)
+                waiter.set_result(None)
+
+    def _retry_after(self, admission_class: AdmissionClass) -> int:
+        """
+        Seconds until the requests ahead are likely to have finished
+        """
+        ahead = (len(admission_class.waiting) + 1) / admission_class.concurrency
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(admission_class.average_seconds * ahead)))
+
+    def _reject(self, admission_class: AdmissionClass, reason: str) -> AdmissionRejected:
+        admission_class.rejected += 1
+        ADMISSION_REJECTED.labels(admission_class.name, reason).inc()
+        return AdmissionRejected(admission_class.name, reason, self._retry_after(admission_class))
+
+    async def _wait(self, admission_class: AdmissionClass) -> None:
+        if len(admission_class.waiting) >= admission_class.max_waiting:
+            raise self._reject(admission_class, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        admission_class.waiting.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, admission_class.timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as it gave up
+                self._release(admission_class)
+            else:
+                waiter.cancel()
+                if waiter in admission_class.waiting:
+                    admission_class.waiting.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(admission_class, "timeout") from None
+            raise
+        finally:
+            ADMISSION_WAIT.labels(admission_class.name).observe(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def admit(self, name: str) -> AsyncIterator[None]:
+        """
+        Hold a slot of the named class, waiting for one if needed; raises
+        AdmissionRejected if none frees up in time
+        """
+        admission_class = self.classes[name]
+        if not admission_class.waiting and self._fits(admission_class):
+            self._grant(admission_class)
+        else:
+            await self._wait(admission_class)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            admission_class.average_seconds = 0.8 * admission_class.average_seconds + 0.2 * elapsed
+            self._release(admission_class)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Admitted, waiting and rejected requests per class, and memory reserved
+        """
+        stats: Dict[str, Any] = {
+            'memory_bytes': self.memory_in_use,
+            'memory_budget_bytes': self.memory_budget
+        }
+        for name, admission_class in self.classes.items():
+            stats[f'{name}_active'] = admission_class.active
+            stats[f'{name}_waiting'] = len(admission_class.waiting)
+            stats[f'{name}_rejected'] = admission_class.rejected
+        return stats
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting requests through the AdmissionController
+    before their body is read, and holding the slot until the response,
+    including background tasks, is done
+    """
+
+    def __init__(self, app, controller: "AdmissionController", routes: List[Tuple[str, str, str]] = ADMISSION_ROUTES):
+        self.app = app
+        self.controller = controller
+        self.routes: List[Tuple[str, Pattern, str]] = [
+            (method, re.compile(pattern), name) for method, pattern, name in routes
+        ]
+
+    def _classify(self, method: str, path: str) -> Optional[str]:
+        for route_method, pattern, name in self.routes:
+            if method == route_method and pattern.fullmatch(path):
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not ADMISSION_CONTROL or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = self._classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with self.controller.admit(name):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": f"Too many {e.admission_class} requests, retry later"},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+
+
+# Global instance
+admission_controller = AdmissionController(
+    ADMISSION_CLASSES, (ADMISSION_MEMORY_BUDGET_MB * 1024 ** 2) or default_memory_budget()
+)
@@ -3,6 +3,7 @@ from typing import Any, AsyncIterator
 from dotenv import load_dotenv
 
 import os
+import time
 
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
@@ -12,6 +13,8 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase
 
+from app.metrics import DB_POOL_CHECKED_OUT, DB_POOL_WAIT
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -27,6 +30,13 @@ class DatabaseSessionManager:
     def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
         self._engine = create_async_engine(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine, expire_on_commit=False)
+        DB_POOL_CHECKED_OUT.set_function(self._checked_out_connections)
+
+    def _checked_out_connections(self) -> int:
+        if self._engine is None:
+            return 0
+        checkedout = getattr(self._engine.pool, "checkedout", None)
+        return checkedout() if checkedout is not None else 0
 
     async def close(self):
         if self._engine is None:
@@ -64,6 +74,10 @@ class DatabaseSessionManager:
 
         session = self._sessionmaker()
         try:
+            # Check the connection out up front to measure how long the pool made us wait
+            start = time.perf_counter()
+            await session.connection()
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
             yield session
         except Exception:
             await session.rollback()
@@ -72,7 +86,9 @@ class DatabaseSessionManager:
             await session.close()
 
 
-session_manager = DatabaseSessionManager(DATABASE_URL, {"echo": True})
+# SQL statements are logged through the logging pipeline when
+# LOG_LEVELS includes sqlalchemy.engine=INFO, rather than with echo
+session_manager = DatabaseSessionManager(DATABASE_URL)
 
 
 async def get_db_session():
@@ -1,5 +1,5 @@
 from app.data.database import Base
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, func
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String, func
 from typing import Literal
 from datetime import datetime
 from pydantic import BaseModel
@@ -10,12 +10,21 @@ class Recording(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     filename = Column(String, index=True)
-    fileSize = Column(Integer, index=True)
+    # Chunked uploads can be larger than 2 GiB
+    fileSize = Column(BigInteger, index=True)
     duration = Column(Integer, index=True)
     format = Column(String, index=True)
     createdAt = Column(DateTime, default=func.now())
     hasAudio = Column(Boolean, index=True)
     thumbnailUrl = Column(String, index=True)
+    # Media details extracted server-side from the uploaded container
+    durationMs = Column(Integer)
+    width = Column(Integer)
+    height = Column(Integer)
+    videoCodec = Column(String)
+    audioCodec = Column(String)
+    # SHA-256 of the file; recordings with the same content share one object
+    contentHash = Column(String, index=True)
 
 class RecordingBaseDto(BaseModel):
     title: str
@@ -26,7 +35,16 @@ class RecordingBaseDto(BaseModel):
     hasAudio: bool
     thumbnailUrl: str | None
 
-class InsertRecordingDto(RecordingBaseDto):
+class StoredRecordingDto(RecordingBaseDto):
+    # Derived by the server from the stored file, never taken from the client
+    durationMs: int | None = None
+    width: int | None = None
+    height: int | None = None
+    videoCodec: str | None = None
+    audioCodec: str | None = None
+    contentHash: str | None = None
+
+class InsertRecordingDto(StoredRecordingDto):
     pass
 
 class ClientMetadataDto(RecordingBaseDto):
@@ -41,7 +59,7 @@ class RecordingOptionsDto(BaseModel):
     microphoneVolume: int
     format: Literal["mp4", "webm"]
 
-class RecordingResponseDto(RecordingBaseDto):
+class RecordingResponseDto(StoredRecordingDto):
     id: int
     createdAt: datetime
 
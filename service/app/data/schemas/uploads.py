@@ -0,0 +1,56 @@
+from app.data.database import Base
+from app.data.schemas.recordings import ClientMetadataDto
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Integer, String, func
+from typing import Literal
+from datetime import datetime
+from pydantic import BaseModel
+
+UploadStatus = Literal["pending", "composing", "completed", "aborted"]
+
+class UploadSession(Base):
+    """
+    A resumable upload of a recording. Received chunks aren't tracked here;
+    the chunks staged in storage are the record of what has arrived
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True, index=True)
+    # Name the assembled recording will have in GCS
+    filename = Column(String, index=True)
+    fileSize = Column(BigInteger)
+    chunkSize = Column(Integer)
+    chunkCount = Column(Integer)
+    clientMetadata = Column(JSON)
+    status = Column(String, index=True, default="pending")
+    recordingId = Column(Integer, nullable=True)
+    createdAt = Column(DateTime, default=func.now())
+    # When completion started; a request that died while composing leaves
+    # the session in "composing", and it's retried once this is old enough
+    composingSince = Column(DateTime, nullable=True)
+
+class UploadSessionCreateDto(BaseModel):
+    # Name of the file on the client, only its extension is used
+    filename: str
+    fileSize: int
+    chunkSize: int | None = None
+    metadata: ClientMetadataDto
+
+class UploadChunkResponseDto(BaseModel):
+    uploadId: str
+    index: int
+    size: int
+
+class UploadSessionResponseDto(BaseModel):
+    uploadId: str
+    filename: str
+    fileSize: int
+    chunkSize: int
+    chunkCount: int
+    status: UploadStatus
+    receivedChunks: list[int]
+    missingChunks: list[int]
+    receivedBytes: int
+    # Merged, inclusive byte ranges of the file that have been received
+    receivedRanges: list[tuple[int, int]]
+    recordingId: int | None
+    createdAt: datetime
@@ -0,0 +1,20 @@
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+# Kept apart from the video processor so routes can validate requests
+# without importing OpenCV
+VideoOperation = Literal["extract_frames", "detect_motion", "generate_thumbnail", "analyze_content", "extract_audio_info"]
+FrameFormat = Literal["jpg", "webp"]
+
+# What create_video_summary runs
+SUMMARY_OPERATIONS: List[VideoOperation] = ["extract_frames", "detect_motion", "generate_thumbnail", "analyze_content"]
+
+# Most recordings one batch request may process
+MAX_BATCH_RECORDINGS = 500
+
+class BatchProcessingRequestDto(BaseModel):
+    recordingIds: List[int] = Field(min_length=1, max_length=MAX_BATCH_RECORDINGS)
+    # A summary of each recording unless given
+    operations: List[VideoOperation] = Field(default_factory=lambda: list(SUMMARY_OPERATIONS))
+    motionDetail: bool = False
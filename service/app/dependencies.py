@@ -1,15 +1,23 @@
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 from app.data.database import get_db_session
+from app.responses import NegotiatedResponder, get_responder
 from app.services.gcs_service import gcs_service
-from app.services.video_processor import video_processor
+from app.services.video_loader import get_video_processor
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+if TYPE_CHECKING:
+    from app.services.video_processor import VideoProcessor
+
 # Async Database Session Dependency
 DBSessionDep = Annotated[AsyncSession, Depends(get_db_session)]
 
 # Google Cloud Storage Service Dependency
 GCSServiceDep = Annotated[type(gcs_service), Depends(lambda: gcs_service)]
 
-VideoProcessorDep = Annotated[type(video_processor), Depends(lambda: video_processor)]
\ No newline at end of file
+# Loads the video stack on first use; sync, so FastAPI runs it in a thread
+VideoProcessorDep = Annotated["VideoProcessor", Depends(get_video_processor)]
+
+# Encodes responses in the format and compression negotiated with the client
+ResponderDep = Annotated[NegotiatedResponder, Depends(get_responder)]
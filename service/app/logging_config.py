@@ -0,0 +1,171 @@
+import atexit
+import itertools
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+import orjson
+
+from app.metrics import LOG_RECORDS_DROPPED
+
+# Level of every logger not listed in LOG_LEVELS
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-module levels, e.g. "sqlalchemy.engine=INFO,app.services.gcs_service=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "json" for one JSON object per line, "text" for reading in a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Fraction of records below WARNING kept per module, e.g. "uvicorn.access=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Records waiting for the writer thread; more than this are dropped, not waited on
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Attributes every LogRecord has, and uvicorn's colored duplicate of the
+# message; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "color_message"}
+
+_listener: Optional[QueueListener] = None
+
+
+def _parse_settings(value: str) -> Dict[str, str]:
+    """
+    Parse "name=value,name=value" settings
+    """
+    settings = {}
+    for item in value.split(","):
+        name, _, setting = item.strip().partition("=")
+        if name and setting:
+            settings[name.strip()] = setting.strip()
+    return settings
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with the fields passed as extra= alongside
+    the message so they can be queried without parsing it
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fixed fraction of the records below WARNING from high-volume
+    modules. Every n-th record is kept, so the ones that remain are spread
+    evenly rather than clustered
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so "app.services.gcs_service" beats "app"
+        self.intervals = sorted(
+            ((name, max(1, round(1 / rate)) if rate > 0 else 0) for name, rate in rates.items()),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self._counters: Dict[str, itertools.count] = {}
+
+    def _interval(self, name: str) -> Optional[int]:
+        for prefix, interval in self.intervals:
+            if name == prefix or name.startswith(prefix + "."):
+                return interval
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        interval = self._interval(record.name)
+        if interval is None:
+            return True
+        if interval == 0:
+            return False
+        counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % interval == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the writer thread as they are. The message is formatted
+    there too, so a logging call on the request path costs little more than
+    a queue put, and a full queue drops the record instead of blocking
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments are formatted later, in the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a queue to a writer thread, with the levels,
+    format and sampling from the LOG_* settings. Replaces any handlers set up
+    before, including uvicorn's, so every record goes the same way
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    sample_rates = {name: float(rate) for name, rate in _parse_settings(LOG_SAMPLE_RATES).items()}
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL.upper())
+
+    # uvicorn writes its access and error logs with its own handlers
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    for name, level in _parse_settings(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Write out the queued records and stop the writer thread
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
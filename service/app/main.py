@@ -1,14 +1,32 @@
+import asyncio
 import logging
-import sys
-from contextlib import asynccontextmanager
+import threading
+import time
+from contextlib import asynccontextmanager, suppress
 from dotenv import load_dotenv
-import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.admission import AdmissionMiddleware, admission_controller
+from app.logging_config import configure_logging
+from app.metrics import (
+    PROMETHEUS_MULTIPROC_DIR,
+    MetricsMiddleware,
+    mark_worker_stopped,
+    publish_process_metrics,
+    register_stats
+)
 from app.routes.candidates import candidates_router
+from app.routes.metrics import metrics_router
 from app.routes.recordings import recordings_router
+from app.routes.uploads import uploads_router
+from app.routes.video_processing import video_processing_router
 from app.data.database import session_manager
+from app.services.gcs_service import gcs_service
+from app.services.result_cache import result_cache
+from app.services.stream_service import hot_segment_cache
+from app.services.video_cache import video_cache
+from app.services.video_loader import get_video_processor, shutdown_video_processor
 # Import schemas to ensure all models are loaded for table creation
 # from app.data import schemas
 
@@ -18,7 +36,49 @@ load_dotenv()
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(",")
 
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+# Log records are written by a background thread, as JSON by default
+configure_logging()
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_in_daemon_thread(func):
+    """
+    Run a blocking call in a daemon thread. Unlike the default thread pool,
+    which is waited for when the worker stops, a call that hangs doesn't
+    hold up shutdown
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def run():
+        try:
+            outcome = (future.set_result, func())
+        except Exception as e:
+            outcome = (future.set_exception, e)
+        # The loop is closed if the worker stopped in the meantime
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(lambda: future.done() or outcome[0](outcome[1]))
+
+    threading.Thread(target=run, name=f"warm-up-{func.__name__}", daemon=True).start()
+    return await future
+
+
+async def warm_up():
+    """
+    Load the video stack and connect to storage in the background, so
+    startup doesn't wait for them and the first requests rarely do
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        _run_in_daemon_thread(get_video_processor),
+        _run_in_daemon_thread(gcs_service.warm_up),
+        return_exceptions=True
+    )
+    for name, result in zip(("video processing", "storage"), results):
+        if isinstance(result, Exception):
+            logger.error("Failed to warm up %s: %s", name, result)
+    logger.info("Warmed up in %.2fs", time.perf_counter() - start)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -29,8 +89,26 @@ async def lifespan(app: FastAPI):
     # Create database tables on startup
     await session_manager.create_db_and_tables()
     
+    # Services are created lazily; warm them up without delaying startup
+    warm_up_task = asyncio.create_task(warm_up())
+    
+    # With several workers, in-process gauges are shared through files
+    publish_task = asyncio.create_task(publish_process_metrics()) if PROMETHEUS_MULTIPROC_DIR else None
+    
     yield
     
+    # A warm-up still running (e.g. storage unreachable) mustn't hold up shutdown
+    warm_up_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up_task
+    
+    if publish_task is not None:
+        publish_task.cancel()
+    mark_worker_stopped()
+    
+    # Stop video analysis worker processes
+    shutdown_video_processor()
+    
     if session_manager._engine is not None:
         # Close the DB connection
         await session_manager.close()
@@ -38,6 +116,9 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan, title="Delphi Candidate Screen Recording Service", docs_url="/docs")
 
+# Limit concurrent uploads, processing and listing; innermost, so 429s still get CORS headers
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -47,6 +128,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, outermost so it covers the other middleware
+app.add_middleware(MetricsMiddleware)
+
+# Cache effectiveness is exposed alongside the request metrics
+register_stats("video_cache", "Local video cache", video_cache.stats)
+register_stats("stream_cache", "Hot segment stream cache", hot_segment_cache.stats)
+register_stats("result_cache", "Video processing result cache", result_cache.stats)
+register_stats("admission", "Admission control", admission_controller.stats)
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
@@ -55,7 +145,6 @@ async def root():
 # Routers
 app.include_router(candidates_router)
 app.include_router(recordings_router)
-
-
-if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", reload=True, port=8000)
\ No newline at end of file
+app.include_router(uploads_router)
+app.include_router(video_processing_router)
+app.include_router(metrics_router)
\ No newline at end of file
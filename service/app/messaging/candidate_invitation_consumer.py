@@ -1,16 +1,20 @@
 import json
 import logging
+import time
 from datetime import datetime
 import os
 from typing import Optional
 
 from dotenv import load_dotenv
 import pika
+from prometheus_client import start_http_server
 from pydantic import BaseModel
 
 from app.data.database import get_db_session
 from app.data.schemas.assessments import Assessment
 from app.data.schemas.candidates import Candidate
+from app.logging_config import configure_logging
+from app.metrics import CONSUMER_QUEUE_DEPTH, record_consumer_message
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +24,10 @@ RABBITMQ_URL = os.getenv("RABBITMQ_URL")
 CANDIDATE_INVITATION_QUEUE = os.getenv("CANDIDATE_INVITATION_QUEUE")
 CANDIDATE_INVITATION_EXCHANGE = os.getenv("CANDIDATE_INVITATION_EXCHANGE")
 CANDIDATE_INVITATION_ROUTING_KEY = os.getenv("CANDIDATE_INVITATION_ROUTING_KEY")
+# The consumer runs in its own process and serves its metrics on this port
+CONSUMER_METRICS_PORT = int(os.getenv("CONSUMER_METRICS_PORT", "9101"))
+# Minimum time between queue depth lookups
+QUEUE_DEPTH_INTERVAL_SECONDS = 5
 
 if RABBITMQ_URL is None:
     raise Exception("RABBITMQ_URL is not set in the environment variables")
@@ -53,6 +61,7 @@ class CandidateInvitationConsumer:
         self.exchange_name = "candidate.invitation.topic"
         self.queue_name = "candidate.invitation.queue"
         self.routing_key = "topic.candidate.invitation"
+        self._queue_depth_checked_at = 0.0
 
     def connect(self):
         """Establish connection to RabbitMQ"""
@@ -81,10 +90,10 @@ class CandidateInvitationConsumer:
                 routing_key=self.routing_key
             )
             
-            logger.info(f"Connected to RabbitMQ and bound to queue: {self.queue_name}")
+            logger.info("Connected to RabbitMQ and bound to queue: %s", self.queue_name)
             
         except Exception as e:
-            logger.error(f"Failed to connect to RabbitMQ: {e}")
+            logger.error("Failed to connect to RabbitMQ: %s", e)
             raise
 
     def process_message(self, ch, method, properties, body):
@@ -94,7 +103,7 @@ class CandidateInvitationConsumer:
             message_data = json.loads(body.decode('utf-8'))
             message = CandidateInvitationMessage(**message_data)
             
-            logger.info(f"Processing candidate invitation for assessment: {message.assessment_name}")
+            logger.info("Processing candidate invitation for assessment: %s", message.assessment_name)
             
             # Update database
             self.update_database(message)
@@ -102,12 +111,28 @@ class CandidateInvitationConsumer:
             # Acknowledge the message
             ch.basic_ack(delivery_tag=method.delivery_tag)
             
-            logger.info(f"Successfully processed candidate invitation: {message.invitation_id}")
+            logger.info("Successfully processed candidate invitation: %s", message.invitation_id)
+            record_consumer_message("ok")
             
         except Exception as e:
-            logger.error(f"Error processing candidate invitation message: {e}")
+            logger.error("Error processing candidate invitation message: %s", e)
             # Reject the message and requeue it
             ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            record_consumer_message("error")
+        
+        self.update_queue_depth()
+
+    def update_queue_depth(self):
+        """Report the number of messages waiting in the queue, at most every few seconds"""
+        now = time.monotonic()
+        if now - self._queue_depth_checked_at < QUEUE_DEPTH_INTERVAL_SECONDS:
+            return
+        self._queue_depth_checked_at = now
+        try:
+            declared = self.channel.queue_declare(queue=self.queue_name, passive=True)
+            CONSUMER_QUEUE_DEPTH.set(declared.method.message_count)
+        except Exception as e:
+            logger.warning("Could not read depth of queue %s: %s", self.queue_name, e)
 
     def update_database(self, message: CandidateInvitationMessage):
         """Update the database with the candidate invitation information"""
@@ -133,7 +158,7 @@ class CandidateInvitationConsumer:
                         updated_at=datetime.utcnow()
                     )
                     session.add(assessment)
-                    logger.info(f"Created new assessment: {message.assessment_name}")
+                    logger.info("Created new assessment: %s", message.assessment_name)
                 else:
                     # Update existing assessment
                     assessment.name = message.assessment_name
@@ -143,7 +168,7 @@ class CandidateInvitationConsumer:
                     assessment.end_date = datetime.fromisoformat(message.assessment_end_date) if message.assessment_end_date else None
                     assessment.duration = message.assessment_duration
                     assessment.updated_at = datetime.utcnow()
-                    logger.info(f"Updated existing assessment: {message.assessment_name}")
+                    logger.info("Updated existing assessment: %s", message.assessment_name)
 
                 # Check if user exists, if not create it
                 candidate = session.query(Candidate).filter(Candidate.id == message.user_id).first()
@@ -155,13 +180,13 @@ class CandidateInvitationConsumer:
                         updated_at=datetime.utcnow()
                     )
                     session.add(candidate)
-                    logger.info(f"Created new candidate: {message.user_email}")
+                    logger.info("Created new candidate: %s", message.user_email)
 
                 session.commit()
-                logger.info(f"Database updated successfully for invitation: {message.invitation_id}")
+                logger.info("Database updated successfully for invitation: %s", message.invitation_id)
                 
         except Exception as e:
-            logger.error(f"Error updating database: {e}")
+            logger.error("Error updating database: %s", e)
             raise
 
     def start_consuming(self):
@@ -174,6 +199,7 @@ class CandidateInvitationConsumer:
                 on_message_callback=self.process_message
             )
             
+            self.update_queue_depth()
             logger.info("Starting to consume candidate invitation messages...")
             self.channel.start_consuming()
             
@@ -181,7 +207,7 @@ class CandidateInvitationConsumer:
             logger.info("Stopping consumer...")
             self.stop()
         except Exception as e:
-            logger.error(f"Error in consumer: {e}")
+            logger.error("Error in consumer: %s", e)
             self.stop()
 
     def stop(self):
@@ -198,13 +224,15 @@ def main():
     if RABBITMQ_URL is None:
         raise Exception("RABBITMQ_URL is not set in the environment variables")
     
+    configure_logging()
     consumer = CandidateInvitationConsumer(RABBITMQ_URL)
     
     try:
+        start_http_server(CONSUMER_METRICS_PORT)
         consumer.connect()
         consumer.start_consuming()
     except Exception as e:
-        logger.error(f"Failed to start consumer: {e}")
+        logger.error("Failed to start consumer: %s", e)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,285 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Window the in-process *_per_second gauges average over
+RATE_WINDOW_SECONDS = int(os.getenv("METRICS_RATE_WINDOW_SECONDS", "60"))
+# Set by main.py when running several workers: each worker writes its metrics
+# to files in this directory, and /metrics adds up those of all workers
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# How often each worker publishes its in-process gauges to the shared files
+METRICS_PUBLISH_SECONDS = 5
+
+# Requests take milliseconds, video processing takes minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class RateWindow(Collector):
+    """
+    Per-second rate of a counter over the last RATE_WINDOW_SECONDS, by label.
+
+    Exposed as a gauge so rates can be read straight from /metrics, without a
+    Prometheus server computing rate() over the matching counter. Amounts
+    are kept in one-second buckets, so memory doesn't grow with traffic.
+    """
+
+    def __init__(self, name: str, documentation: str, label: str, window: int = RATE_WINDOW_SECONDS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.window = window
+        self._buckets: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._gauge: Optional[Gauge] = None
+
+    def add(self, label_value: str, amount: float) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            buckets = self._buckets.setdefault(label_value, deque())
+            if buckets and buckets[-1][0] == second:
+                buckets[-1][1] += amount
+            else:
+                buckets.append([second, amount])
+            self._trim(buckets, second)
+
+    def _trim(self, buckets: deque, now: int) -> None:
+        while buckets and buckets[0][0] <= now - self.window:
+            buckets.popleft()
+
+    def rates(self) -> Dict[str, float]:
+        now = int(time.monotonic())
+        with self._lock:
+            for buckets in self._buckets.values():
+                self._trim(buckets, now)
+            return {value: sum(amount for _, amount in buckets) / self.window for value, buckets in self._buckets.items()}
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        family = GaugeMetricFamily(self.name, self.documentation, labels=[self.label])
+        for value, rate in self.rates().items():
+            family.add_metric([value], rate)
+        yield family
+
+    def publish(self) -> None:
+        """
+        Write the current rates to a gauge added up across workers
+        """
+        if self._gauge is None:
+            self._gauge = Gauge(self.name, self.documentation, [self.label], registry=None, multiprocess_mode="livesum")
+        for value, rate in self.rates().items():
+            self._gauge.labels(value).set(rate)
+
+
+class StatsCollector(Collector):
+    """
+    Expose the numeric values of a component's stats() dict as gauges
+    """
+
+    def __init__(self, prefix: str, documentation: str, stats: Callable[[], Dict[str, Any]]):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.stats = stats
+        self._gauges: Dict[str, Gauge] = {}
+
+    def _numeric_stats(self) -> Iterable[Tuple[str, float]]:
+        for key, value in self.stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield key, value
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        for key, value in self._numeric_stats():
+            yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.documentation}: {key}", value=value)
+
+    def publish(self) -> None:
+        """
+        Write the stats to gauges added up across workers. Ratios can't be
+        added up and are left out; they follow from the counts
+        """
+        for key, value in self._numeric_stats():
+            if key.endswith("_rate"):
+                continue
+            gauge = self._gauges.get(key)
+            if gauge is None:
+                gauge = self._gauges[key] = Gauge(
+                    f"{self.prefix}_{key}", f"{self.documentation}: {key}", registry=None, multiprocess_mode="livesum"
+                )
+            gauge.set(value)
+
+
+# In-process collectors, published to the shared files when there are several workers
+_PUBLISHED: List[Any] = []
+
+
+def register_stats(prefix: str, documentation: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    collector = StatsCollector(prefix, documentation, stats)
+    REGISTRY.register(collector)
+    _PUBLISHED.append(collector)
+
+
+def _rate_window(name: str, documentation: str, label: str) -> RateWindow:
+    window = RateWindow(name, documentation, label)
+    REGISTRY.register(window)
+    _PUBLISHED.append(window)
+    return window
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Registry /metrics serves: this process's, or with several workers, the
+    metrics of all of them added up
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def publish_process_metrics() -> None:
+    """
+    Keep publishing the in-process gauges while the worker runs; only
+    needed with several workers
+    """
+    while True:
+        for collector in _PUBLISHED:
+            collector.publish()
+        await asyncio.sleep(METRICS_PUBLISH_SECONDS)
+
+
+def mark_worker_stopped() -> None:
+    """
+    Drop a stopping worker's live gauges from the shared metrics; its
+    counters and histograms keep counting towards the totals
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, including sending the body",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled", multiprocess_mode="livesum")
+
+# Google Cloud Storage
+GCS_CALL_DURATION = Histogram(
+    "gcs_call_duration_seconds",
+    "Latency of GoogleCloudStorageService calls",
+    ["method", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+GCS_BYTES = Counter("gcs_bytes", "Bytes transferred to and from GCS", ["method", "direction"])
+GCS_BYTES_RATE = _rate_window("gcs_bytes_per_second", "Bytes per second transferred to and from GCS", "direction")
+
+# Database
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time a session waited to check a connection out of the pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool", multiprocess_mode="livesum"
+)
+
+# Video processing
+VIDEO_FRAMES = Counter("video_frames_decoded", "Frames decoded for frame-by-frame analysis", ["operation"])
+VIDEO_DECODE_SECONDS = Counter("video_decode_seconds", "Wall time of frame-by-frame analysis passes", ["operation"])
+VIDEO_FRAMES_RATE = _rate_window("video_frames_decoded_per_second", "Frames decoded per second for analysis", "operation")
+VIDEO_JOBS_WAITING = Gauge("video_jobs_waiting", "Video jobs queued for a decode slot", multiprocess_mode="livesum")
+VIDEO_JOBS_RUNNING = Gauge("video_jobs_running", "Video jobs holding a decode slot", multiprocess_mode="livesum")
+
+# Admission control
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time a request waited to be admitted, by admission class",
+    ["admission_class"],
+    buckets=LATENCY_BUCKETS
+)
+ADMISSION_REJECTED = Counter("admission_rejected", "Requests rejected with a 429", ["admission_class", "reason"])
+
+# Message consumer
+CONSUMER_MESSAGES = Counter("consumer_messages", "Messages handled by the invitation consumer", ["outcome"])
+CONSUMER_MESSAGES_RATE = _rate_window("consumer_messages_per_second", "Messages per second handled by the invitation consumer", "outcome")
+CONSUMER_QUEUE_DEPTH = Gauge("consumer_queue_depth", "Messages ready in the invitation queue")
+
+# Logging
+LOG_RECORDS_DROPPED = Counter("log_records_dropped", "Log records dropped because the log queue was full")
+
+
+def record_gcs_transfer(method: str, direction: str, size: int) -> None:
+    GCS_BYTES.labels(method, direction).inc(size)
+    GCS_BYTES_RATE.add(direction, size)
+
+
+def timed_gcs_call(func):
+    """
+    Record the latency and outcome of an async GoogleCloudStorageService method
+    """
+    method = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            GCS_CALL_DURATION.labels(method, outcome).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def record_video_frames(operation: str, frames: int, seconds: float) -> None:
+    VIDEO_FRAMES.labels(operation).inc(frames)
+    VIDEO_DECODE_SECONDS.labels(operation).inc(seconds)
+    VIDEO_FRAMES_RATE.add(operation, frames)
+
+
+def record_consumer_message(outcome: str) -> None:
+    CONSUMER_MESSAGES.labels(outcome).inc()
+    CONSUMER_MESSAGES_RATE.add(outcome, 1)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every request by its route template, so
+    /api/recordings/{recording_id} is one series rather than one per ID
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            # The router records the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
@@ -16,6 +16,12 @@ def _recording_to_dto(recording: Recording) -> RecordingResponseDto:
         format=recording.format,
         hasAudio=recording.hasAudio,
         thumbnailUrl=recording.thumbnailUrl,
+        durationMs=recording.durationMs,
+        width=recording.width,
+        height=recording.height,
+        videoCodec=recording.videoCodec,
+        audioCodec=recording.audioCodec,
+        contentHash=recording.contentHash,
         createdAt=recording.createdAt
     )
 
@@ -29,6 +35,12 @@ async def create_recording(db_session: AsyncSession, recording: InsertRecordingD
         format=recording.format,
         hasAudio=recording.hasAudio,
         thumbnailUrl=recording.thumbnailUrl,
+        durationMs=recording.durationMs,
+        width=recording.width,
+        height=recording.height,
+        videoCodec=recording.videoCodec,
+        audioCodec=recording.audioCodec,
+        contentHash=recording.contentHash,
         createdAt=datetime.now()
     )
     db_session.add(db_recording)
@@ -43,11 +55,29 @@ async def get_recording(db_session: AsyncSession, recording_id: int) -> Recordin
         raise HTTPException(status_code=404, detail="Recording not found")
     return _recording_to_dto(recording)
 
+async def get_recordings_by_ids(db_session: AsyncSession, recording_ids: List[int]) -> List[RecordingResponseDto]:
+    """Get the recordings with the given IDs; missing ones are left out"""
+    recordings = (await db_session.scalars(select(Recording).where(Recording.id.in_(recording_ids)))).all()
+    return [_recording_to_dto(recording) for recording in recordings]
+
 async def get_recording_by_filename(db_session: AsyncSession, filename: str) -> Optional[RecordingResponseDto]:
     """Get a recording by filename"""
     recording = (await db_session.scalars(select(Recording).where(Recording.filename == filename))).first()
     return _recording_to_dto(recording) if recording else None
 
+async def get_recording_by_content_hash(db_session: AsyncSession, content_hash: str) -> Optional[RecordingResponseDto]:
+    """Get a recording whose file has the given SHA-256, locked until the transaction ends"""
+    recording = (await db_session.scalars(
+        select(Recording).where(Recording.contentHash == content_hash).order_by(Recording.id).limit(1).with_for_update()
+    )).first()
+    return _recording_to_dto(recording) if recording else None
+
+async def lock_recordings_by_filename(db_session: AsyncSession, filename: str) -> int:
+    """Lock the recordings referencing a stored file until the transaction ends, returning how many there are"""
+    return len((await db_session.scalars(
+        select(Recording.id).where(Recording.filename == filename).with_for_update()
+    )).all())
+
 async def get_all_recordings(db_session: AsyncSession, skip: int = 0, limit: int = 100) -> List[RecordingResponseDto]:
     """Get all recordings with pagination"""
     recordings = (await db_session.scalars(select(Recording).offset(skip).limit(limit))).all()
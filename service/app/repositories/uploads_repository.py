@@ -0,0 +1,64 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, update
+from app.data.schemas.uploads import UploadSession
+from fastapi import HTTPException
+from datetime import datetime
+from typing import Optional
+
+async def create_upload_session(db_session: AsyncSession, upload: UploadSession) -> UploadSession:
+    """Create a new upload session in the database"""
+    db_session.add(upload)
+    await db_session.commit()
+    await db_session.refresh(upload)
+    return upload
+
+async def get_upload_session(db_session: AsyncSession, upload_id: str) -> UploadSession:
+    """Get an upload session by ID"""
+    upload = (await db_session.scalars(select(UploadSession).where(UploadSession.id == upload_id))).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+async def transition_upload_session(
+    db_session: AsyncSession,
+    upload_id: str,
+    from_status: str,
+    to_status: str,
+    recording_id: Optional[int] = None
+) -> bool:
+    """
+    Move an upload session from one status to another in a single statement,
+    so only one of several concurrent requests succeeds. Returns whether it did
+    """
+    values = {"status": to_status}
+    if recording_id is not None:
+        values["recordingId"] = recording_id
+    result = await db_session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.status == from_status)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.commit()
+    return result.rowcount == 1
+
+async def start_composing_upload_session(db_session: AsyncSession, upload_id: str, stale_before: datetime) -> bool:
+    """
+    Move a pending upload session to composing, or take over one whose
+    completion started before stale_before and never finished (the worker
+    died or was restarted). Returns whether this request may compose it
+    """
+    result = await db_session.execute(
+        update(UploadSession)
+        .where(
+            UploadSession.id == upload_id,
+            or_(
+                UploadSession.status == "pending",
+                and_(UploadSession.status == "composing", UploadSession.composingSince < stale_before)
+            )
+        )
+        .values(status="composing", composingSince=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.commit()
+    return result.rowcount == 1
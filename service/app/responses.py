@@ -0,0 +1,147 @@
+import gzip
+import os
+import sys
+from datetime import date
+from typing import Any, Optional, Tuple
+
+import brotli
+import msgpack
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Media types clients commonly send for MessagePack
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+# Low Brotli quality keeps compression of dynamic responses cheap
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+
+def _to_builtin(obj: Any) -> Any:
+    """
+    Convert values the encoders don't handle natively (numpy scalars and
+    arrays, pydantic models, dates for MessagePack)
+    """
+    if isinstance(obj, date):
+        return obj.isoformat()
+    # numpy is only loaded with the video stack; without it there are no numpy values
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
+    if np is not None and isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+
+def encode_json(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_to_builtin,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def encode_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=_to_builtin, use_bin_type=True)
+
+
+def _parse_quality_list(header: str) -> dict:
+    """
+    Parse an Accept or Accept-Encoding header into {value: q}
+    """
+    values = {}
+    for item in header.split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        values[value.lower()] = quality
+    return values
+
+
+def choose_media_type(accept: Optional[str]) -> str:
+    """
+    MessagePack if the client prefers it over JSON, JSON otherwise
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    qualities = _parse_quality_list(accept)
+    msgpack_quality = max((qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES), default=0.0)
+    json_quality = max(
+        qualities.get(JSON_MEDIA_TYPE, 0.0),
+        qualities.get("application/*", 0.0),
+        qualities.get("*/*", 0.0)
+    )
+    return MSGPACK_MEDIA_TYPE if msgpack_quality > json_quality else JSON_MEDIA_TYPE
+
+
+def choose_content_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Brotli if accepted, then gzip, otherwise no compression
+    """
+    if not accept_encoding:
+        return None
+    qualities = _parse_quality_list(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if qualities.get(encoding, qualities.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a body with the given encoding if it is large enough to be worth it
+    """
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), encoding
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), encoding
+
+
+class NegotiatedResponder:
+    """
+    Encodes response content in the format and compression the client asked for.
+
+    JSON is encoded with orjson and MessagePack is used when the Accept header
+    prefers it; numpy values are serialized directly in both. Bodies above
+    COMPRESSION_MIN_BYTES are compressed with Brotli or gzip per
+    Accept-Encoding. Returning the Response directly also skips FastAPI's
+    jsonable_encoder pass over the content.
+    """
+
+    def __init__(self, media_type: str = JSON_MEDIA_TYPE, content_encoding: Optional[str] = None):
+        self.media_type = media_type
+        self.content_encoding = content_encoding
+
+    def __call__(self, content: Any, status_code: int = 200) -> Response:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            body = encode_msgpack(content)
+        else:
+            body = encode_json(content)
+
+        body, content_encoding = compress(body, self.content_encoding)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
+        return Response(content=body, status_code=status_code, media_type=self.media_type, headers=headers)
+
+
+def get_responder(request: Request) -> NegotiatedResponder:
+    return NegotiatedResponder(
+        choose_media_type(request.headers.get("accept")),
+        choose_content_encoding(request.headers.get("accept-encoding"))
+    )
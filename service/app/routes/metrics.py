@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.metrics import metrics_registry
+
+metrics_router = APIRouter(tags=["metrics"])
+
+# Prometheus scrape endpoint
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Current metrics in the Prometheus text format, of all workers
+    """
+    return Response(content=generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
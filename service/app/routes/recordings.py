@@ -1,22 +1,32 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from app.data.schemas.recordings import InsertRecordingDto, ClientMetadataDto, RecordingResponseDto
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Response, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from app.data.schemas.recordings import (
+    InsertRecordingDto,
+    ClientMetadataDto,
+    RecordingBaseDto,
+    RecordingResponseDto,
+    StoredRecordingDto
+)
 from app.repositories.recordings_repository import (
     create_recording,
     get_recording,
     get_all_recordings,
     update_recording,
-    delete_recording,
     get_recordings_by_format,
     get_recordings_with_audio,
     search_recordings_by_title,
     #get_recordings_by_date_range,
     get_recordings_count
 )
-from typing import Optional, List
+from typing import Annotated, Optional, List
 from app.dependencies import DBSessionDep, GCSServiceDep
+from app.services.gcs_service import video_content_type
+from app.services.recordings_service import delete_recording_and_files, store_recording_upload
+from app.services.stream_service import RangeNotSatisfiable, hot_segment_cache, parse_range
 import json
-import os
-from datetime import datetime
+
+# Recording fields taken from the stored file rather than from clients
+SERVER_DERIVED_FIELDS = set(StoredRecordingDto.model_fields) - set(RecordingBaseDto.model_fields)
 
 recordings_router = APIRouter(
     prefix="/api/recordings",
@@ -67,6 +77,7 @@ async def get_recording_by_id(session: DBSessionDep, recording_id: int):
 async def create_new_recording(
     session: DBSessionDep,
     gcs_service: GCSServiceDep,
+    background_tasks: BackgroundTasks,
     video: UploadFile = File(...),
     metadata: str = Form(...)
 ):
@@ -88,39 +99,17 @@ async def create_new_recording(
         except (json.JSONDecodeError, ValueError) as e:
             raise HTTPException(status_code=400, detail=f"Invalid metadata format: {e}")
         
-        # Generate unique filename
-        timestamp = int(datetime.now().timestamp() * 1000)
-        file_extension = os.path.splitext(video.filename)[1] if video.filename else ".mp4"
-        unique_filename = f"recordings/recording_{timestamp}{file_extension}"
-        
-        # Read video content
-        content = await video.read()
-        
-        # Upload to Google Cloud Storage
-        gcs_url = await gcs_service.upload_video_file(
-            file_content=content,
-            filename=unique_filename
-        )
-        # print("--------------------------------")
-        # print(f"Video uploaded successfully: {gcs_url}")
-        # print("--------------------------------")
-        
-        # # Get a signed URL for accessing the video
-        # signed_url = gcs_service.get_signed_url(unique_filename, expiration_minutes=120)
-        # print("--------------------------------")
-        # print(f"Signed URL: {signed_url}")
-        # print("--------------------------------")
+        # Upload to Google Cloud Storage under the content hash, extracting
+        # container metadata and a thumbnail on the way so they don't depend
+        # on the client; the analysis proxy is written after the response is
+        # sent. Content that is already stored is reused as is
+        server_fields = await store_recording_upload(gcs_service, session, video, background_tasks)
         
-        # Create recording record
-        recording_dto = InsertRecordingDto(
-            title=validated_data.title,
-            filename=unique_filename,
-            fileSize=len(content),
-            duration=validated_data.duration,
-            format=validated_data.format,
-            hasAudio=validated_data.hasAudio,
-            thumbnailUrl=validated_data.thumbnailUrl
-        )
+        # Create recording record, preferring server-side values over client metadata
+        recording_dto = InsertRecordingDto(**{
+            **validated_data.model_dump(),
+            **server_fields
+        })
         
         return await create_recording(session, recording_dto)
         
@@ -163,38 +152,68 @@ async def get_file_url(
         raise HTTPException(status_code=500, detail=f"Failed to get download URL: {e}")
 
 # Stream recording file
-# @recordings_router.get("/{recording_id}/stream")
-# async def stream_recording(
-#     session: DBSessionDep, 
-#     gcs_service: GCSServiceDep,
-#     recording_id: int
-# ):
-#     """
-#     Get streaming URL for a recording file from Google Cloud Storage
-#     """
-#     try:
-#         recording = await get_recording(session, recording_id)
+@recordings_router.get("/{recording_id}/stream")
+async def stream_recording(
+    session: DBSessionDep,
+    gcs_service: GCSServiceDep,
+    recording_id: int,
+    range_header: Annotated[Optional[str], Header(alias="Range")] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    if_range: Annotated[Optional[str], Header()] = None
+):
+    """
+    Stream a recording file with support for HTTP Range requests
+
+    Ranges are read from Google Cloud Storage block by block through the hot
+    segment cache, so seeking in the player only fetches the blocks it needs.
+    The ETag is the object generation.
+    """
+    try:
+        recording = await get_recording(session, recording_id)
         
-#         if not recording.filename:
-#             raise HTTPException(status_code=404, detail="Recording file not found")
+        if not recording.filename:
+            raise HTTPException(status_code=404, detail="Recording file not found")
         
-#         # Get the public URL from GCS for streaming
-#         stream_url = await gcs_service.get_file_url(recording.filename)
+        file_info = await gcs_service.get_file_info(recording.filename)
+        size = file_info['size']
+        etag = f'"{file_info["generation"]}"'
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Cache-Control": "private, no-cache"
+        }
         
-#         if not stream_url:
-#             raise HTTPException(status_code=404, detail="Recording file not found in cloud storage")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
         
-#         return {
-#             "stream_url": stream_url,
-#             "filename": recording.title,
-#             "format": recording.format,
-#             "content_type": f"video/{recording.format}"
-#         }
+        # A stale If-Range means the client's partial copy is outdated, send everything
+        if if_range is not None and if_range.strip() != etag:
+            range_header = None
         
-#     except HTTPException:
-#         raise
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=f"Failed to get stream URL: {e}")
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        
+        status_code = 200
+        start, end = 0, size - 1
+        if byte_range is not None:
+            status_code = 206
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        
+        return StreamingResponse(
+            hot_segment_cache.iter_range(recording.filename, file_info['generation'], size, start, end) if size else iter(()),
+            status_code=status_code,
+            media_type=video_content_type(recording.filename),
+            headers=headers
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stream recording: {e}")
 
 # Get signed URL for secure access
 @recordings_router.get("/{recording_id}/signed-url")
@@ -245,6 +264,10 @@ async def update_recording_by_id(
     Update a recording by ID
     """
     try:
+        # Fields derived from the stored file can't be changed by clients
+        recording_data = {
+            field: value for field, value in recording_data.items() if field not in SERVER_DERIVED_FIELDS
+        }
         return await update_recording(session, recording_id, recording_data)
     except HTTPException:
         raise
@@ -262,14 +285,9 @@ async def delete_recording_by_id(
     Delete a recording by ID from both database and Google Cloud Storage
     """
     try:
-        recording = await get_recording(session, recording_id)
-        
-        # Delete file from Google Cloud Storage
-        if recording.filename:
-            await gcs_service.delete_file(recording.filename)
-        
-        # Delete from database
-        await delete_recording(session, recording_id)
+        # Delete from the database, and the file from Google Cloud Storage
+        # once no recording references it
+        await delete_recording_and_files(gcs_service, session, recording_id)
         return {"message": "Recording deleted successfully"}
         
     except HTTPException:
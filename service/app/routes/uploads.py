@@ -0,0 +1,188 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from app.data.schemas.recordings import ClientMetadataDto, InsertRecordingDto, RecordingResponseDto
+from app.data.schemas.uploads import (
+    UploadChunkResponseDto,
+    UploadSession,
+    UploadSessionCreateDto,
+    UploadSessionResponseDto
+)
+from app.repositories.recordings_repository import create_recording, get_recording
+from app.repositories.uploads_repository import (
+    create_upload_session,
+    get_upload_session,
+    start_composing_upload_session,
+    transition_upload_session
+)
+from app.dependencies import DBSessionDep, GCSServiceDep
+from app.services.recordings_service import finish_assembled_recording
+from app.services.upload_service import (
+    assemble_upload,
+    chunk_filename,
+    chunk_layout,
+    compose_stale_before,
+    discard_staged_chunks,
+    expected_chunk_size,
+    is_compose_abandoned,
+    is_expired,
+    received_chunks,
+    upload_status
+)
+import os
+import uuid
+
+uploads_router = APIRouter(
+    prefix="/api/recordings/uploads",
+    tags=["recordings"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def _require_pending(upload: UploadSession) -> None:
+    """
+    Reject requests for uploads that no longer accept chunks. A completion
+    abandoned while composing counts as pending again
+    """
+    if upload.status != "pending" and not is_compose_abandoned(upload):
+        raise HTTPException(status_code=409, detail=f"Upload is {upload.status}")
+    if is_expired(upload):
+        raise HTTPException(status_code=410, detail="Upload has expired, start a new one")
+
+
+# Start a resumable upload
+@uploads_router.post("/", response_model=UploadSessionResponseDto)
+async def start_upload(session: DBSessionDep, gcs_service: GCSServiceDep, upload_data: UploadSessionCreateDto):
+    """
+    Start a resumable upload. The response tells the client how to split the
+    file: chunkCount chunks of chunkSize bytes, the last one holding the rest
+    """
+    try:
+        chunk_size, chunk_count = chunk_layout(upload_data.fileSize, upload_data.chunkSize)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Chunks arrive out of order, so the content hash is only known once
+        # the recording is assembled; until then it is named after the upload
+        upload_id = uuid.uuid4().hex
+        file_extension = os.path.splitext(upload_data.filename)[1] or ".mp4"
+        upload = await create_upload_session(session, UploadSession(
+            id=upload_id,
+            filename=f"recordings/recording_{upload_id}{file_extension}",
+            fileSize=upload_data.fileSize,
+            chunkSize=chunk_size,
+            chunkCount=chunk_count,
+            clientMetadata=upload_data.metadata.model_dump(),
+            status="pending"
+        ))
+        return await upload_status(gcs_service, upload)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start upload: {e}")
+
+# Get the progress of an upload
+@uploads_router.get("/{upload_id}", response_model=UploadSessionResponseDto)
+async def get_upload(session: DBSessionDep, gcs_service: GCSServiceDep, upload_id: str):
+    """
+    Get an upload with the chunks and byte ranges received so far, so an
+    interrupted client knows what is left to send
+    """
+    upload = await get_upload_session(session, upload_id)
+    return await upload_status(gcs_service, upload)
+
+# Upload one chunk
+@uploads_router.put("/{upload_id}/chunks/{index}", response_model=UploadChunkResponseDto)
+async def put_upload_chunk(
+    session: DBSessionDep,
+    gcs_service: GCSServiceDep,
+    request: Request,
+    upload_id: str,
+    index: int
+):
+    """
+    Upload chunk `index` as the raw request body. Chunks can be sent in any
+    order and in parallel; sending a chunk again replaces it
+    """
+    upload = await get_upload_session(session, upload_id)
+    _require_pending(upload)
+    if not 0 <= index < upload.chunkCount:
+        raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {upload.chunkCount - 1}")
+
+    expected_size = expected_chunk_size(upload, index)
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > expected_size:
+        raise HTTPException(status_code=413, detail=f"Chunk {index} must be {expected_size} bytes")
+
+    # Never buffer more than one chunk, whatever the client sends
+    chunk = bytearray()
+    async for part in request.stream():
+        chunk += part
+        if len(chunk) > expected_size:
+            raise HTTPException(status_code=413, detail=f"Chunk {index} must be {expected_size} bytes")
+    if len(chunk) != expected_size:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected_size} bytes, got {len(chunk)}")
+
+    await gcs_service.upload_file(bytes(chunk), chunk_filename(upload_id, index), content_type="application/octet-stream")
+    return UploadChunkResponseDto(uploadId=upload_id, index=index, size=len(chunk))
+
+# Assemble the chunks into a recording
+@uploads_router.post("/{upload_id}/complete", response_model=RecordingResponseDto)
+async def complete_upload(
+    session: DBSessionDep,
+    gcs_service: GCSServiceDep,
+    background_tasks: BackgroundTasks,
+    upload_id: str
+):
+    """
+    Compose the uploaded chunks into the recording and create it. Completing
+    an upload again returns the same recording
+    """
+    upload = await get_upload_session(session, upload_id)
+    if upload.status == "completed":
+        return await get_recording(session, upload.recordingId)
+    _require_pending(upload)
+
+    received = set(await received_chunks(gcs_service, upload))
+    missing = [index for index in range(upload.chunkCount) if index not in received]
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Upload is missing chunks", "missingChunks": missing})
+
+    if not await start_composing_upload_session(session, upload_id, compose_stale_before()):
+        raise HTTPException(status_code=409, detail="Upload is already being completed")
+
+    try:
+        server_fields = await assemble_upload(gcs_service, upload)
+        # Prefer server-side values over client metadata
+        recording = await create_recording(session, InsertRecordingDto(**{
+            # Only the fields a client may set
+            **ClientMetadataDto(**upload.clientMetadata).model_dump(),
+            "filename": upload.filename,
+            **server_fields
+        }))
+    except Exception as e:
+        # Let the client retry completing the upload
+        await transition_upload_session(session, upload_id, "composing", "pending")
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Failed to complete upload: {e}")
+
+    await transition_upload_session(session, upload_id, "composing", "completed", recording.id)
+
+    # Staged chunks are no longer needed; hashing, the thumbnail and the
+    # analysis proxy need the assembled file and happen after the response
+    background_tasks.add_task(discard_staged_chunks, gcs_service, upload_id)
+    background_tasks.add_task(finish_assembled_recording, gcs_service, recording.id, upload.filename)
+    return recording
+
+# Abort an upload
+@uploads_router.delete("/{upload_id}")
+async def abort_upload(session: DBSessionDep, gcs_service: GCSServiceDep, upload_id: str):
+    """
+    Abort an upload and delete the chunks received so far
+    """
+    await get_upload_session(session, upload_id)
+    if not await transition_upload_session(session, upload_id, "pending", "aborted"):
+        raise HTTPException(status_code=409, detail="Only pending uploads can be aborted")
+
+    await discard_staged_chunks(gcs_service, upload_id)
+    return {"message": "Upload aborted successfully"}
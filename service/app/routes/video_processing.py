@@ -1,23 +1,42 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
-from app.dependencies import DBSessionDep, VideoProcessorDep
-from app.services.video_processor import VideoOperation
+from app.data.schemas.video_processing import BatchProcessingRequestDto, FrameFormat, VideoOperation
+from app.dependencies import DBSessionDep, ResponderDep, VideoProcessorDep
+from app.repositories.recordings_repository import get_recordings_by_ids
+from app.responses import encode_json
+from app.services.batch_processing import process_recordings
+from app.services.container_probe import ContainerProbeError
+from app.services.video_cache import video_cache
 from app.routes.recordings import get_recording
 from fastapi import HTTPException
 from typing import List
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 video_processing_router = APIRouter(
     prefix="/api/video-processing",
     tags=["video-processing"]
 )
 
+# Local video cache metrics
+@video_processing_router.get("/cache/stats")
+async def get_video_cache_stats(respond: ResponderDep):
+    """
+    Get hit-rate and size metrics of the local video cache
+    """
+    return respond(video_cache.stats())
+
 # Process video with OpenCV
 @video_processing_router.post("/{recording_id}/process")
 async def process_video(
     session: DBSessionDep,
     video_processor: VideoProcessorDep,
+    respond: ResponderDep,
     recording_id: int,
-    operations: List[VideoOperation]
+    operations: List[VideoOperation],
+    motion_detail: bool = False,
+    profile: bool = False
 ):
     """
     Process a video recording with OpenCV operations
@@ -28,6 +47,10 @@ async def process_video(
     - generate_thumbnail: Generate and upload thumbnail
     - analyze_content: Analyze video content (brightness, contrast)
     - extract_audio_info: Extract audio information
+
+    Motion is reported as merged intervals and an activity histogram; set
+    motion_detail to also get every motion frame. Set profile to get a
+    timing and resource breakdown of the processing stages.
     """
     try:
         # Get recording from database
@@ -37,29 +60,103 @@ async def process_video(
             raise HTTPException(status_code=404, detail="Recording file not found")
         
         # Process video with OpenCV
-        results = await video_processor.process_video(recording.filename, operations)
+        results = await video_processor.process_video(
+            recording.filename, operations, motion_detail=motion_detail, profile=profile
+        )
         
-        return {
+        return respond({
             "recording_id": recording_id,
             "filename": recording.filename,
             "operations": operations,
             "results": results
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process video: {e}")
 
+# Process many recordings, streaming results as they complete
+@video_processing_router.post("/batch")
+async def process_video_batch(
+    session: DBSessionDep,
+    video_processor: VideoProcessorDep,
+    batch: BatchProcessingRequestDto
+):
+    """
+    Run the operations (a summary by default) on every recording and stream
+    one JSON line per recording as soon as it's done, in completion order:
+    {"recording_id", "filename", "results"} on success, or
+    {"recording_id", "error", "status_code"} if it failed or doesn't exist.
+
+    Videos are downloaded ahead of a bounded number of decodes, recordings
+    sharing a file are processed once, and cached results are reused.
+    """
+    try:
+        recording_ids = list(dict.fromkeys(batch.recordingIds))
+        recordings = {recording.id: recording for recording in await get_recordings_by_ids(session, recording_ids)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch recordings: {e}")
+
+    missing = []
+    for recording_id in recording_ids:
+        recording = recordings.get(recording_id)
+        if recording is None or not recording.filename:
+            detail = "Recording not found" if recording is None else "Recording file not found"
+            missing.append({'recording_id': recording_id, 'error': detail, 'status_code': 404})
+    to_process = [recording for recording in recordings.values() if recording.filename]
+
+    async def lines():
+        for result in missing:
+            yield encode_json(result) + b"\n"
+        async for result in process_recordings(video_processor, to_process, batch.operations, batch.motionDetail):
+            yield encode_json(result) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+# Read container metadata without downloading the video
+@video_processing_router.get("/{recording_id}/info")
+async def get_video_info(
+    session: DBSessionDep,
+    video_processor: VideoProcessorDep,
+    respond: ResponderDep,
+    recording_id: int
+):
+    """
+    Get duration, resolution, codecs and audio info from the container headers
+    """
+    try:
+        # Get recording from database
+        recording = await get_recording(session, recording_id)
+        
+        if not recording.filename:
+            raise HTTPException(status_code=404, detail="Recording file not found")
+        
+        return respond({
+            "recording_id": recording_id,
+            "filename": recording.filename,
+            "info": await video_processor.probe_video(recording.filename)
+        })
+        
+    except HTTPException:
+        raise
+    except ContainerProbeError as e:
+        raise HTTPException(status_code=422, detail=f"Could not read video container: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get video info: {e}")
+
 # Create video summary
 @video_processing_router.post("/{recording_id}/summary")
 async def create_video_summary(
     session: DBSessionDep,
     video_processor: VideoProcessorDep,
-    recording_id: int
+    respond: ResponderDep,
+    recording_id: int,
+    profile: bool = False
 ):
     """
-    Create a comprehensive video summary with all available analysis
+    Create a comprehensive video summary with all available analysis,
+    optionally with a timing and resource breakdown of the processing stages
     """
     try:
         # Get recording from database
@@ -69,13 +166,13 @@ async def create_video_summary(
             raise HTTPException(status_code=404, detail="Recording file not found")
         
         # Create comprehensive summary
-        summary = await video_processor.create_video_summary(recording.filename)
+        summary = await video_processor.create_video_summary(recording.filename, profile=profile)
         
-        return {
+        return respond({
             "recording_id": recording_id,
             "filename": recording.filename,
             "summary": summary
-        }
+        })
         
     except HTTPException:
         raise
@@ -87,11 +184,13 @@ async def create_video_summary(
 async def extract_video_frames(
     session: DBSessionDep,
     video_processor: VideoProcessorDep,
+    respond: ResponderDep,
     recording_id: int,
-    frame_count: int = 10
+    frame_count: int = 10,
+    format: FrameFormat = "jpg"
 ):
     """
-    Extract key frames from a video recording
+    Extract key frames from a video recording and store them in GCS
     """
     try:
         # Get recording from database
@@ -101,13 +200,18 @@ async def extract_video_frames(
             raise HTTPException(status_code=404, detail="Recording file not found")
         
         # Process video to extract frames
-        results = await video_processor.process_video(recording.filename, ['extract_frames'])
-        
-        return {    
+        results = await video_processor.process_video(
+            recording.filename,
+            ['extract_frames'],
+            frame_count=frame_count,
+            frame_format=format
+        )
+        
+        return respond({
             "recording_id": recording_id,
             "filename": recording.filename,
             "frames": results.get('frames', {})
-        }
+        })
         
     except HTTPException:
         raise
@@ -119,10 +223,13 @@ async def extract_video_frames(
 async def detect_video_motion(
     session: DBSessionDep,
     video_processor: VideoProcessorDep,
-    recording_id: int
+    respond: ResponderDep,
+    recording_id: int,
+    detail: bool = False
 ):
     """
-    Detect motion in a video recording
+    Detect motion in a video recording, as merged intervals and an activity
+    histogram. Set detail to also list every motion frame
     """
     try:
         # Get recording from database
@@ -132,13 +239,13 @@ async def detect_video_motion(
             raise HTTPException(status_code=404, detail="Recording file not found")
         
         # Process video to detect motion
-        results = await video_processor.process_video(recording.filename, ['detect_motion'])
+        results = await video_processor.process_video(recording.filename, ['detect_motion'], motion_detail=detail)
         
-        return {
+        return respond({
             "recording_id": recording_id,
             "filename": recording.filename,
             "motion_detection": results.get('motion_detection', {})
-        }
+        })
         
     except HTTPException:
         raise
@@ -0,0 +1,127 @@
+import logging
+import math
+import os
+from typing import Any, Dict, Optional
+
+import cv2
+
+from .decode_config import decode_config
+
+logger = logging.getLogger(__name__)
+
+# Analysis proxies are at most this wide and this many frames per second
+PROXY_WIDTH = int(os.getenv("VIDEO_PROXY_WIDTH", "480"))
+PROXY_FPS = float(os.getenv("VIDEO_PROXY_FPS", "10"))
+PROXY_FOURCC = "mp4v"
+
+# Operations that only need the proxy; extracted frames keep the original resolution
+PROXY_OPERATIONS = {"detect_motion", "analyze_content", "generate_thumbnail"}
+
+
+def proxy_filename(gcs_filename: str) -> str:
+    """
+    GCS filename of the analysis proxy belonging to a video
+    """
+    base_name = os.path.splitext(gcs_filename)[0]
+    return f"{base_name}_proxy.mp4"
+
+
+def write_analysis_proxy(video_path: str, proxy_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Write a downscaled, lower frame rate copy of a video for analysis.
+
+    The video is decoded once; frames that don't make it into the proxy are
+    only grabbed, not converted. Returns the proxy and source dimensions and
+    frame rates, or None if the video can't be decoded.
+    """
+    cap = decode_config.open_capture(video_path)
+    if not cap.isOpened():
+        return None
+
+    writer = None
+    try:
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if source_fps <= 0:
+            return None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        scale = min(1.0, PROXY_WIDTH / width) if width else 1.0
+        # Even dimensions keep encoders happy
+        size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+        proxy_fps = min(PROXY_FPS, source_fps)
+
+        writer = cv2.VideoWriter(proxy_path, cv2.VideoWriter_fourcc(*PROXY_FOURCC), proxy_fps, size)
+        if not writer.isOpened():
+            return None
+
+        frame = None
+        small = None
+        source_frames = 0
+        proxy_frames = 0
+        while True:
+            # Keep a source frame whenever it starts a new proxy frame interval
+            if source_frames == proxy_source_frame(proxy_frames, source_fps, proxy_fps):
+                ret, frame = cap.read(frame)
+                if not ret:
+                    break
+                small = cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+                writer.write(small)
+                proxy_frames += 1
+            elif not cap.grab():
+                break
+            source_frames += 1
+
+        if not proxy_frames:
+            return None
+        return {
+            'width': size[0],
+            'height': size[1],
+            'fps': proxy_fps,
+            'frames': proxy_frames,
+            'source_fps': source_fps,
+            'source_frames': source_frames,
+            'source_width': width,
+            'source_height': height
+        }
+
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+
+def proxy_source_frame(proxy_frame: float, source_fps: float, proxy_fps: float) -> int:
+    """
+    Index of the source frame a proxy frame was taken from
+    """
+    return math.ceil(proxy_frame * source_fps / proxy_fps - 1e-9)
+
+
+def proxy_metadata(info: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Proxy info as GCS custom metadata
+    """
+    return {key: str(value) for key, value in info.items()}
+
+
+def parse_proxy_metadata(metadata: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """
+    Proxy info from GCS custom metadata, or None if it is missing.
+    Proxies stored before the source dimensions were recorded have None
+    for them.
+    """
+    try:
+        source_width = metadata.get('source_width')
+        source_height = metadata.get('source_height')
+        return {
+            'width': int(metadata['width']),
+            'height': int(metadata['height']),
+            'fps': float(metadata['fps']),
+            'frames': int(metadata['frames']),
+            'source_fps': float(metadata['source_fps']),
+            'source_frames': int(metadata['source_frames']),
+            'source_width': int(source_width) if source_width else None,
+            'source_height': int(source_height) if source_height else None
+        }
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List
+
+from fastapi import HTTPException
+
+from app.data.schemas.recordings import RecordingResponseDto
+from app.data.schemas.video_processing import VideoOperation
+
+if TYPE_CHECKING:
+    from .video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+# Videos of one batch being downloaded or processed at once
+VIDEO_BATCH_IN_FLIGHT = int(os.getenv("VIDEO_BATCH_IN_FLIGHT", "4"))
+# Decode job slots one batch may hold at once, leaving the rest to other requests
+VIDEO_BATCH_DECODE_JOBS = int(os.getenv("VIDEO_BATCH_DECODE_JOBS", "1"))
+
+
+async def process_recordings(
+    video_processor: "VideoProcessor",
+    recordings: List[RecordingResponseDto],
+    operations: List[VideoOperation],
+    motion_detail: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the operations on every recording and yield each recording's result
+    as soon as it's ready, in completion order.
+
+    Up to VIDEO_BATCH_IN_FLIGHT videos are downloaded ahead while at most
+    VIDEO_BATCH_DECODE_JOBS of them are decoded. Recordings sharing a stored
+    file are processed once, and results already in the result cache are
+    returned without a download. A failed recording yields an error entry
+    and doesn't stop the others.
+    """
+    from .decode_config import decode_config
+
+    by_filename: Dict[str, List[RecordingResponseDto]] = {}
+    for recording in recordings:
+        by_filename.setdefault(recording.filename, []).append(recording)
+
+    in_flight = asyncio.Semaphore(VIDEO_BATCH_IN_FLIGHT)
+
+    async def process(filename: str) -> List[Dict[str, Any]]:
+        async with in_flight:
+            try:
+                outcome = {'results': await video_processor.process_video(filename, operations, motion_detail=motion_detail)}
+            except HTTPException as e:
+                outcome = {'error': e.detail, 'status_code': e.status_code}
+            except Exception as e:
+                logger.error("Batch processing of %s failed: %s", filename, e)
+                outcome = {'error': f"Video processing failed: {e}", 'status_code': 500}
+        return [
+            {'recording_id': recording.id, 'filename': filename, **outcome}
+            for recording in by_filename[filename]
+        ]
+
+    # Tasks inherit the batch's decode limit from the context they're created in
+    with decode_config.limit_jobs(VIDEO_BATCH_DECODE_JOBS):
+        tasks = [asyncio.create_task(process(filename)) for filename in by_filename]
+    try:
+        for task in asyncio.as_completed(tasks):
+            for result in await task:
+                yield result
+    finally:
+        # Stops the rest of the batch if the client went away
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,555 @@
+import struct
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Reads bytes [start, end] (inclusive) of the object being probed
+RangeReader = Callable[[int, int], Awaitable[bytes]]
+
+# How much of the start and the end of the object is read up front
+HEAD_BYTES = 64 * 1024
+TAIL_BYTES = 64 * 1024
+# Don't fetch a moov box larger than this just to read metadata
+MAX_MOOV_BYTES = 16 * 1024 * 1024
+MAX_TOP_LEVEL_BOXES = 64
+
+MP4_TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pdin', b'moof', b'mfra', b'uuid', b'styp', b'sidx'}
+
+MP4_CODECS = {
+    'avc1': 'h264', 'avc3': 'h264', 'hvc1': 'hevc', 'hev1': 'hevc',
+    'vp08': 'vp8', 'vp09': 'vp9', 'av01': 'av1', 'mp4v': 'mpeg4',
+    'mp4a': 'aac', 'Opus': 'opus', '.mp3': 'mp3', 'ac-3': 'ac3', 'ec-3': 'eac3',
+    'alac': 'alac', 'fLaC': 'flac', 'sowt': 'pcm_s16le', 'twos': 'pcm_s16be'
+}
+
+MATROSKA_CODECS = {
+    'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1',
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc',
+    'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', 'A_AAC': 'aac',
+    'A_MPEG/L3': 'mp3', 'A_FLAC': 'flac', 'A_PCM/INT/LIT': 'pcm_s16le'
+}
+
+# Matroska element IDs (with their length marker bits kept)
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+DEFAULT_DURATION = 0x23E383
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+CHANNELS = 0x9F
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+
+MATROSKA_TRACK_VIDEO = 1
+MATROSKA_TRACK_AUDIO = 2
+
+
+class ContainerProbeError(ValueError):
+    """
+    Raised when the container can't be identified or its headers can't be parsed
+    """
+
+
+async def probe_container(read_range: RangeReader, size: int, include_keyframes: bool = False) -> Dict[str, Any]:
+    """
+    Read container metadata from the first and last few KB of a video object
+
+    Args:
+        read_range: Coroutine returning bytes [start, end] of the object
+        size: Total object size in bytes
+        include_keyframes: Add the video track's keyframe indices under
+            video['keyframes'] where the container indexes them (MP4 stss);
+            None means unknown or every frame is a keyframe
+
+    Returns:
+        Dict with container, duration_ms, video and audio stream info
+
+    Raises:
+        ContainerProbeError: If the container is unsupported or malformed
+    """
+    if size <= 0:
+        raise ContainerProbeError("Empty object")
+
+    try:
+        return await _probe_container(read_range, size, include_keyframes)
+    except ContainerProbeError:
+        raise
+    except (struct.error, IndexError, ValueError, ZeroDivisionError) as e:
+        # Truncated or malformed headers make the parsers read past the data
+        raise ContainerProbeError(f"Malformed container headers: {e}") from e
+
+
+async def _probe_container(read_range: RangeReader, size: int, include_keyframes: bool) -> Dict[str, Any]:
+    head = await read_range(0, min(size, HEAD_BYTES) - 1)
+    if head[:4] == struct.pack('>I', EBML_HEADER):
+        result = await _probe_matroska(read_range, size, head)
+        if include_keyframes and result['video'] is not None:
+            result['video']['keyframes'] = None
+        return result
+    if head[4:8] in MP4_TOP_LEVEL_BOXES:
+        return await _probe_mp4(read_range, size, head, include_keyframes)
+    raise ContainerProbeError("Unrecognized container format")
+
+
+def _probe_result(container: str, duration_ms: Optional[int], video: Optional[Dict[str, Any]], audio: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'container': container,
+        'duration_ms': duration_ms,
+        'video': video,
+        'audio': audio,
+        'has_audio': audio is not None
+    }
+
+
+# MP4 / MOV
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """
+    Yield (type, payload_start, box_end) for each complete box in data[start:end]
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        box_size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if box_size == 1:
+            if offset + 16 > end:
+                return
+            box_size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - offset
+        if box_size < header or offset + box_size > end:
+            return
+        yield box_type, offset + header, offset + box_size
+        offset += box_size
+
+
+def _find_box(data: bytes, path: List[bytes], start: int = 0, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    for box_type, payload_start, box_end in _iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, box_end
+            return _find_box(data, path[1:], payload_start, box_end)
+    return None
+
+
+async def _probe_mp4(read_range: RangeReader, size: int, head: bytes, include_keyframes: bool) -> Dict[str, Any]:
+    major_brand = head[8:12] if head[4:8] == b'ftyp' else b''
+    container = 'mov' if major_brand == b'qt  ' else 'mp4'
+
+    # Walk the top-level boxes by their headers until moov is found; it is at
+    # the start for fast-start files and after mdat otherwise
+    moov = None
+    offset = 0
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        if offset + 8 > size:
+            break
+        header = head[offset:offset + 16] if offset + 16 <= len(head) else await read_range(offset, min(size, offset + 16) - 1)
+        box_size, box_type = struct.unpack_from('>I4s', header, 0)
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < header_size:
+            break
+
+        if box_type == b'moov':
+            if box_size > MAX_MOOV_BYTES:
+                raise ContainerProbeError("moov box is too large to probe")
+            if offset + box_size <= len(head):
+                moov = head[offset + header_size:offset + box_size]
+            else:
+                moov = await read_range(offset + header_size, offset + box_size - 1)
+            break
+        offset += box_size
+
+    if moov is None:
+        raise ContainerProbeError("No moov box found")
+
+    timescale, duration = _parse_mvhd(moov)
+    duration_ms = int(duration * 1000 / timescale) if timescale and duration else None
+    if duration_ms is None:
+        # Fragmented MP4 (e.g. Safari MediaRecorder) may carry it in mvex/mehd
+        mehd = _find_box(moov, [b'mvex', b'mehd'])
+        if mehd and timescale:
+            version = moov[mehd[0]]
+            fragment_duration = struct.unpack_from('>Q' if version == 1 else '>I', moov, mehd[0] + 4)[0]
+            duration_ms = int(fragment_duration * 1000 / timescale) or None
+
+    video = None
+    audio = None
+    for box_type, payload_start, box_end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        track = _parse_mp4_track(moov, payload_start, box_end, include_keyframes)
+        if track is None:
+            continue
+        handler, info = track
+        if handler == b'vide' and video is None:
+            video = info
+        elif handler == b'soun' and audio is None:
+            audio = info
+
+    if duration_ms is None:
+        duration_ms = await _mp4_fragment_duration(read_range, size, moov)
+
+    return _probe_result(container, duration_ms, video, audio)
+
+
+def _parse_mvhd(moov: bytes) -> Tuple[int, int]:
+    mvhd = _find_box(moov, [b'mvhd'])
+    if mvhd is None:
+        raise ContainerProbeError("No mvhd box found")
+    start = mvhd[0]
+    if moov[start] == 1:
+        timescale, duration = struct.unpack_from('>IQ', moov, start + 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = struct.unpack_from('>II', moov, start + 12)
+        unknown = 0xFFFFFFFF
+    return timescale, 0 if duration == unknown else duration
+
+
+def _parse_mp4_track(moov: bytes, start: int, end: int, include_keyframes: bool = False) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+    hdlr = _find_box(moov, [b'mdia', b'hdlr'], start, end)
+    mdhd = _find_box(moov, [b'mdia', b'mdhd'], start, end)
+    stsd = _find_box(moov, [b'mdia', b'minf', b'stbl', b'stsd'], start, end)
+    if hdlr is None or stsd is None or mdhd is None:
+        return None
+
+    handler = moov[hdlr[0] + 8:hdlr[0] + 12]
+
+    if moov[mdhd[0]] == 1:
+        timescale, duration = struct.unpack_from('>IQ', moov, mdhd[0] + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', moov, mdhd[0] + 12)
+
+    # First sample entry: 8 byte stsd full-box header + entry count, then the entry
+    entry = stsd[0] + 8
+    if entry + 36 > stsd[1]:
+        return None
+    fourcc = moov[entry + 4:entry + 8].decode('latin-1')
+    codec = MP4_CODECS.get(fourcc, fourcc.strip())
+
+    if handler == b'vide':
+        width, height = struct.unpack_from('>HH', moov, entry + 32)
+        fps = None
+        stts = _find_box(moov, [b'mdia', b'minf', b'stbl', b'stts'], start, end)
+        if stts is not None and timescale and duration:
+            entry_count = struct.unpack_from('>I', moov, stts[0] + 4)[0]
+            sample_count = sum(
+                struct.unpack_from('>I', moov, stts[0] + 8 + i * 8)[0]
+                for i in range(min(entry_count, (stts[1] - stts[0] - 8) // 8))
+            )
+            if sample_count:
+                fps = round(sample_count * timescale / duration, 3)
+        info = {
+            'codec': codec,
+            'width': width,
+            'height': height,
+            'fps': fps
+        }
+        if include_keyframes:
+            info['keyframes'] = _parse_sync_samples(moov, start, end)
+        return handler, info
+
+    if handler == b'soun':
+        channels = struct.unpack_from('>H', moov, entry + 24)[0]
+        sample_rate = struct.unpack_from('>I', moov, entry + 32)[0] >> 16
+        return handler, {
+            'codec': codec,
+            'sample_rate': sample_rate,
+            'channels': channels
+        }
+
+    return None
+
+
+def _parse_sync_samples(moov: bytes, start: int, end: int) -> Optional[List[int]]:
+    """
+    Zero-based indices of the keyframes listed in stss; None if every sample is a sync sample
+    """
+    stss = _find_box(moov, [b'mdia', b'minf', b'stbl', b'stss'], start, end)
+    if stss is None:
+        return None
+    entry_count = struct.unpack_from('>I', moov, stss[0] + 4)[0]
+    entry_count = min(entry_count, (stss[1] - stss[0] - 8) // 4)
+    return [sample - 1 for sample in struct.unpack_from(f'>{entry_count}I', moov, stss[0] + 8)]
+
+
+async def _mp4_fragment_duration(read_range: RangeReader, size: int, moov: bytes) -> Optional[int]:
+    """
+    Duration of a fragmented MP4 from the last moof in the tail of the file
+    """
+    tail_start = max(0, size - TAIL_BYTES)
+    tail = await read_range(tail_start, size - 1)
+    moof_at = tail.rfind(b'moof')
+    while moof_at >= 4:
+        box_start = moof_at - 4
+        box_size = struct.unpack_from('>I', tail, box_start)[0]
+        if 8 <= box_size <= len(tail) - box_start:
+            duration = _parse_moof_end_time(tail, box_start + 8, box_start + box_size, moov)
+            if duration is not None:
+                return duration
+        moof_at = tail.rfind(b'moof', 0, moof_at)
+    return None
+
+
+def _parse_moof_end_time(data: bytes, start: int, end: int, moov: bytes) -> Optional[int]:
+    timescales = {}
+    for box_type, payload_start, box_end in _iter_boxes(moov):
+        if box_type == b'trak':
+            tkhd = _find_box(moov, [b'tkhd'], payload_start, box_end)
+            mdhd = _find_box(moov, [b'mdia', b'mdhd'], payload_start, box_end)
+            if tkhd is None or mdhd is None:
+                continue
+            track_id = struct.unpack_from('>I', moov, tkhd[0] + (20 if moov[tkhd[0]] == 1 else 12))[0]
+            timescales[track_id] = struct.unpack_from('>I', moov, mdhd[0] + (20 if moov[mdhd[0]] == 1 else 12))[0]
+
+    end_ms = None
+    for box_type, payload_start, box_end in _iter_boxes(data, start, end):
+        if box_type != b'traf':
+            continue
+        tfhd = _find_box(data, [b'tfhd'], payload_start, box_end)
+        tfdt = _find_box(data, [b'tfdt'], payload_start, box_end)
+        trun = _find_box(data, [b'trun'], payload_start, box_end)
+        if tfhd is None or tfdt is None:
+            continue
+
+        tfhd_flags = int.from_bytes(data[tfhd[0] + 1:tfhd[0] + 4], 'big')
+        track_id = struct.unpack_from('>I', data, tfhd[0] + 4)[0]
+        timescale = timescales.get(track_id)
+        if not timescale:
+            continue
+        default_duration = 0
+        if tfhd_flags & 0x08:
+            # Skip the optional base data offset and sample description index
+            field = tfhd[0] + 8 + (8 if tfhd_flags & 0x01 else 0) + (4 if tfhd_flags & 0x02 else 0)
+            default_duration = struct.unpack_from('>I', data, field)[0]
+
+        base_time = struct.unpack_from('>Q' if data[tfdt[0]] == 1 else '>I', data, tfdt[0] + 4)[0]
+        fragment_duration = 0
+        if trun is not None:
+            trun_flags = int.from_bytes(data[trun[0] + 1:trun[0] + 4], 'big')
+            sample_count = struct.unpack_from('>I', data, trun[0] + 4)[0]
+            field = trun[0] + 8 + (4 if trun_flags & 0x01 else 0) + (4 if trun_flags & 0x04 else 0)
+            if trun_flags & 0x100:
+                stride = 4 * sum(1 for flag in (0x100, 0x200, 0x400, 0x800) if trun_flags & flag)
+                for i in range(sample_count):
+                    if field + i * stride + 4 > trun[1]:
+                        break
+                    fragment_duration += struct.unpack_from('>I', data, field + i * stride)[0]
+            else:
+                fragment_duration = default_duration * sample_count
+
+        track_end_ms = int((base_time + fragment_duration) * 1000 / timescale)
+        end_ms = max(end_ms or 0, track_end_ms)
+    return end_ms
+
+
+# WebM / Matroska
+
+def _read_vint(data: bytes, offset: int, keep_marker: bool) -> Tuple[Optional[int], int]:
+    """
+    Read an EBML variable-length integer; returns (value, length) and a None
+    value for the reserved "unknown size" encoding
+    """
+    if offset >= len(data):
+        raise ContainerProbeError("Truncated EBML data")
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or offset + length > len(data):
+        raise ContainerProbeError("Invalid EBML variable-length integer")
+
+    value = first if keep_marker else first & (mask - 1)
+    all_ones = (first & (mask - 1)) == mask - 1
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if not keep_marker and all_ones:
+        return None, length
+    return value, length
+
+
+def _iter_elements(data: bytes, start: int, end: int):
+    """
+    Yield (id, payload_start, payload_end) for EBML elements in data[start:end];
+    unknown-size elements extend to the end of the range
+    """
+    offset = start
+    while offset < end:
+        try:
+            element_id, id_length = _read_vint(data, offset, keep_marker=True)
+            element_size, size_length = _read_vint(data, offset + id_length, keep_marker=False)
+        except ContainerProbeError:
+            return
+        payload_start = offset + id_length + size_length
+        payload_end = end if element_size is None else payload_start + element_size
+        yield element_id, payload_start, min(payload_end, end)
+        if payload_end > end:
+            return
+        offset = payload_end
+
+
+def _ebml_uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], 'big')
+
+
+def _ebml_float(data: bytes, start: int, end: int) -> float:
+    if end - start == 4:
+        return struct.unpack_from('>f', data, start)[0]
+    if end - start == 8:
+        return struct.unpack_from('>d', data, start)[0]
+    return 0.0
+
+
+async def _probe_matroska(read_range: RangeReader, size: int, head: bytes) -> Dict[str, Any]:
+    container = 'matroska'
+    timecode_scale = 1_000_000
+    duration = None
+    video = None
+    audio = None
+    video_default_duration = None
+
+    for element_id, payload_start, payload_end in _iter_elements(head, 0, len(head)):
+        if element_id == EBML_HEADER:
+            for child_id, child_start, child_end in _iter_elements(head, payload_start, payload_end):
+                if child_id == EBML_DOCTYPE:
+                    container = head[child_start:child_end].rstrip(b'\x00').decode('ascii', 'replace')
+        elif element_id == SEGMENT:
+            for child_id, child_start, child_end in _iter_elements(head, payload_start, payload_end):
+                if child_id == INFO:
+                    for info_id, info_start, info_end in _iter_elements(head, child_start, child_end):
+                        if info_id == TIMECODE_SCALE:
+                            timecode_scale = _ebml_uint(head, info_start, info_end)
+                        elif info_id == DURATION:
+                            duration = _ebml_float(head, info_start, info_end)
+                elif child_id == TRACKS:
+                    for entry_id, entry_start, entry_end in _iter_elements(head, child_start, child_end):
+                        if entry_id != TRACK_ENTRY:
+                            continue
+                        track_type, info, default_duration = _parse_matroska_track(head, entry_start, entry_end)
+                        if track_type == MATROSKA_TRACK_VIDEO and video is None:
+                            video = info
+                            video_default_duration = default_duration
+                        elif track_type == MATROSKA_TRACK_AUDIO and audio is None:
+                            audio = info
+                elif child_id == CLUSTER:
+                    # Headers always precede the first cluster
+                    break
+
+    if video is None and audio is None:
+        raise ContainerProbeError("No Matroska tracks found in the header")
+
+    if video is not None:
+        video['fps'] = round(1e9 / video_default_duration, 3) if video_default_duration else None
+
+    if duration:
+        duration_ms = int(duration * timecode_scale / 1_000_000)
+    else:
+        # Browser MediaRecorder output has no Duration; use the last block timestamp
+        tail_start = max(0, size - TAIL_BYTES)
+        tail = head[tail_start:] if size <= len(head) else await read_range(tail_start, size - 1)
+        last_timecode = _last_block_timecode(tail)
+        duration_ms = None
+        if last_timecode is not None:
+            frame_ns = video_default_duration or 0
+            duration_ms = int((last_timecode * timecode_scale + frame_ns) / 1_000_000)
+
+    return _probe_result(container, duration_ms, video, audio)
+
+
+def _parse_matroska_track(data: bytes, start: int, end: int) -> Tuple[Optional[int], Dict[str, Any], Optional[int]]:
+    track_type = None
+    codec = None
+    default_duration = None
+    details: Dict[str, Any] = {}
+
+    for element_id, payload_start, payload_end in _iter_elements(data, start, end):
+        if element_id == TRACK_TYPE:
+            track_type = _ebml_uint(data, payload_start, payload_end)
+        elif element_id == CODEC_ID:
+            codec_id = data[payload_start:payload_end].rstrip(b'\x00').decode('ascii', 'replace')
+            codec = MATROSKA_CODECS.get(codec_id, codec_id)
+        elif element_id == DEFAULT_DURATION:
+            default_duration = _ebml_uint(data, payload_start, payload_end)
+        elif element_id == VIDEO:
+            for child_id, child_start, child_end in _iter_elements(data, payload_start, payload_end):
+                if child_id == PIXEL_WIDTH:
+                    details['width'] = _ebml_uint(data, child_start, child_end)
+                elif child_id == PIXEL_HEIGHT:
+                    details['height'] = _ebml_uint(data, child_start, child_end)
+        elif element_id == AUDIO:
+            details.setdefault('sample_rate', 8000)
+            details.setdefault('channels', 1)
+            for child_id, child_start, child_end in _iter_elements(data, payload_start, payload_end):
+                if child_id == SAMPLING_FREQUENCY:
+                    details['sample_rate'] = int(_ebml_float(data, child_start, child_end))
+                elif child_id == CHANNELS:
+                    details['channels'] = _ebml_uint(data, child_start, child_end)
+
+    if track_type == MATROSKA_TRACK_VIDEO:
+        info = {'codec': codec, 'width': details.get('width'), 'height': details.get('height')}
+    else:
+        # Matroska defaults when the Audio element omits them
+        info = {'codec': codec, 'sample_rate': details.get('sample_rate', 8000), 'channels': details.get('channels', 1)}
+    return track_type, info, default_duration
+
+
+def _last_block_timecode(tail: bytes) -> Optional[int]:
+    """
+    Absolute timecode of the last block in the final cluster found in tail
+    """
+    cluster_marker = struct.pack('>I', CLUSTER)
+    cluster_at = tail.rfind(cluster_marker)
+    while cluster_at != -1:
+        cluster_timecode = None
+        last_block = None
+        for element_id, payload_start, payload_end in _iter_elements(tail, cluster_at, len(tail)):
+            if element_id != CLUSTER:
+                break
+            for child_id, child_start, child_end in _iter_elements(tail, payload_start, payload_end):
+                if child_id == CLUSTER_TIMECODE:
+                    cluster_timecode = _ebml_uint(tail, child_start, child_end)
+                elif child_id == SIMPLE_BLOCK:
+                    last_block = _block_timecode(tail, child_start, child_end, last_block)
+                elif child_id == BLOCK_GROUP:
+                    for group_id, group_start, group_end in _iter_elements(tail, child_start, child_end):
+                        if group_id == BLOCK:
+                            last_block = _block_timecode(tail, group_start, group_end, last_block)
+            break
+
+        if cluster_timecode is not None:
+            return cluster_timecode + (last_block or 0)
+        # The marker bytes occurred inside frame data, try an earlier one
+        cluster_at = tail.rfind(cluster_marker, 0, cluster_at)
+    return None
+
+
+def _block_timecode(data: bytes, start: int, end: int, current: Optional[int]) -> Optional[int]:
+    try:
+        _, track_length = _read_vint(data, start, keep_marker=False)
+    except ContainerProbeError:
+        return current
+    if start + track_length + 2 > end:
+        return current
+    relative = struct.unpack_from('>h', data, start + track_length)[0]
+    return relative if current is None else max(current, relative)
@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+import cv2
+
+from app.metrics import VIDEO_JOBS_RUNNING, VIDEO_JOBS_WAITING
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+DECODE_BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'ffmpeg': cv2.CAP_FFMPEG,
+    'gstreamer': cv2.CAP_GSTREAMER
+}
+HW_ACCELERATION = {
+    'none': cv2.VIDEO_ACCELERATION_NONE,
+    # Let the backend pick whatever hardware decoder is available, if any
+    'any': cv2.VIDEO_ACCELERATION_ANY
+}
+
+VIDEO_DECODE_BACKEND = os.getenv("VIDEO_DECODE_BACKEND", "ffmpeg")
+VIDEO_HW_ACCELERATION = os.getenv("VIDEO_HW_ACCELERATION", "none")
+# Total threads OpenCV and the decoders may use, shared by all concurrent jobs
+VIDEO_THREAD_BUDGET = int(os.getenv("VIDEO_THREAD_BUDGET", str(os.cpu_count() or 1)))
+VIDEO_MAX_CONCURRENT_JOBS = int(os.getenv("VIDEO_MAX_CONCURRENT_JOBS", "2"))
+# FFmpeg decoder threads per capture, 0 splits the thread budget among jobs
+VIDEO_DECODER_THREADS = int(os.getenv("VIDEO_DECODER_THREADS", "0"))
+# Seek to the nearest preceding keyframe instead of decoding up to the exact frame
+VIDEO_FAST_SEEK = os.getenv("VIDEO_FAST_SEEK", "false").lower() in ("1", "true", "yes")
+
+# Job slots the tasks of one caller (e.g. a batch) may hold between them
+_caller_job_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("caller_job_slots", default=None)
+
+
+class DecodeConfig:
+    """
+    How videos are opened and how many threads decoding may use.
+
+    cv2.setNumThreads is process wide, so the thread budget is divided by
+    the number of jobs allowed to decode at once, and `job_slot` makes sure
+    no more than that run concurrently. Segment workers get an even share of
+    the budget instead.
+
+    Blocking decode and encode work of jobs runs on a pool of its own, sized
+    to the job limit, so it can't take the default executor's threads from
+    file I/O and hashing on the request path. Short work a request waits on,
+    such as an upload's thumbnail, has a separate pool so it never queues
+    behind full-length decodes.
+    """
+
+    def __init__(
+        self,
+        backend: str = VIDEO_DECODE_BACKEND,
+        hw_acceleration: str = VIDEO_HW_ACCELERATION,
+        thread_budget: int = VIDEO_THREAD_BUDGET,
+        max_concurrent_jobs: int = VIDEO_MAX_CONCURRENT_JOBS,
+        decoder_threads: int = VIDEO_DECODER_THREADS,
+        fast_seek: bool = VIDEO_FAST_SEEK
+    ):
+        if backend not in DECODE_BACKENDS:
+            raise ValueError(f"Unknown decode backend {backend!r}, expected one of {', '.join(DECODE_BACKENDS)}")
+        if hw_acceleration not in HW_ACCELERATION:
+            raise ValueError(f"Unknown hardware acceleration {hw_acceleration!r}, expected one of {', '.join(HW_ACCELERATION)}")
+
+        self.backend = backend
+        self.hw_acceleration = hw_acceleration
+        self.thread_budget = max(1, thread_budget)
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.fast_seek = fast_seek
+        self.threads_per_job = max(1, self.thread_budget // self.max_concurrent_jobs)
+        self.decoder_threads = decoder_threads or self.threads_per_job
+        self._job_slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        self._cpu_pool = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs, thread_name_prefix="video-cpu")
+        self._short_pool = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs, thread_name_prefix="video-short")
+
+    def apply(self) -> None:
+        """
+        Set the process-wide OpenCV thread count to one job's share
+        """
+        cv2.setNumThreads(self.threads_per_job)
+        logger.info(
+            "Video decoding: backend=%s, hw_acceleration=%s, jobs=%s, threads/job=%s, decoder threads=%s, fast_seek=%s",
+            self.backend, self.hw_acceleration, self.max_concurrent_jobs, self.threads_per_job,
+            self.decoder_threads, self.fast_seek
+        )
+
+    def open_capture(self, video_path: str, decoder_threads: Optional[int] = None) -> cv2.VideoCapture:
+        """
+        Open a video with the configured backend, decoder threads and acceleration
+        """
+        params = [
+            cv2.CAP_PROP_N_THREADS, decoder_threads or self.decoder_threads,
+            cv2.CAP_PROP_HW_ACCELERATION, HW_ACCELERATION[self.hw_acceleration]
+        ]
+        return cv2.VideoCapture(video_path, DECODE_BACKENDS[self.backend], params)
+
+    def worker_threads(self, workers: int) -> int:
+        """
+        Threads each of `workers` segment processes of one job may use: the
+        job's share of the budget, so concurrent jobs stay within it together
+        """
+        return max(1, self.threads_per_job // max(1, workers))
+
+    @asynccontextmanager
+    async def job_slot(self) -> AsyncIterator[None]:
+        """
+        Wait until fewer than max_concurrent_jobs videos are being decoded,
+        and fewer than the caller's limit if it set one
+        """
+        caller_slots = _caller_job_slots.get()
+        VIDEO_JOBS_WAITING.inc()
+        try:
+            with span("video.job_slot_wait"):
+                if caller_slots is not None:
+                    await caller_slots.acquire()
+                try:
+                    await self._job_slots.acquire()
+                except BaseException:
+                    if caller_slots is not None:
+                        caller_slots.release()
+                    raise
+        finally:
+            VIDEO_JOBS_WAITING.dec()
+        VIDEO_JOBS_RUNNING.inc()
+        try:
+            yield
+        finally:
+            VIDEO_JOBS_RUNNING.dec()
+            self._job_slots.release()
+            if caller_slots is not None:
+                caller_slots.release()
+
+    @contextmanager
+    def limit_jobs(self, limit: int) -> Iterator[None]:
+        """
+        Let the tasks started inside the context hold at most `limit` job
+        slots between them, leaving the rest to other requests
+        """
+        token = _caller_job_slots.set(asyncio.Semaphore(max(1, limit)))
+        try:
+            yield
+        finally:
+            _caller_job_slots.reset(token)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a job's blocking video work (decoding, encoding) on the video CPU
+        pool. Callers hold a job_slot, so a thread is always free for them
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_pool, func, *args)
+
+    async def run_short(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run short blocking video work, a frame or two, that a request is
+        waiting on, without a job slot
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._short_pool, func, *args)
+
+    def shutdown(self) -> None:
+        """
+        Wait for running video work to finish and stop the pools' threads
+        """
+        self._cpu_pool.shutdown(wait=True, cancel_futures=True)
+        self._short_pool.shutdown(wait=True, cancel_futures=True)
+
+    def seek_target(self, frame_idx: int, keyframes: Optional[List[int]]) -> int:
+        """
+        Frame to seek to for frame_idx: the preceding keyframe with fast seek
+        enabled and a keyframe index known, otherwise the frame itself
+        """
+        if not self.fast_seek or not keyframes:
+            return frame_idx
+        return keyframes[max(0, bisect.bisect_right(keyframes, frame_idx) - 1)]
+
+# Global instance
+decode_config = DecodeConfig()
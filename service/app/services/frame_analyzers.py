@@ -0,0 +1,565 @@
+import time
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from .decode_config import decode_config
+
+# Size of the downsampled grayscale signature used for change detection
+SIGNATURE_SIZE = (64, 36)
+# Max per-pixel difference between signatures that still counts as unchanged
+SIGNATURE_TOLERANCE = 2
+
+# Content analysis samples at most this many frames spread over the whole video
+CONTENT_MAX_SAMPLES = 300
+# Frames are downscaled to this width before measuring brightness and contrast
+CONTENT_ANALYSIS_WIDTH = 320
+CONTENT_HISTOGRAM_BINS = 32
+
+# Motion frames at most this far apart are merged into one interval
+MOTION_MERGE_GAP_SECONDS = 0.5
+# Resolution of the motion activity histogram over the whole video
+MOTION_HISTOGRAM_BINS = 100
+
+
+class FrameDeduplicator:
+    """
+    Cheap change-detection stage that runs before the analyzers.
+
+    The luma of each decoded frame is reduced to a small signature and
+    compared with the previous one. Frames whose signature did not change are marked as
+    duplicates; `version` only increments when the content changes, so
+    analyzers can tell whether they already saw an equivalent frame.
+    """
+
+    def __init__(self, signature_size: Tuple[int, int] = SIGNATURE_SIZE, tolerance: int = SIGNATURE_TOLERANCE):
+        self.signature_size = signature_size
+        self.tolerance = tolerance
+        self.version = 0
+        self.total_frames = 0
+        self.duplicate_frames = 0
+        self.signature_time = 0.0
+        self._signature = np.empty(signature_size[::-1], dtype=np.uint8)
+        self._previous_signature: Optional[np.ndarray] = None
+
+    def check(self, luma: np.ndarray) -> bool:
+        """
+        Returns True if the frame is unchanged from the previous one
+        """
+        start = time.perf_counter()
+        cv2.resize(luma, self.signature_size, dst=self._signature, interpolation=cv2.INTER_AREA)
+
+        duplicate = (
+            self._previous_signature is not None
+            and cv2.norm(self._signature, self._previous_signature, cv2.NORM_INF) <= self.tolerance
+        )
+        if duplicate:
+            self.duplicate_frames += 1
+        else:
+            self.version += 1
+            # Swap buffers, the current signature becomes the reference
+            if self._previous_signature is None:
+                self._previous_signature = np.empty_like(self._signature)
+            self._signature, self._previous_signature = self._previous_signature, self._signature
+
+        self.total_frames += 1
+        self.signature_time += time.perf_counter() - start
+        return duplicate
+
+
+class MotionAnalyzer:
+    """
+    Detects frames whose difference from the previous frame exceeds a threshold
+
+    Motion frames are merged into intervals as they are found, and the motion
+    of every frame is accumulated into a fixed number of histogram bins, so the
+    result stays small however active the recording is. The per-frame list is
+    only kept when `keep_frames` is set.
+
+    The blurred frames and the difference mask live in buffers allocated on
+    the first frame and reused for the rest of the pass.
+    """
+
+    operation = 'detect_motion'
+    result_key = 'motion_detection'
+
+    def __init__(
+        self,
+        fps: float,
+        total_frames: int = 0,
+        motion_threshold: int = 30,
+        keep_frames: bool = False,
+        histogram_bins: int = MOTION_HISTOGRAM_BINS
+    ):
+        self.fps = fps
+        self.total_frames = total_frames
+        self.motion_threshold = motion_threshold
+        self.keep_frames = keep_frames
+        self.merge_gap = max(1, int(round(fps * MOTION_MERGE_GAP_SECONDS))) if fps > 0 else 1
+        self.motion_frames: List[Dict[str, Any]] = []
+        # [start_frame, end_frame, peak, sum, count] per interval
+        self.intervals: List[List[float]] = []
+        # Histogram needs the frame count to place frames in bins
+        self.histogram_bins = histogram_bins if total_frames > 0 else 0
+        self._activity_sum = np.zeros(self.histogram_bins, dtype=np.float64)
+        self._activity_frames = np.zeros(self.histogram_bins, dtype=np.int64)
+        self._prev_frame: Optional[np.ndarray] = None
+        # First frame seen, kept so a preceding segment can diff against it
+        self._first_frame: Optional[np.ndarray] = None
+        self._first_frame_idx = 0
+        # Scratch buffers, not sent back from segment workers
+        self._blurred: Optional[np.ndarray] = None
+        self._delta: Optional[np.ndarray] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['_blurred'] = None
+        state['_delta'] = None
+        return state
+
+    def wants(self, frame_idx: int) -> bool:
+        return True
+
+    def done(self, frame_idx: int) -> bool:
+        return False
+
+    def update(self, frame_idx: int, luma: np.ndarray) -> None:
+        if self._blurred is None or self._blurred.shape != luma.shape:
+            self._blurred = np.empty_like(luma)
+        gray = cv2.GaussianBlur(luma, (21, 21), 0, dst=self._blurred)
+
+        if self._prev_frame is not None:
+            self._record_motion(frame_idx, self._prev_frame, gray)
+        else:
+            self._first_frame = gray.copy()
+            self._first_frame_idx = frame_idx
+
+        # Swap buffers, the current frame becomes the reference
+        self._blurred = self._prev_frame
+        self._prev_frame = gray
+
+    def _record_motion(self, frame_idx: int, prev_frame: np.ndarray, gray: np.ndarray) -> None:
+        if self._delta is None or self._delta.shape != gray.shape:
+            self._delta = np.empty_like(gray)
+
+        # Calculate frame difference, thresholded in place
+        cv2.absdiff(prev_frame, gray, dst=self._delta)
+        cv2.threshold(self._delta, 25, 255, cv2.THRESH_BINARY, dst=self._delta)
+
+        # Count non-zero pixels (motion)
+        motion_pixels = cv2.countNonZero(self._delta)
+        motion_percentage = (motion_pixels / (gray.shape[0] * gray.shape[1])) * 100
+        self._record_activity(frame_idx, motion_percentage)
+
+        if motion_percentage > self.motion_threshold:
+            self._add_interval([frame_idx, frame_idx, motion_percentage, motion_percentage, 1])
+            if self.keep_frames:
+                self.motion_frames.append({
+                    'frame_number': frame_idx,
+                    'timestamp': self._timestamp(frame_idx),
+                    'motion_percentage': motion_percentage
+                })
+
+    def _record_activity(self, frame_idx: int, motion_percentage: float) -> None:
+        if self.histogram_bins:
+            bin_idx = min(self.histogram_bins - 1, frame_idx * self.histogram_bins // self.total_frames)
+            self._activity_sum[bin_idx] += motion_percentage
+            self._activity_frames[bin_idx] += 1
+
+    def _add_interval(self, interval: List[float]) -> None:
+        """
+        Append an interval, merging it into the last one if the gap is small enough
+        """
+        if self.intervals and interval[0] - self.intervals[-1][1] <= self.merge_gap:
+            last = self.intervals[-1]
+            last[1] = interval[1]
+            last[2] = max(last[2], interval[2])
+            last[3] += interval[3]
+            last[4] += interval[4]
+        else:
+            self.intervals.append(list(interval))
+
+    def repeat(self, frame_idx: int) -> None:
+        # An unchanged frame has no motion and leaves the reference frame as is
+        self._record_activity(frame_idx, 0.0)
+
+    def merge(self, other: 'MotionAnalyzer') -> None:
+        """
+        Append the results of the following segment. The last frame of this
+        segment is carried over to diff against the first frame of the next,
+        which its own worker had no reference for
+        """
+        if self._prev_frame is not None and other._first_frame is not None:
+            self._record_motion(other._first_frame_idx, self._prev_frame, other._first_frame)
+        for interval in other.intervals:
+            self._add_interval(interval)
+        self.motion_frames.extend(other.motion_frames)
+        if self.histogram_bins and other.histogram_bins == self.histogram_bins:
+            self._activity_sum += other._activity_sum
+            self._activity_frames += other._activity_frames
+        if other._prev_frame is not None:
+            self._prev_frame = other._prev_frame
+
+    def _timestamp(self, frame_idx: float) -> float:
+        return frame_idx / self.fps if self.fps > 0 else 0
+
+    def activity_histogram(self) -> Optional[Dict[str, Any]]:
+        """
+        Mean motion percentage per fixed-size slice of the video
+        """
+        if not self.histogram_bins:
+            return None
+        mean_motion = np.divide(
+            self._activity_sum, self._activity_frames,
+            out=np.zeros_like(self._activity_sum), where=self._activity_frames > 0
+        )
+        return {
+            'bins': self.histogram_bins,
+            'bin_seconds': self._timestamp(self.total_frames) / self.histogram_bins,
+            'mean_motion_percentage': mean_motion.round(3).tolist()
+        }
+
+    def result(self) -> Dict[str, Any]:
+        result = {
+            'total_motion_frames': int(sum(interval[4] for interval in self.intervals)),
+            'motion_threshold': self.motion_threshold,
+            'motion_intervals': [
+                {
+                    'start_frame': int(start),
+                    'end_frame': int(end),
+                    'start_time': round(self._timestamp(start), 3),
+                    'end_time': round(self._timestamp(end), 3),
+                    'motion_frames': int(count),
+                    'peak_motion_percentage': round(peak, 3),
+                    'mean_motion_percentage': round(total / count, 3)
+                }
+                for start, end, peak, total, count in self.intervals
+            ],
+            'activity_histogram': self.activity_histogram()
+        }
+        if self.keep_frames:
+            result['motion_frames'] = self.motion_frames
+        return result
+
+
+class RunningStats:
+    """
+    Welford's online mean/variance with min and max, in constant memory
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'RunningStats') -> None:
+        """
+        Combine with statistics of another stream (Chan et al. parallel update)
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
+
+
+class ContentAnalyzer:
+    """
+    Streaming content analysis (brightness, contrast and luma histogram).
+
+    Frames are sampled evenly across the whole video and downscaled before
+    measuring, and all statistics are kept as running values, so memory and
+    time stay bounded regardless of the recording length.
+    """
+
+    operation = 'analyze_content'
+    result_key = 'content_analysis'
+
+    def __init__(
+        self,
+        total_frames: int,
+        fps: float,
+        max_samples: int = CONTENT_MAX_SAMPLES,
+        analysis_width: int = CONTENT_ANALYSIS_WIDTH,
+        histogram_bins: int = CONTENT_HISTOGRAM_BINS
+    ):
+        if total_frames > 0:
+            self.sample_interval = max(1, total_frames // max_samples)
+        else:
+            # Frame count unknown (common for browser WebM), sample once per second
+            self.sample_interval = max(1, int(round(fps)))
+        self.analysis_width = analysis_width
+        self.histogram_bins = histogram_bins
+        self.brightness = RunningStats()
+        self.contrast = RunningStats()
+        # calcHist only writes float32, which stops counting exactly past 2^24
+        # pixels per bin; the running total is float64 like the other sums
+        self.histogram = np.zeros((histogram_bins, 1), dtype=np.float64)
+        self._frame_histogram = np.zeros((histogram_bins, 1), dtype=np.float32)
+        self._analysis_size: Optional[Tuple[int, int]] = None
+        self._small: Optional[np.ndarray] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['_small'] = None
+        return state
+
+    def wants(self, frame_idx: int) -> bool:
+        return frame_idx % self.sample_interval == 0
+
+    def done(self, frame_idx: int) -> bool:
+        return False
+
+    def update(self, frame_idx: int, luma: np.ndarray) -> None:
+        if self._analysis_size is None:
+            height, width = luma.shape[:2]
+            scale = min(1.0, self.analysis_width / width)
+            self._analysis_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if self._small is None:
+            self._small = np.empty(self._analysis_size[::-1], dtype=np.uint8)
+
+        small = cv2.resize(luma, self._analysis_size, dst=self._small, interpolation=cv2.INTER_AREA)
+
+        # Brightness is the mean luma, contrast its standard deviation
+        mean, std = cv2.meanStdDev(small)
+        self._last_brightness = float(mean[0, 0])
+        self._last_contrast = float(std[0, 0])
+        self._frame_histogram = cv2.calcHist(
+            [small], [0], None, [self.histogram_bins], [0, 256], hist=self._frame_histogram
+        )
+        self.repeat(frame_idx)
+
+    def repeat(self, frame_idx: int) -> None:
+        # Same content as the last analyzed frame, so count its values again
+        self.brightness.update(self._last_brightness)
+        self.contrast.update(self._last_contrast)
+        self.histogram += self._frame_histogram
+
+    def merge(self, other: 'ContentAnalyzer') -> None:
+        """
+        Fold in the statistics of another segment
+        """
+        self.brightness.merge(other.brightness)
+        self.contrast.merge(other.contrast)
+        self.histogram += other.histogram
+        if self._analysis_size is None:
+            self._analysis_size = other._analysis_size
+
+    def result(self) -> Dict[str, Any]:
+        analyzed = self.brightness.count
+        total_pixels = float(self.histogram.sum())
+        histogram = self.histogram[:, 0].copy()
+        if total_pixels:
+            histogram /= total_pixels
+        return {
+            'average_brightness': self.brightness.mean,
+            'brightness_std': self.brightness.std,
+            'average_contrast': self.contrast.mean,
+            'brightness_range': {
+                'min': self.brightness.min if analyzed else 0,
+                'max': self.brightness.max if analyzed else 0
+            },
+            'frames_analyzed': analyzed,
+            'sample_interval': self.sample_interval,
+            'analysis_resolution': f"{self._analysis_size[0]}x{self._analysis_size[1]}" if self._analysis_size else None,
+            'brightness_histogram': histogram.round(6).tolist()
+        }
+
+
+def build_frame_analyzers(operations: List[str], fps: float, total_frames: int, motion_detail: bool = False) -> List[Any]:
+    """
+    Create the analyzers for operations that need to look at every frame
+    """
+    analyzers = []
+    if 'detect_motion' in operations:
+        analyzers.append(MotionAnalyzer(fps, total_frames, keep_frames=motion_detail))
+    if 'analyze_content' in operations:
+        analyzers.append(ContentAnalyzer(total_frames, fps))
+    return analyzers
+
+
+def run_frame_pass(
+    cap: cv2.VideoCapture,
+    analyzers: List[Any],
+    deduplicate: bool = True,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Decode frames [start_frame, end_frame) once and feed every frame to the
+    analyzers that want it.
+
+    Every decoded frame is converted to luma once and the analyzers share it.
+    The frame and luma buffers are reused for the whole pass, so the loop
+    doesn't allocate per frame. Frames flagged as duplicates by the
+    FrameDeduplicator are not analyzed again; each analyzer's `repeat` is
+    called instead. Returns a report with the dedup ratio and the analyzer
+    time the skipped frames saved.
+    """
+    deduplicator = FrameDeduplicator()
+    # Content version each analyzer last did full work on
+    seen_versions = [-1] * len(analyzers)
+    analyzer_time = [0.0] * len(analyzers)
+    analyzer_cpu_time = [0.0] * len(analyzers)
+    analyzed_frames = [0] * len(analyzers)
+    skipped_frames = [0] * len(analyzers)
+    decoded_frames = 0
+
+    frame: Optional[np.ndarray] = None
+    luma: Optional[np.ndarray] = None
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_idx = start_frame
+    while end_frame is None or frame_idx < end_frame:
+        if all(analyzer.done(frame_idx) for analyzer in analyzers):
+            break
+        wanting = [i for i, analyzer in enumerate(analyzers) if analyzer.wants(frame_idx)]
+        if not wanting:
+            # Nobody needs this frame, skip the colour conversion
+            if not cap.grab():
+                break
+            frame_idx += 1
+            continue
+
+        # Decode into the previous frame's buffer
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        decoded_frames += 1
+        luma = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=luma)
+
+        if deduplicate:
+            deduplicator.check(luma)
+        else:
+            deduplicator.version += 1
+
+        for i in wanting:
+            analyzer = analyzers[i]
+            if seen_versions[i] == deduplicator.version:
+                analyzer.repeat(frame_idx)
+                skipped_frames[i] += 1
+                continue
+
+            start = time.perf_counter()
+            cpu_start = time.thread_time()
+            analyzer.update(frame_idx, luma)
+            analyzer_time[i] += time.perf_counter() - start
+            analyzer_cpu_time[i] += time.thread_time() - cpu_start
+            analyzed_frames[i] += 1
+            seen_versions[i] = deduplicator.version
+
+        frame_idx += 1
+
+    # Estimate the time saved from each analyzer's average cost per analyzed frame
+    time_saved = sum(
+        analyzer_time[i] / analyzed_frames[i] * skipped_frames[i]
+        for i in range(len(analyzers)) if analyzed_frames[i]
+    )
+    return _pass_report(
+        decoded_frames,
+        deduplicator.total_frames,
+        deduplicator.duplicate_frames,
+        sum(analyzer_time),
+        deduplicator.signature_time,
+        time_saved - deduplicator.signature_time,
+        {
+            analyzer.operation: {
+                'frames': analyzed_frames[i],
+                'repeated_frames': skipped_frames[i],
+                'seconds': analyzer_time[i],
+                'cpu_seconds': analyzer_cpu_time[i]
+            }
+            for i, analyzer in enumerate(analyzers)
+        }
+    )
+
+
+def _pass_report(
+    frames_decoded: int,
+    frames_checked: int,
+    duplicate_frames: int,
+    analyzer_seconds: float,
+    signature_seconds: float,
+    seconds_saved: float,
+    analyzers: Dict[str, Dict[str, float]]
+) -> Dict[str, Any]:
+    return {
+        'frames_decoded': frames_decoded,
+        'frames_checked': frames_checked,
+        'duplicate_frames': duplicate_frames,
+        'dedup_ratio': duplicate_frames / frames_checked if frames_checked else 0,
+        'analyzer_seconds': analyzer_seconds,
+        'signature_seconds': signature_seconds,
+        'estimated_seconds_saved': seconds_saved,
+        # Per-analyzer work and time, reported in processing profiles
+        'analyzers': analyzers
+    }
+
+
+def merge_pass_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine the reports of consecutive segments into one for the whole video
+    """
+    return _pass_report(
+        sum(report['frames_decoded'] for report in reports),
+        sum(report['frames_checked'] for report in reports),
+        sum(report['duplicate_frames'] for report in reports),
+        sum(report['analyzer_seconds'] for report in reports),
+        sum(report['signature_seconds'] for report in reports),
+        sum(report['estimated_seconds_saved'] for report in reports),
+        {
+            operation: {
+                key: sum(report['analyzers'][operation][key] for report in reports)
+                for key in reports[0]['analyzers'][operation]
+            }
+            for operation in reports[0]['analyzers']
+        }
+    )
+
+
+def analyze_segment(
+    video_path: str,
+    operations: List[str],
+    fps: float,
+    total_frames: int,
+    start_frame: int,
+    end_frame: Optional[int],
+    deduplicate: bool = True,
+    threads: int = 1,
+    motion_detail: bool = False
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Run the frame analyzers over one time segment of a video.
+
+    Entry point for worker processes: opens its own capture, limited to
+    `threads` threads, and returns the segment's analyzers, to be merged in
+    order, along with its pass report.
+    """
+    cv2.setNumThreads(threads)
+    cap = decode_config.open_capture(video_path, decoder_threads=threads)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file {video_path}")
+    try:
+        analyzers = build_frame_analyzers(operations, fps, total_frames, motion_detail)
+        report = run_frame_pass(cap, analyzers, deduplicate, start_frame, end_frame)
+    finally:
+        cap.release()
+    return analyzers, report
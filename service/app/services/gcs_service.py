@@ -1,14 +1,53 @@
+import asyncio
 import mimetypes
 import os
 import logging
 import tempfile
-from typing import Optional, Union
-from google.cloud import storage
-from google.cloud.exceptions import GoogleCloudError
+import threading
+from typing import Any, Dict, List, Optional, Union
 from fastapi import HTTPException
 
+from app.metrics import record_gcs_transfer, timed_gcs_call
+
 logger = logging.getLogger(__name__)
 
+# Common video MIME types
+VIDEO_CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.wmv': 'video/x-ms-wmv',
+    '.flv': 'video/x-flv',
+    '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska',
+    '.m4v': 'video/x-m4v'
+}
+
+# Most source objects a single compose request accepts
+COMPOSE_MAX_SOURCES = 32
+
+# "gcs" or "local", which keeps objects in LOCAL_STORAGE_DIR for development,
+# benchmarks and load tests
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+
+class GoogleCloudError(Exception):
+    """
+    Replaced by google.cloud.exceptions.GoogleCloudError when the client
+    library is imported; nothing can raise it before that
+    """
+
+def _import_storage():
+    """Import the GCS client library, which takes a while, on first use"""
+    global GoogleCloudError
+    from google.cloud import exceptions, storage
+    GoogleCloudError = exceptions.GoogleCloudError
+    return storage
+
+def video_content_type(filename: str) -> str:
+    """Content type for a video file based on its extension"""
+    file_ext = os.path.splitext(filename.lower())[1]
+    return VIDEO_CONTENT_TYPES.get(file_ext, 'video/mp4')
+
 class GoogleCloudStorageService:
     """
     Service for handling Google Cloud Storage operations
@@ -24,22 +63,51 @@ class GoogleCloudStorageService:
         if not self.project_id:
             raise ValueError("GOOGLE_CLOUD_PROJECT_ID environment variable is required")
         
-        # Initialize the GCS client
-        try:
-            self.client = storage.Client(project=self.project_id)
-            self.bucket = self.client.bucket(self.bucket_name)
-            
-            # Verify bucket exists
-            if not self.bucket.exists():
-                raise ValueError(f"Bucket {self.bucket_name} does not exist")
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize Google Cloud Storage client: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail="Failed to initialize cloud storage service"
-            )
+        # The client is created on first use, or by warm_up
+        self._client = None
+        self._bucket = None
+        self._client_lock = threading.Lock()
+
+    def _connect(self) -> None:
+        with self._client_lock:
+            if self._client is not None:
+                return
+            try:
+                storage = _import_storage()
+                client = storage.Client(project=self.project_id)
+                self._bucket = client.bucket(self.bucket_name)
+                self._client = client
+            except Exception as e:
+                logger.error("Failed to initialize Google Cloud Storage client: %s", e)
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to initialize cloud storage service"
+                )
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._connect()
+        return self._client
 
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self._connect()
+        return self._bucket
+
+    def warm_up(self) -> None:
+        """
+        Create the client and check the bucket exists. Blocks on the network,
+        so run it in a thread
+        
+        Raises:
+            ValueError: If the bucket does not exist
+        """
+        if not self.bucket.exists():
+            raise ValueError(f"Bucket {self.bucket_name} does not exist")
+
+    @timed_gcs_call
     async def download_file(self, filename: str) -> bytes:
         """
         Download a file from Google Cloud Storage as bytes
@@ -64,22 +132,24 @@ class GoogleCloudStorageService:
             
             # Download the file content
             content = blob.download_as_bytes()
-            logger.info(f"Successfully downloaded {filename} from GCS")
+            record_gcs_transfer("download_file", "download", len(content))
+            logger.info("Successfully downloaded %s from GCS", filename)
             return content
             
         except GoogleCloudError as e:
-            logger.error(f"Google Cloud Storage error downloading {filename}: {e}")
+            logger.error("Google Cloud Storage error downloading %s: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to download file from cloud storage: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error downloading {filename}: {e}")
+            logger.error("Unexpected error downloading %s: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail="An unexpected error occurred during file download"
             )
 
+    @timed_gcs_call
     async def download_to_temp_file(self, filename: str) -> str:
         """
         Download a file from Google Cloud Storage to a temporary file
@@ -99,7 +169,7 @@ class GoogleCloudStorageService:
             
             # Create temporary file
             temp_file = tempfile.NamedTemporaryFile(
-                delete=True,
+                delete=False,  # The caller removes the file once done with it
                 suffix=os.path.splitext(filename)[1]  # Preserve original extension
             )
             
@@ -107,16 +177,114 @@ class GoogleCloudStorageService:
             temp_file.write(content)
             temp_file.close()
             
-            logger.info(f"Successfully downloaded {filename} to temp file: {temp_file.name}")
+            logger.info("Successfully downloaded %s to temp file: %s", filename, temp_file.name)
             return temp_file.name
             
         except Exception as e:
-            logger.error(f"Error downloading {filename} to temp file: {e}")
+            logger.error("Error downloading %s to temp file: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to download file to temporary location: {str(e)}"
             )
 
+    @timed_gcs_call
+    async def get_file_info(self, filename: str) -> dict:
+        """
+        Get metadata for a file in Google Cloud Storage without downloading it
+        
+        Args:
+            filename: The name of the file in GCS
+            
+        Returns:
+            dict: size, generation, content_type, updated time and custom
+            metadata of the object
+            
+        Raises:
+            HTTPException: If the file doesn't exist or the lookup fails
+        """
+        try:
+            blob = await asyncio.to_thread(self.bucket.get_blob, filename)
+            
+            if blob is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"File {filename} not found in cloud storage"
+                )
+            
+            return {
+                "size": blob.size,
+                "generation": blob.generation,
+                "content_type": blob.content_type,
+                "updated": blob.updated,
+                "metadata": blob.metadata or {}
+            }
+            
+        except HTTPException:
+            raise
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error getting info for %s: %s", filename, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to get file info from cloud storage: {str(e)}"
+            )
+
+    @timed_gcs_call
+    async def download_range(self, filename: str, start: int, end: int, generation: Optional[int] = None) -> bytes:
+        """
+        Download a byte range of a file from Google Cloud Storage
+        
+        Args:
+            filename: The name of the file in GCS
+            start: First byte offset to read
+            end: Last byte offset to read (inclusive)
+            generation: Optional object generation to read, so all ranges
+                come from the same version of the file
+            
+        Returns:
+            bytes: The requested range of the file content
+            
+        Raises:
+            HTTPException: If download fails
+        """
+        try:
+            blob = self.bucket.blob(filename, generation=generation)
+            content = await asyncio.to_thread(blob.download_as_bytes, start=start, end=end)
+            record_gcs_transfer("download_range", "download", len(content))
+            return content
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error downloading bytes %s-%s of %s: %s", start, end, filename, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to download file range from cloud storage: {str(e)}"
+            )
+
+    @timed_gcs_call
+    async def download_to_path(self, filename: str, path: str, generation: Optional[int] = None) -> None:
+        """
+        Stream a file from Google Cloud Storage to a local path
+        
+        Args:
+            filename: The name of the file in GCS
+            path: Local path to write to
+            generation: Optional object generation to pin the download to
+            
+        Raises:
+            HTTPException: If download fails
+        """
+        try:
+            blob = self.bucket.blob(filename, generation=generation)
+            await asyncio.to_thread(blob.download_to_filename, path)
+            record_gcs_transfer("download_to_path", "download", os.path.getsize(path))
+            logger.info("Successfully downloaded %s to %s", filename, path)
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error downloading %s: %s", filename, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to download file from cloud storage: {str(e)}"
+            )
+
     async def get_video_for_processing(self, filename: str, use_temp_file: bool = True) -> Union[bytes, str]:
         """
         Get a video file for processing with OpenCV
@@ -140,12 +308,13 @@ class GoogleCloudStorageService:
                 return await self.download_file(filename)
                 
         except Exception as e:
-            logger.error(f"Error getting video {filename} for processing: {e}")
+            logger.error("Error getting video %s for processing: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to retrieve video for processing: {str(e)}"
             )
 
+    @timed_gcs_call
     async def upload_file(self, file_content: bytes, filename: str, content_type: Optional[str] = None) -> str:
         """
         Upload a file to Google Cloud Storage bucket
@@ -175,29 +344,31 @@ class GoogleCloudStorageService:
             # Set content type
             blob.content_type = content_type
             
-            # Upload the file content
-            blob.upload_from_string(
+            # Upload the file content off the event loop so concurrent uploads overlap
+            await asyncio.to_thread(
+                blob.upload_from_string,
                 file_content,
                 content_type=content_type,
                 timeout=300  # 5 minutes timeout for large video files
             )
+            record_gcs_transfer("upload_file", "upload", len(file_content))
             
             # Make the blob publicly readable (optional - remove if you want private files)
             # blob.make_public()
             
-            logger.info(f"Successfully uploaded {filename} to bucket {self.bucket_name}")
+            logger.info("Successfully uploaded %s to bucket %s", filename, self.bucket_name)
             
             # Return the public URL or signed URL
             return f"gs://{self.bucket_name}/{filename}"
             
         except GoogleCloudError as e:
-            logger.error(f"Google Cloud Storage error uploading {filename}: {e}")
+            logger.error("Google Cloud Storage error uploading %s: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to upload file to cloud storage: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error uploading {filename}: {e}")
+            logger.error("Unexpected error uploading %s: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail="An unexpected error occurred during file upload"
@@ -214,24 +385,132 @@ class GoogleCloudStorageService:
         Returns:
             str: The GCS URL of the uploaded video
         """
-        # Common video MIME types
-        video_extensions = {
-            '.mp4': 'video/mp4',
-            '.avi': 'video/x-msvideo',
-            '.mov': 'video/quicktime',
-            '.wmv': 'video/x-ms-wmv',
-            '.flv': 'video/x-flv',
-            '.webm': 'video/webm',
-            '.mkv': 'video/x-matroska',
-            '.m4v': 'video/x-m4v'
-        }
+        return await self.upload_file(file_content, filename, video_content_type(filename))
+
+    @timed_gcs_call
+    async def upload_video_from_path(
+        self,
+        file_path: str,
+        filename: str,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Upload a video from a local file without loading it into memory
+        
+        Args:
+            file_path: Path of the local video file
+            filename: The name of the video file in GCS
+            metadata: Optional custom metadata to store on the object
+            
+        Returns:
+            str: The GCS URL of the uploaded video
+            
+        Raises:
+            HTTPException: If upload fails
+        """
+        try:
+            content_type = video_content_type(filename)
+            blob = self.bucket.blob(filename)
+            blob.content_type = content_type
+            if metadata:
+                blob.metadata = metadata
+            
+            await asyncio.to_thread(
+                blob.upload_from_filename,
+                file_path,
+                content_type=content_type,
+                timeout=300  # 5 minutes timeout for large video files
+            )
+            record_gcs_transfer("upload_video_from_path", "upload", os.path.getsize(file_path))
+            
+            logger.info("Successfully uploaded %s to bucket %s", filename, self.bucket_name)
+            return f"gs://{self.bucket_name}/{filename}"
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error uploading %s: %s", filename, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to upload file to cloud storage: {str(e)}"
+            )
+
+    @timed_gcs_call
+    async def list_files(self, prefix: str) -> List[Dict[str, Any]]:
+        """
+        List the objects under a prefix
+        
+        Args:
+            prefix: Name prefix of the objects to list
+            
+        Returns:
+            List of dicts with the name and size of each object
+            
+        Raises:
+            HTTPException: If the listing fails
+        """
+        try:
+            blobs = await asyncio.to_thread(lambda: list(self.client.list_blobs(self.bucket, prefix=prefix)))
+            return [{"name": blob.name, "size": blob.size} for blob in blobs]
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error listing %s: %s", prefix, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to list files in cloud storage: {str(e)}"
+            )
+
+    @timed_gcs_call
+    async def compose_files(self, sources: List[str], filename: str, content_type: Optional[str] = None) -> None:
+        """
+        Concatenate objects into a new object server-side, without
+        downloading them
         
-        # Get file extension
-        file_ext = os.path.splitext(filename.lower())[1]
-        content_type = video_extensions.get(file_ext, 'video/mp4')
+        Args:
+            sources: Names of the objects to concatenate, in order (at most
+                COMPOSE_MAX_SOURCES)
+            filename: The name of the composed object
+            content_type: Optional content type of the composed object
+            
+        Raises:
+            HTTPException: If composing fails
+        """
+        try:
+            blob = self.bucket.blob(filename)
+            blob.content_type = content_type
+            await asyncio.to_thread(blob.compose, [self.bucket.blob(source) for source in sources])
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error composing %s: %s", filename, e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to compose file in cloud storage: {str(e)}"
+            )
+
+    @timed_gcs_call
+    async def delete_files(self, filenames: List[str]) -> None:
+        """
+        Delete several files in one batch, ignoring ones that don't exist
         
-        return await self.upload_file(file_content, filename, content_type)
+        Args:
+            filenames: The names of the files to delete
+        """
+        try:
+            await asyncio.to_thread(
+                self.bucket.delete_blobs,
+                [self.bucket.blob(filename) for filename in filenames],
+                on_error=lambda blob: None
+            )
+            logger.info("Deleted %s files from GCS", len(filenames))
+            
+        except GoogleCloudError as e:
+            logger.error("Google Cloud Storage error deleting %s files: %s", len(filenames), e)
+
+    def get_public_url(self, filename: str) -> str:
+        """
+        Public URL of an object, without checking that it exists
+        """
+        return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
     
+    @timed_gcs_call
     async def get_file_url(self, filename: str) -> Optional[str]:
         """
         Get the public URL of a file in Google Cloud Storage
@@ -247,12 +526,12 @@ class GoogleCloudStorageService:
             
             if blob.exists():
                 # When uniform bucket-level access is enabled, construct URL manually
-                return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
+                return self.get_public_url(filename)
             else:
                 return None
                 
         except Exception as e:
-            logger.error(f"Error getting URL for {filename}: {e}")
+            logger.error("Error getting URL for %s: %s", filename, e)
             return None
     
     def get_signed_url(self, filename: str, expiration_minutes: int = 60) -> str:
@@ -278,12 +557,13 @@ class GoogleCloudStorageService:
             return url
             
         except Exception as e:
-            logger.error(f"Error generating signed URL for {filename}: {e}")
+            logger.error("Error generating signed URL for %s: %s", filename, e)
             raise HTTPException(
                 status_code=500,
                 detail="Failed to generate access URL"
             )
 
+    @timed_gcs_call
     async def delete_file(self, filename: str) -> bool:
         """
         Delete a file from Google Cloud Storage
@@ -299,18 +579,25 @@ class GoogleCloudStorageService:
             
             if blob.exists():
                 blob.delete()
-                logger.info(f"Successfully deleted {filename} from GCS")
+                logger.info("Successfully deleted %s from GCS", filename)
                 return True
             else:
-                logger.warning(f"File {filename} does not exist in GCS")
+                logger.warning("File %s does not exist in GCS", filename)
                 return False
                 
         except GoogleCloudError as e:
-            logger.error(f"Google Cloud Storage error deleting {filename}: {e}")
+            logger.error("Google Cloud Storage error deleting %s: %s", filename, e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error deleting {filename}: {e}")
+            logger.error("Unexpected error deleting %s: %s", filename, e)
             return False
 
+def get_storage_service() -> GoogleCloudStorageService:
+    """Create the storage service selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "local":
+        from .local_storage_service import LocalStorageService
+        return LocalStorageService()
+    return GoogleCloudStorageService()
+
 # Global instance
-gcs_service = GoogleCloudStorageService() 
\ No newline at end of file
+gcs_service = get_storage_service() 
\ No newline at end of file
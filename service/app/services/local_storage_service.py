@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.metrics import record_gcs_transfer, timed_gcs_call
+from .gcs_service import GoogleCloudStorageService, video_content_type
+
+logger = logging.getLogger(__name__)
+
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(os.getcwd(), "local_storage"))
+# Content types and custom metadata live next to the objects, under this directory
+METADATA_DIR = ".metadata"
+
+
+class LocalStorageService(GoogleCloudStorageService):
+    """
+    Stand-in for Google Cloud Storage that keeps objects in a local directory.
+
+    Implements the same interface, including generations (the file's mtime),
+    ranged reads, custom metadata and compose, so the service, benchmarks and
+    load tests can run without a bucket. Select it with STORAGE_BACKEND=local.
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR):
+        self.root = os.path.abspath(root)
+        self.bucket_name = "local"
+        os.makedirs(os.path.join(self.root, METADATA_DIR), exist_ok=True)
+        logger.info("Using local storage in %s", self.root)
+
+    def warm_up(self) -> None:
+        pass
+
+    def _path(self, filename: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, filename))
+        if not path.startswith(self.root + os.sep) or filename.startswith(METADATA_DIR):
+            raise HTTPException(status_code=400, detail=f"Invalid file name {filename}")
+        return path
+
+    def _metadata_path(self, filename: str) -> str:
+        return os.path.join(self.root, METADATA_DIR, f"{filename}.json")
+
+    def _stat(self, filename: str, generation: Optional[int] = None) -> os.stat_result:
+        try:
+            stat = os.stat(self._path(filename))
+        except FileNotFoundError:
+            stat = None
+        if stat is None or (generation is not None and stat.st_mtime_ns != generation):
+            raise HTTPException(
+                status_code=404,
+                detail=f"File {filename} not found in cloud storage"
+            )
+        return stat
+
+    def _write(self, filename: str, write, content_type: Optional[str], metadata: Optional[Dict[str, str]]) -> int:
+        """
+        Write an object through `write(path)` under a temporary name and
+        rename it, so readers never see a partial object
+        """
+        path = self._path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            write(partial_path)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+
+        metadata_path = self._metadata_path(filename)
+        os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+        with open(metadata_path, "w") as f:
+            json.dump({"content_type": content_type, "metadata": metadata or {}}, f)
+        return os.path.getsize(path)
+
+    def _read_metadata(self, filename: str) -> Dict[str, Any]:
+        try:
+            with open(self._metadata_path(filename)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"content_type": None, "metadata": {}}
+
+    def _read_range(self, filename: str, start: int, end: int, generation: Optional[int]) -> bytes:
+        self._stat(filename, generation)
+        with open(self._path(filename), "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def _remove(self, filename: str) -> bool:
+        try:
+            os.unlink(self._path(filename))
+        except FileNotFoundError:
+            return False
+        try:
+            os.unlink(self._metadata_path(filename))
+        except FileNotFoundError:
+            pass
+        return True
+
+    @timed_gcs_call
+    async def download_file(self, filename: str) -> bytes:
+        content = await asyncio.to_thread(self._read_range, filename, 0, self._stat(filename).st_size - 1, None)
+        record_gcs_transfer("download_file", "download", len(content))
+        return content
+
+    @timed_gcs_call
+    async def get_file_info(self, filename: str) -> dict:
+        stat = self._stat(filename)
+        stored = self._read_metadata(filename)
+        return {
+            "size": stat.st_size,
+            "generation": stat.st_mtime_ns,
+            "content_type": stored["content_type"],
+            "updated": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            "metadata": stored["metadata"]
+        }
+
+    @timed_gcs_call
+    async def download_range(self, filename: str, start: int, end: int, generation: Optional[int] = None) -> bytes:
+        content = await asyncio.to_thread(self._read_range, filename, start, end, generation)
+        record_gcs_transfer("download_range", "download", len(content))
+        return content
+
+    @timed_gcs_call
+    async def download_to_path(self, filename: str, path: str, generation: Optional[int] = None) -> None:
+        self._stat(filename, generation)
+        await asyncio.to_thread(shutil.copyfile, self._path(filename), path)
+        record_gcs_transfer("download_to_path", "download", os.path.getsize(path))
+
+    @timed_gcs_call
+    async def upload_file(self, file_content: bytes, filename: str, content_type: Optional[str] = None) -> str:
+        if not content_type:
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        def write(path: str) -> None:
+            with open(path, "wb") as f:
+                f.write(file_content)
+
+        await asyncio.to_thread(self._write, filename, write, content_type, None)
+        record_gcs_transfer("upload_file", "upload", len(file_content))
+        return f"file://{self._path(filename)}"
+
+    @timed_gcs_call
+    async def upload_video_from_path(
+        self,
+        file_path: str,
+        filename: str,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> str:
+        size = await asyncio.to_thread(
+            self._write, filename, lambda path: shutil.copyfile(file_path, path), video_content_type(filename), metadata
+        )
+        record_gcs_transfer("upload_video_from_path", "upload", size)
+        return f"file://{self._path(filename)}"
+
+    @timed_gcs_call
+    async def list_files(self, prefix: str) -> List[Dict[str, Any]]:
+        def walk() -> List[Dict[str, Any]]:
+            files = []
+            for directory, subdirectories, names in os.walk(self.root):
+                if directory == self.root:
+                    subdirectories[:] = [name for name in subdirectories if name != METADATA_DIR]
+                for name in names:
+                    relative = os.path.relpath(os.path.join(directory, name), self.root)
+                    if relative.startswith(prefix) and not name.endswith(".part"):
+                        files.append({"name": relative, "size": os.path.getsize(os.path.join(directory, name))})
+            return sorted(files, key=lambda file: file["name"])
+
+        return await asyncio.to_thread(walk)
+
+    @timed_gcs_call
+    async def compose_files(self, sources: List[str], filename: str, content_type: Optional[str] = None) -> None:
+        for source in sources:
+            self._stat(source)
+
+        def write(path: str) -> None:
+            with open(path, "wb") as destination:
+                for source in sources:
+                    with open(self._path(source), "rb") as f:
+                        shutil.copyfileobj(f, destination)
+
+        await asyncio.to_thread(self._write, filename, write, content_type, None)
+
+    @timed_gcs_call
+    async def delete_files(self, filenames: List[str]) -> None:
+        for filename in filenames:
+            await asyncio.to_thread(self._remove, filename)
+
+    def get_public_url(self, filename: str) -> str:
+        return f"file://{self._path(filename)}"
+
+    @timed_gcs_call
+    async def get_file_url(self, filename: str) -> Optional[str]:
+        return self.get_public_url(filename) if os.path.exists(self._path(filename)) else None
+
+    def get_signed_url(self, filename: str, expiration_minutes: int = 60) -> str:
+        # Local files need no signature
+        return self.get_public_url(filename)
+
+    @timed_gcs_call
+    async def delete_file(self, filename: str) -> bool:
+        return await asyncio.to_thread(self._remove, filename)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# How often resident memory is sampled while a profile is collected
+MEMORY_SAMPLE_SECONDS = 0.02
+
+# Spans go to whatever tracer provider the OpenTelemetry SDK was configured
+# with; without the SDK they are no-ops, without the API they are skipped
+_tracer = trace.get_tracer(__name__) if trace is not None else None
+
+_current_profile: ContextVar[Optional["ProcessingProfile"]] = ContextVar("processing_profile", default=None)
+
+
+def _resident_bytes() -> Optional[int]:
+    """
+    Current resident set size of this process, or None where /proc isn't available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Stage:
+    """
+    One timed stage of processing a video
+    """
+
+    def __init__(self, name: str, start: float, attributes: Dict[str, Any], otel_span: Any = None):
+        self.name = name
+        self.start = start
+        self.seconds = 0.0
+        self.attributes: Dict[str, Any] = {}
+        self._otel_span = otel_span
+        self.set(**attributes)
+
+    def set(self, **attributes: Any) -> None:
+        """
+        Add attributes to the stage and its tracing span
+        """
+        self.attributes.update(attributes)
+        if self._otel_span is not None:
+            for key, value in attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    self._otel_span.set_attribute(key, value)
+
+
+class ProcessingProfile:
+    """
+    Timing and resource profile of one process_video call: the stages it
+    went through, the analyzers' share of the decode pass and the peak
+    resident memory of the process while it ran
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Stage] = []
+        self.analyzers: Dict[str, Dict[str, float]] = {}
+        self.start_rss = _resident_bytes()
+        self.peak_rss = self.start_rss
+        self._sampler: Optional[asyncio.Task] = None
+
+    def add_analyzers(self, analyzers: Dict[str, Dict[str, float]]) -> None:
+        """
+        Add per-analyzer figures from a frame pass report
+        """
+        for operation, figures in analyzers.items():
+            totals = self.analyzers.setdefault(operation, {})
+            for key, value in figures.items():
+                totals[key] = totals.get(key, 0) + value
+
+    async def _sample_memory(self) -> None:
+        while True:
+            rss = _resident_bytes()
+            if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+                self.peak_rss = rss
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+
+    def _stages_named(self, name: str) -> List[Stage]:
+        return [stage for stage in self.stages if stage.name == name]
+
+    def result(self) -> Dict[str, Any]:
+        downloads = self._stages_named("video.download")
+        download_seconds = sum(stage.seconds for stage in downloads)
+        download_bytes = sum(stage.attributes.get("bytes", 0) for stage in downloads)
+
+        passes = self._stages_named("video.frame_pass")
+        decode_seconds = sum(stage.seconds for stage in passes)
+        frames_decoded = sum(stage.attributes.get("frames_decoded", 0) for stage in passes)
+
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'download': {
+                'seconds': download_seconds,
+                'bytes': download_bytes,
+                'bytes_per_second': download_bytes / download_seconds if download_seconds else None
+            },
+            'decode': {
+                'seconds': decode_seconds,
+                'frames': frames_decoded,
+                'fps': frames_decoded / decode_seconds if decode_seconds else None
+            },
+            'analyzers': self.analyzers,
+            'memory': {
+                'start_rss_bytes': self.start_rss,
+                'peak_rss_bytes': self.peak_rss,
+                'peak_increase_bytes': self.peak_rss - self.start_rss if self.peak_rss is not None else None
+            },
+            'stages': [
+                {'name': stage.name, 'start': stage.start, 'seconds': stage.seconds, **stage.attributes}
+                for stage in sorted(self.stages, key=lambda stage: stage.start)
+            ]
+        }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Stage]:
+    """
+    Time a stage as a tracing span and, while a profile is being collected,
+    as a stage of that profile
+    """
+    profile = _current_profile.get()
+    started = time.perf_counter()
+    offset = started - profile.started if profile is not None else 0.0
+    with _tracer.start_as_current_span(name) if _tracer is not None else nullcontext() as otel_span:
+        stage = Stage(name, offset, attributes, otel_span)
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - started
+            if profile is not None:
+                profile.stages.append(stage)
+
+
+def current_profile() -> Optional[ProcessingProfile]:
+    return _current_profile.get()
+
+
+@asynccontextmanager
+async def collect_profile(enabled: bool = True) -> AsyncIterator[Optional[ProcessingProfile]]:
+    """
+    Collect a profile of the stages run inside the context, or nothing if
+    not enabled
+    """
+    if not enabled:
+        yield None
+        return
+
+    profile = ProcessingProfile()
+    token = _current_profile.set(profile)
+    profile._sampler = asyncio.create_task(profile._sample_memory())
+    try:
+        yield profile
+    finally:
+        profile._sampler.cancel()
+        _current_profile.reset(token)
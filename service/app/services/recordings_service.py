@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+from fastapi import BackgroundTasks, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.data.database import session_manager
+from app.data.schemas.recordings import RecordingResponseDto
+from app.repositories.recordings_repository import (
+    delete_recording,
+    get_recording,
+    get_recording_by_content_hash,
+    lock_recordings_by_filename,
+    update_recording
+)
+from app.services.container_probe import ContainerProbeError, probe_container
+from app.services.gcs_service import GoogleCloudStorageService
+from app.services.video_loader import get_video_processor
+
+logger = logging.getLogger(__name__)
+
+# Size of the chunks the upload is streamed to disk in
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploaded recordings are stored under the SHA-256 of their content
+CONTENT_PREFIX = "recordings/sha256"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Recording fields that follow from the file itself, shared by duplicates
+CONTENT_FIELDS = (
+    'filename', 'contentHash', 'fileSize', 'format', 'duration', 'durationMs',
+    'hasAudio', 'width', 'height', 'videoCodec', 'audioCodec', 'thumbnailUrl'
+)
+
+# Recording.format values for containers whose name differs from the extension
+CONTAINER_FORMATS = {
+    'matroska': 'mkv'
+}
+
+
+def content_filename(content_hash: str, extension: str) -> str:
+    """
+    GCS filename of the object holding content with the given hash
+    """
+    return f"{CONTENT_PREFIX}/{content_hash}{extension}"
+
+
+def thumbnail_filename(filename: str) -> str:
+    """
+    GCS filename of the thumbnail belonging to a stored recording
+    """
+    return f"{os.path.splitext(filename)[0]}_thumbnail.jpg"
+
+
+def _write_and_hash(file, hasher, chunk: bytes) -> None:
+    file.write(chunk)
+    hasher.update(chunk)
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def content_fields(recording: RecordingResponseDto) -> Dict[str, Any]:
+    """
+    Fields of an existing recording a new recording with the same content reuses
+    """
+    return {field: getattr(recording, field) for field in CONTENT_FIELDS}
+
+
+def _read_file_range(path: str, start: int, end: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+
+async def probe_local_video(path: str, size: int) -> Optional[Dict[str, Any]]:
+    """
+    Read container metadata from a local video file, or None if it can't be parsed
+    """
+    async def read_range(start: int, end: int) -> bytes:
+        return await asyncio.to_thread(_read_file_range, path, start, end)
+
+    try:
+        return await probe_container(read_range, size)
+    except ContainerProbeError as e:
+        logger.warning("Could not probe uploaded video %s: %s", path, e)
+        return None
+
+
+async def _upload_thumbnail(gcs_service: GoogleCloudStorageService, video_path: str, filename: str) -> Optional[str]:
+    """
+    Create a thumbnail from the first keyframe and upload it, returning its URL
+    """
+    try:
+        video_processor = await asyncio.to_thread(get_video_processor)
+        from app.services.decode_config import decode_config
+
+        thumbnail = await decode_config.run_short(video_processor.encode_first_frame_thumbnail, video_path)
+        if thumbnail is None:
+            logger.warning("Could not decode a frame of %s for its thumbnail", filename)
+            return None
+
+        thumbnail_name = thumbnail_filename(filename)
+        await gcs_service.upload_file(thumbnail, thumbnail_name, content_type='image/jpeg')
+        return gcs_service.get_public_url(thumbnail_name)
+    except Exception as e:
+        logger.warning("Failed to create thumbnail for %s: %s", filename, e)
+        return None
+
+
+async def create_analysis_proxy(gcs_service: GoogleCloudStorageService, video_path: str, filename: str) -> None:
+    """
+    Write the low-resolution analysis proxy of an uploaded video and store it
+    next to the original. Removes video_path when done
+    """
+    proxy_path = f"{os.path.splitext(video_path)[0]}_proxy.mp4"
+    try:
+        # The video stack is imported on first use, in a thread
+        await asyncio.to_thread(get_video_processor)
+        from app.services.analysis_proxy import proxy_filename, proxy_metadata, write_analysis_proxy
+        from app.services.decode_config import decode_config
+
+        # A full-length decode and encode, so it waits for a job slot like analyses do
+        async with decode_config.job_slot():
+            info = await decode_config.run(write_analysis_proxy, video_path, proxy_path)
+        if info is None:
+            logger.warning("Could not create analysis proxy for %s", filename)
+            return
+
+        await gcs_service.upload_video_from_path(proxy_path, proxy_filename(filename), metadata=proxy_metadata(info))
+        logger.info(
+            "Stored analysis proxy of %s: %sx%s at %s fps, %s of %s frames",
+            filename, info['width'], info['height'], info['fps'], info['frames'], info['source_frames']
+        )
+    except Exception as e:
+        logger.warning("Failed to create analysis proxy for %s: %s", filename, e)
+    finally:
+        for path in (video_path, proxy_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+async def finish_assembled_recording(gcs_service: GoogleCloudStorageService, recording_id: int, filename: str) -> None:
+    """
+    Hash a recording that was assembled from uploaded chunks and create its
+    thumbnail and analysis proxy. The recording never passed through this
+    service as one file, so it is downloaded once for all of them.
+
+    If the content turns out to be stored already, the recording is pointed
+    at the existing object and the assembled copy is deleted instead.
+    """
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
+    temp_file.close()
+    try:
+        await gcs_service.download_to_path(filename, temp_file.name)
+        content_hash = await asyncio.to_thread(_hash_file, temp_file.name)
+
+        async with session_manager.session() as db_session:
+            existing = await get_recording_by_content_hash(db_session, content_hash)
+            if existing is not None and existing.filename != filename:
+                await update_recording(db_session, recording_id, content_fields(existing))
+                logger.info("Assembled %s duplicates recording %s, using %s", filename, existing.id, existing.filename)
+                await gcs_service.delete_file(filename)
+                os.unlink(temp_file.name)
+                return
+
+        fields: Dict[str, Any] = {'contentHash': content_hash}
+        thumbnail_url = await _upload_thumbnail(gcs_service, temp_file.name, filename)
+        if thumbnail_url is not None:
+            fields['thumbnailUrl'] = thumbnail_url
+        async with session_manager.session() as db_session:
+            await update_recording(db_session, recording_id, fields)
+    except Exception as e:
+        logger.warning("Failed to finish assembled recording %s: %s", filename, e)
+        os.unlink(temp_file.name)
+        return
+
+    # Removes the downloaded file
+    await create_analysis_proxy(gcs_service, temp_file.name, filename)
+
+
+async def delete_recording_files(gcs_service: GoogleCloudStorageService, filename: str) -> None:
+    """
+    Delete a stored recording along with its thumbnail and analysis proxy
+    """
+    from app.services.analysis_proxy import proxy_filename
+
+    await gcs_service.delete_files([filename, thumbnail_filename(filename), proxy_filename(filename)])
+
+
+async def delete_recording_and_files(
+    gcs_service: GoogleCloudStorageService,
+    db_session: AsyncSession,
+    recording_id: int
+) -> None:
+    """
+    Delete a recording, and its stored files if no other recording uses them.
+
+    The recordings sharing the file stay locked until the row is deleted, and
+    duplicate uploads lock them too before pointing at the file, so a
+    duplicate can't start using files that are being deleted
+    """
+    recording = await get_recording(db_session, recording_id)
+    if recording.filename and await lock_recordings_by_filename(db_session, recording.filename) <= 1:
+        await delete_recording_files(gcs_service, recording.filename)
+    await delete_recording(db_session, recording_id)
+
+
+def metadata_to_recording_fields(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map probed container metadata onto Recording columns
+    """
+    fields: Dict[str, Any] = {
+        'format': CONTAINER_FORMATS.get(metadata['container'], metadata['container']),
+        'hasAudio': metadata['has_audio'],
+        'audioCodec': metadata['audio']['codec'] if metadata['audio'] else None
+    }
+    if metadata['duration_ms'] is not None:
+        fields['durationMs'] = metadata['duration_ms']
+        fields['duration'] = round(metadata['duration_ms'] / 1000)
+    if metadata['video']:
+        fields['width'] = metadata['video']['width']
+        fields['height'] = metadata['video']['height']
+        fields['videoCodec'] = metadata['video']['codec']
+    return fields
+
+
+async def store_recording_upload(
+    gcs_service: GoogleCloudStorageService,
+    db_session: AsyncSession,
+    video: UploadFile,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> Dict[str, Any]:
+    """
+    Stream an uploaded recording to GCS while extracting its metadata and thumbnail
+
+    The upload is spooled to a local file in chunks once and hashed on the
+    way. If a recording with the same content exists, its object and
+    metadata are reused and nothing is uploaded or analyzed. Otherwise the
+    GCS upload (keyed by the hash), the container probe and the
+    first-keyframe thumbnail all work from that file concurrently, so
+    nothing has to be downloaded and decoded later. With background_tasks,
+    the analysis proxy is then written from the same file after the
+    response is sent.
+
+    Args:
+        gcs_service: Storage service to upload to
+        db_session: Session to look up recordings with the same content in
+        video: The uploaded video file
+        background_tasks: Tasks to schedule the analysis proxy on
+
+    Returns:
+        Dict of Recording fields derived from the file (filename,
+        contentHash, fileSize, format, duration, hasAudio, codecs,
+        resolution, thumbnailUrl)
+    """
+    extension = os.path.splitext(video.filename)[1] if video.filename else ".mp4"
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
+    keep_temp_file = False
+    try:
+        file_size = 0
+        hasher = hashlib.sha256()
+        with temp_file:
+            while chunk := await video.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(_write_and_hash, temp_file, hasher, chunk)
+                file_size += len(chunk)
+        content_hash = hasher.hexdigest()
+
+        existing = await get_recording_by_content_hash(db_session, content_hash)
+        if existing is not None:
+            logger.info("Upload duplicates recording %s, reusing %s", existing.id, existing.filename)
+            return content_fields(existing)
+
+        filename = content_filename(content_hash, extension)
+        _, metadata, thumbnail_url = await asyncio.gather(
+            gcs_service.upload_video_from_path(temp_file.name, filename),
+            probe_local_video(temp_file.name, file_size),
+            _upload_thumbnail(gcs_service, temp_file.name, filename)
+        )
+
+        fields: Dict[str, Any] = {'filename': filename, 'contentHash': content_hash, 'fileSize': file_size}
+        if metadata is not None:
+            fields.update(metadata_to_recording_fields(metadata))
+        if thumbnail_url is not None:
+            fields['thumbnailUrl'] = thumbnail_url
+
+        if background_tasks is not None:
+            # The proxy task takes over the spooled file and removes it
+            background_tasks.add_task(create_analysis_proxy, gcs_service, temp_file.name, filename)
+            keep_temp_file = True
+        return fields
+
+    finally:
+        if not keep_temp_file and os.path.exists(temp_file.name):
+            os.unlink(temp_file.name)
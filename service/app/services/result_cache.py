@@ -0,0 +1,60 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+# Processing results kept in memory, least recently used dropped first
+VIDEO_RESULT_CACHE_ENTRIES = int(os.getenv("VIDEO_RESULT_CACHE_ENTRIES", "512"))
+
+
+class ResultCache:
+    """
+    Results of process_video, keyed by the object's GCS generation and the
+    request's parameters, so repeated summaries of a recording (e.g. a
+    reviewer going back to it, or a batch including it again) are neither
+    downloaded nor decoded again. A new version of the object has a new
+    generation, so a result is never stale.
+
+    Cached results are shared; callers must not modify them.
+    """
+
+    def __init__(self, max_entries: int = VIDEO_RESULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, gcs_filename: str, generation: Any, operations: Iterable[str], *options: Hashable) -> Tuple[Hashable, ...]:
+        return (gcs_filename, generation, tuple(sorted(set(operations))), *options)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Dict[str, Any]]:
+        results = self._entries.get(key)
+        if results is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, key: Tuple[Hashable, ...], results: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = results
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit-rate and size metrics
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries
+        }
+
+# Global instance
+result_cache = ResultCache()
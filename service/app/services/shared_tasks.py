@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+
+class SharedTasks:
+    """
+    One task per key for concurrent callers that need the same result, such
+    as a download several requests are waiting for.
+
+    The task runs on its own rather than in the first caller, so a caller
+    going away (a client disconnecting, a cancelled read-ahead) doesn't
+    cancel it for the others. It's cancelled once no caller is waiting for
+    it any more.
+    """
+
+    def __init__(self):
+        # key -> [task, callers waiting]
+        self._tasks: Dict[Hashable, List[Any]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    async def run(self, key: Hashable, start: Callable[[], Awaitable[T]]) -> T:
+        """
+        Wait for the task of `key`, starting it with `start()` if none is running
+        """
+        entry = self._tasks.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(start()), 0]
+            self._tasks[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                # Later callers start afresh instead of joining a cancelled task
+                self._forget(key, entry)
+                task.cancel()
+
+    def _forget(self, key: Hashable, entry: List[Any]) -> None:
+        if self._tasks.get(key) is entry:
+            del self._tasks[key]
@@ -0,0 +1,155 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from .gcs_service import gcs_service
+from .shared_tasks import SharedTasks
+
+# Recordings are read from storage and cached in aligned blocks of this size
+STREAM_BLOCK_BYTES = 1024 * 1024
+STREAM_CACHE_MAX_BYTES = int(os.getenv("STREAM_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+BlockKey = Tuple[str, int, int]
+
+
+class RangeNotSatisfiable(ValueError):
+    """
+    The requested byte range lies outside the object
+    """
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (start, end) byte range.
+
+    Returns None when the whole object should be sent: no header, a unit
+    other than bytes, or multiple ranges (which we don't serve as multipart).
+
+    Raises:
+        RangeNotSatisfiable: If the range starts past the end of the object
+    """
+    if not range_header:
+        return None
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if not first:
+        if length <= 0:
+            raise RangeNotSatisfiable(range_header)
+        return max(0, size - length), size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(range_header)
+    return start, min(end, size - 1)
+
+
+class HotSegmentCache:
+    """
+    In-memory LRU cache of recently streamed blocks of recordings.
+
+    Blocks are keyed by object name, GCS generation and block index, so
+    seeking back in the player or several reviewers watching the same
+    recording are served without going back to storage. Concurrent reads of
+    the same block share one fetch.
+    """
+
+    def __init__(self, max_bytes: int = STREAM_CACHE_MAX_BYTES, block_bytes: int = STREAM_BLOCK_BYTES):
+        self.max_bytes = max_bytes
+        self.block_bytes = block_bytes
+        self._blocks: "OrderedDict[BlockKey, bytes]" = OrderedDict()
+        self._fetches = SharedTasks()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_fetched = 0
+
+    async def read_block(self, filename: str, generation: int, index: int, size: int) -> bytes:
+        """
+        Get one block of an object, from the cache or storage
+        """
+        key = (filename, generation, index)
+        block = self._blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            self._blocks.move_to_end(key)
+            return block
+
+        if key in self._fetches:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return await self._fetches.run(key, lambda: self._fetch_block(key, size))
+
+    async def _fetch_block(self, key: BlockKey, size: int) -> bytes:
+        filename, generation, index = key
+        start = index * self.block_bytes
+        end = min(start + self.block_bytes, size) - 1
+        block = await gcs_service.download_range(filename, start, end, generation=generation)
+        self.bytes_fetched += len(block)
+        self._store(key, block)
+        return block
+
+    def _store(self, key: BlockKey, block: bytes) -> None:
+        if len(block) > self.max_bytes:
+            return
+        self._blocks[key] = block
+        self._total_bytes += len(block)
+        while self._total_bytes > self.max_bytes:
+            _, evicted = self._blocks.popitem(last=False)
+            self._total_bytes -= len(evicted)
+
+    async def iter_range(self, filename: str, generation: int, size: int, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        Yield the bytes start..end (inclusive) of an object block by block,
+        fetching the next block while the current one is being sent
+        """
+        first_block = start // self.block_bytes
+        last_block = end // self.block_bytes
+        next_block: Optional[asyncio.Task] = None
+        try:
+            for index in range(first_block, last_block + 1):
+                if next_block is None:
+                    block = await self.read_block(filename, generation, index, size)
+                else:
+                    block = await next_block
+                next_block = None
+                if index < last_block:
+                    next_block = asyncio.create_task(self.read_block(filename, generation, index + 1, size))
+
+                block_start = index * self.block_bytes
+                yield block[max(start - block_start, 0):end - block_start + 1]
+        finally:
+            # Client went away, don't leave the read-ahead running unobserved
+            if next_block is not None:
+                next_block.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit-rate and size metrics
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'blocks': len(self._blocks),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'bytes_fetched': self.bytes_fetched
+        }
+
+# Global instance
+hot_segment_cache = HotSegmentCache()
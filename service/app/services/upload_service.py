@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from app.data.schemas.uploads import UploadSession, UploadSessionResponseDto
+from app.services.container_probe import ContainerProbeError
+from app.services.gcs_service import COMPOSE_MAX_SOURCES, GoogleCloudStorageService, video_content_type
+from app.services.recordings_service import metadata_to_recording_fields
+from app.services.video_loader import get_video_processor
+
+logger = logging.getLogger(__name__)
+
+# Chunks are staged under this prefix until the upload is completed
+UPLOAD_STAGING_PREFIX = "uploads"
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 ** 2)))
+UPLOAD_MIN_CHUNK_BYTES = 256 * 1024
+UPLOAD_MAX_CHUNK_BYTES = 64 * 1024 ** 2
+# A composite object can have at most 1024 components, so chunks grow for very large files
+UPLOAD_MAX_CHUNKS = 1024
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")))
+# Completion left in "composing" for longer than this was abandoned and may be retried
+UPLOAD_COMPOSE_TIMEOUT = timedelta(minutes=int(os.getenv("UPLOAD_COMPOSE_TIMEOUT_MINUTES", "30")))
+
+
+def staging_prefix(upload_id: str) -> str:
+    return f"{UPLOAD_STAGING_PREFIX}/{upload_id}/"
+
+
+def chunk_filename(upload_id: str, index: int) -> str:
+    """
+    GCS filename of a staged chunk
+    """
+    return f"{staging_prefix(upload_id)}chunk_{index:05d}"
+
+
+def chunk_layout(file_size: int, chunk_size: int | None = None) -> Tuple[int, int]:
+    """
+    Chunk size and count for a file. A requested chunk size is clamped to
+    the allowed range and rounded to a multiple of the minimum
+
+    Raises:
+        ValueError: If the file is empty or too large to upload in chunks
+    """
+    if file_size <= 0:
+        raise ValueError("fileSize must be positive")
+
+    chunk_size = chunk_size or UPLOAD_CHUNK_BYTES
+    chunk_size = max(chunk_size, math.ceil(file_size / UPLOAD_MAX_CHUNKS))
+    chunk_size = math.ceil(chunk_size / UPLOAD_MIN_CHUNK_BYTES) * UPLOAD_MIN_CHUNK_BYTES
+    if chunk_size > UPLOAD_MAX_CHUNK_BYTES:
+        if file_size > UPLOAD_MAX_CHUNK_BYTES * UPLOAD_MAX_CHUNKS:
+            raise ValueError(f"fileSize exceeds the {UPLOAD_MAX_CHUNK_BYTES * UPLOAD_MAX_CHUNKS} byte upload limit")
+        chunk_size = UPLOAD_MAX_CHUNK_BYTES
+    return chunk_size, math.ceil(file_size / chunk_size)
+
+
+def expected_chunk_size(upload: UploadSession, index: int) -> int:
+    """
+    Size chunk `index` must have: the chunk size, except for the last chunk
+    """
+    if index == upload.chunkCount - 1:
+        return upload.fileSize - upload.chunkSize * (upload.chunkCount - 1)
+    return upload.chunkSize
+
+
+def is_expired(upload: UploadSession) -> bool:
+    return upload.createdAt is not None and datetime.now() - upload.createdAt > UPLOAD_SESSION_TTL
+
+
+def compose_stale_before() -> datetime:
+    """
+    Uploads that started composing before this have been abandoned
+    """
+    return datetime.now() - UPLOAD_COMPOSE_TIMEOUT
+
+
+def is_compose_abandoned(upload: UploadSession) -> bool:
+    return (
+        upload.status == "composing"
+        and upload.composingSince is not None
+        and upload.composingSince < compose_stale_before()
+    )
+
+
+async def received_chunks(gcs_service: GoogleCloudStorageService, upload: UploadSession) -> List[int]:
+    """
+    Indices of the chunks staged in storage with their expected size
+    """
+    prefix = f"{staging_prefix(upload.id)}chunk_"
+    received = []
+    for file in await gcs_service.list_files(prefix):
+        try:
+            index = int(file["name"][len(prefix):])
+        except ValueError:
+            continue
+        if 0 <= index < upload.chunkCount and file["size"] == expected_chunk_size(upload, index):
+            received.append(index)
+    return sorted(received)
+
+
+def received_ranges(upload: UploadSession, chunks: List[int]) -> List[Tuple[int, int]]:
+    """
+    Merge received chunks into inclusive byte ranges of the file
+    """
+    ranges: List[Tuple[int, int]] = []
+    for index in chunks:
+        start = index * upload.chunkSize
+        end = start + expected_chunk_size(upload, index) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+async def upload_status(gcs_service: GoogleCloudStorageService, upload: UploadSession) -> UploadSessionResponseDto:
+    """
+    An upload session together with what has been received so far
+    """
+    if upload.status == "completed":
+        # Staged chunks are deleted once they have been assembled
+        chunks = list(range(upload.chunkCount))
+    else:
+        chunks = await received_chunks(gcs_service, upload)
+    received = set(chunks)
+    return UploadSessionResponseDto(
+        uploadId=upload.id,
+        filename=upload.filename,
+        fileSize=upload.fileSize,
+        chunkSize=upload.chunkSize,
+        chunkCount=upload.chunkCount,
+        status=upload.status,
+        receivedChunks=chunks,
+        missingChunks=[index for index in range(upload.chunkCount) if index not in received],
+        receivedBytes=sum(expected_chunk_size(upload, index) for index in chunks),
+        receivedRanges=received_ranges(upload, chunks),
+        recordingId=upload.recordingId,
+        createdAt=upload.createdAt
+    )
+
+
+async def compose_upload(gcs_service: GoogleCloudStorageService, upload: UploadSession) -> None:
+    """
+    Assemble the staged chunks into the recording with server-side compose.
+
+    Compose takes at most COMPOSE_MAX_SOURCES objects, so larger uploads are
+    composed in levels, each level's groups in parallel. No chunk data
+    passes through this service.
+    """
+    sources = [chunk_filename(upload.id, index) for index in range(upload.chunkCount)]
+    level = 0
+    while len(sources) > COMPOSE_MAX_SOURCES:
+        groups = [sources[i:i + COMPOSE_MAX_SOURCES] for i in range(0, len(sources), COMPOSE_MAX_SOURCES)]
+        composed = [f"{staging_prefix(upload.id)}compose_{level}_{n:05d}" for n in range(len(groups))]
+        await asyncio.gather(*(
+            gcs_service.compose_files(group, name) for group, name in zip(groups, composed)
+        ))
+        sources = composed
+        level += 1
+
+    await gcs_service.compose_files(sources, upload.filename, video_content_type(upload.filename))
+    logger.info("Composed %s from %s chunks in %s level(s)", upload.filename, upload.chunkCount, level + 1)
+
+
+async def assemble_upload(gcs_service: GoogleCloudStorageService, upload: UploadSession) -> Dict[str, Any]:
+    """
+    Compose an upload's chunks and probe the result with ranged reads
+
+    Returns:
+        Dict of Recording fields derived from the file (fileSize and, if the
+        container could be parsed, format, duration, audio, codecs, resolution)
+    """
+    await compose_upload(gcs_service, upload)
+
+    fields: Dict[str, Any] = {'fileSize': upload.fileSize}
+    try:
+        video_processor = await asyncio.to_thread(get_video_processor)
+        metadata = await video_processor.probe_video(upload.filename)
+        fields.update(metadata_to_recording_fields(metadata))
+    except ContainerProbeError as e:
+        logger.warning("Could not probe assembled upload %s: %s", upload.filename, e)
+    return fields
+
+
+async def discard_staged_chunks(gcs_service: GoogleCloudStorageService, upload_id: str) -> None:
+    """
+    Delete everything staged for an upload
+    """
+    files = await gcs_service.list_files(staging_prefix(upload_id))
+    if files:
+        await gcs_service.delete_files([file["name"] for file in files])
@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .gcs_service import gcs_service
+from .profiling import span
+from .shared_tasks import SharedTasks
+
+logger = logging.getLogger(__name__)
+
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "delphi-video-cache"))
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+# Suffix of files that are still being downloaded
+PARTIAL_SUFFIX = ".part"
+# Each server worker process caches in its own subdirectory, named after its pid
+WORKER_DIR_PREFIX = "worker-"
+# Directories of stopped workers that no new worker took over within this
+# long are removed
+STALE_WORKER_DIR_SECONDS = 3600
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class VideoCache:
+    """
+    Size-bounded local disk cache of downloaded recordings.
+
+    Entries are keyed by object name and GCS generation, so a cached file is
+    never stale: an overwritten object gets a new generation and a new key.
+    Least recently used entries are evicted once the byte budget is exceeded,
+    except while a caller holds them open. Concurrent requests for the same
+    object share one download, and files only appear under their final name
+    once fully written.
+
+    Each server worker process keeps its files in its own subdirectory of
+    the cache directory, with its own index and budget, so eviction never
+    removes a file another worker is reading. A worker taking the place of
+    one that stopped takes over its directory and files.
+    """
+
+    def __init__(self, cache_dir: str = VIDEO_CACHE_DIR, max_bytes: int = VIDEO_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # key -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._leases: Dict[str, int] = {}
+        self._downloads = SharedTasks()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.bytes_downloaded = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = self._claim_worker_dir(cache_dir)
+        self._load_existing()
+
+    def _claim_worker_dir(self, root_dir: str) -> str:
+        """
+        This process's subdirectory of root_dir. The directory of a stopped
+        worker is renamed to it if there is one, so the cache stays warm
+        across worker restarts; directories of stopped workers that nobody
+        took over for long are removed
+        """
+        own_dir = os.path.join(root_dir, f"{WORKER_DIR_PREFIX}{os.getpid()}")
+        stopped = []
+        for name in os.listdir(root_dir):
+            path = os.path.join(root_dir, name)
+            try:
+                pid = int(name[len(WORKER_DIR_PREFIX):]) if name.startswith(WORKER_DIR_PREFIX) else None
+                if pid is not None and path != own_dir and not _process_running(pid):
+                    stopped.append((os.stat(path).st_mtime, path))
+            except (ValueError, FileNotFoundError):
+                continue
+
+        # The most recently used directory is taken over first
+        for mtime, path in sorted(stopped, reverse=True):
+            if not os.path.exists(own_dir):
+                try:
+                    # Atomic, so of several workers starting at once only one takes it over
+                    os.rename(path, own_dir)
+                    continue
+                except OSError:
+                    pass
+            if time.time() - mtime > STALE_WORKER_DIR_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(own_dir, exist_ok=True)
+        return own_dir
+
+    def _load_existing(self) -> None:
+        """
+        Index files left by a previous process and drop interrupted downloads
+        """
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(PARTIAL_SUFFIX):
+                os.unlink(path)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _key(self, filename: str, generation: Any) -> str:
+        digest = hashlib.sha256(f"{filename}#{generation}".encode()).hexdigest()[:32]
+        return f"{digest}{os.path.splitext(filename)[1]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    @asynccontextmanager
+    async def open(self, filename: str, file_info: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Get a local path for a GCS object, downloading it on a cache miss
+
+        Pass the object's file_info if the caller already looked it up, to
+        save a metadata request. The file is guaranteed to stay on disk
+        until the context exits.
+        """
+        if file_info is None:
+            file_info = await gcs_service.get_file_info(filename)
+        key = self._key(filename, file_info['generation'])
+
+        self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            await self._ensure(key, filename, file_info)
+            yield self._path(key)
+        finally:
+            self._leases[key] -= 1
+            if not self._leases[key]:
+                del self._leases[key]
+            self._evict()
+
+    async def _ensure(self, key: str, filename: str, file_info: Dict[str, Any]) -> None:
+        if key in self._entries:
+            try:
+                os.utime(self._path(key))
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return
+            except FileNotFoundError:
+                # Removed from disk behind the cache's back
+                self._total_bytes -= self._entries.pop(key)
+
+        download = lambda: self._download(key, filename, file_info)
+        if key in self._downloads:
+            # Another request is already downloading this object
+            self.coalesced += 1
+            with span("video.download_wait", filename=filename):
+                await self._downloads.run(key, download)
+            return
+
+        self.misses += 1
+        await self._downloads.run(key, download)
+
+    async def _download(self, key: str, filename: str, file_info: Dict[str, Any]) -> None:
+        size = file_info['size'] or 0
+        self._evict(incoming_bytes=size)
+
+        # Write under a temporary name and rename, so a crash never leaves a
+        # truncated file under the final name
+        partial_path = f"{self._path(key)}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+        try:
+            with span("video.download", filename=filename, bytes=size, destination="cache"):
+                await gcs_service.download_to_path(filename, partial_path, generation=file_info['generation'])
+            os.replace(partial_path, self._path(key))
+        finally:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+
+        size = os.path.getsize(self._path(key))
+        self._entries[key] = size
+        self._total_bytes += size
+        self.bytes_downloaded += size
+        logger.info("Cached %s (%s bytes) as %s", filename, size, key)
+
+    def _evict(self, incoming_bytes: int = 0) -> None:
+        """
+        Remove least recently used entries that aren't in use until the
+        cache (plus an upcoming download) fits in the byte budget
+        """
+        for key in list(self._entries):
+            if self._total_bytes + incoming_bytes <= self.max_bytes:
+                break
+            if self._leases.get(key):
+                continue
+            size = self._entries.pop(key)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit-rate and size metrics
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'bytes_downloaded': self.bytes_downloaded
+        }
+
+# Global instance
+video_cache = VideoCache()
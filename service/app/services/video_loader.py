@@ -0,0 +1,39 @@
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .video_processor import VideoProcessor
+
+_lock = threading.Lock()
+_video_processor = None
+
+
+def get_video_processor() -> "VideoProcessor":
+    """
+    The video processor. The video stack (OpenCV, numpy) is imported and
+    decoding configured the first time it's needed, not when the app is
+    imported; it blocks while it does, so call it from a thread early on
+    """
+    global _video_processor
+    if _video_processor is None:
+        with _lock:
+            if _video_processor is None:
+                from .decode_config import decode_config
+                from .video_processor import video_processor
+
+                # Split the OpenCV thread budget among concurrent video jobs
+                decode_config.apply()
+                _video_processor = video_processor
+    return _video_processor
+
+
+def shutdown_video_processor() -> None:
+    """
+    Stop the video processor's worker processes and CPU pool, if it was ever
+    loaded
+    """
+    if _video_processor is not None:
+        from .decode_config import decode_config
+
+        _video_processor.shutdown()
+        decode_config.shutdown()
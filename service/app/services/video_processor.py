@@ -1,15 +1,67 @@
+import asyncio
+import bisect
+import multiprocessing
 import cv2
-import numpy as np
 import os
 import logging
-import tempfile
-from typing import List, Dict, Any, Literal, Optional, Tuple
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
+from app.data.schemas.video_processing import SUMMARY_OPERATIONS, FrameFormat, VideoOperation
+from app.metrics import record_video_frames
 from .gcs_service import gcs_service
+from .result_cache import result_cache
+from .video_cache import video_cache
+from .decode_config import decode_config
+from .analysis_proxy import PROXY_OPERATIONS, parse_proxy_metadata, proxy_filename, proxy_source_frame
+from .container_probe import ContainerProbeError, probe_container
+from .frame_analyzers import analyze_segment, build_frame_analyzers, merge_pass_reports, run_frame_pass
+from .profiling import collect_profile, current_profile, span
 
 logger = logging.getLogger(__name__)
 
-VideoOperation = Literal["extract_frames", "detect_motion", "generate_thumbnail", "analyze_content", "extract_audio_info"]
+# Operations that need the decoded video; the rest only need container metadata
+DECODE_OPERATIONS = {"extract_frames", "detect_motion", "generate_thumbnail", "analyze_content"}
+
+# Upper bound on frames a single extraction request may ask for
+MAX_EXTRACTED_FRAMES = 100
+# Frame gaps up to this size are skipped with grab(); larger gaps seek instead
+SEEK_GRAB_THRESHOLD = 48
+MAX_PARALLEL_FRAME_UPLOADS = 8
+THUMBNAIL_SIZE = (320, 240)
+
+# Videos at least this long are analyzed in parallel time segments
+SEGMENT_MIN_VIDEO_SECONDS = float(os.getenv("VIDEO_SEGMENT_MIN_VIDEO_SECONDS", "300"))
+# Segments are never shorter than this, so per-worker startup stays negligible
+SEGMENT_MIN_SECONDS = 60
+ANALYSIS_WORKERS = int(os.getenv("VIDEO_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+
+# Videos up to this size are decoded from memory instead of the disk cache (0 disables)
+IN_MEMORY_MAX_BYTES = int(os.getenv("VIDEO_IN_MEMORY_MAX_BYTES", str(32 * 1024 ** 2)))
+
+FRAME_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'webp': 'image/webp'
+}
+FRAME_ENCODE_PARAMS = {
+    'jpg': [cv2.IMWRITE_JPEG_QUALITY, 85],
+    'webp': [cv2.IMWRITE_WEBP_QUALITY, 80]
+}
+
+@asynccontextmanager
+async def _memory_file(name: str) -> AsyncIterator[str]:
+    """
+    Create an anonymous in-memory file and yield a path other processes can open
+
+    The path lives under /proc, so OpenCV, FFmpeg and the segment workers can
+    read the file like any other, but it never touches a disk.
+    """
+    fd = os.memfd_create(name)
+    try:
+        yield f"/proc/{os.getpid()}/fd/{fd}"
+    finally:
+        os.close(fd)
 
 class VideoProcessor:
     """
@@ -18,249 +70,590 @@ class VideoProcessor:
     
     def __init__(self):
         self.supported_formats = ['.mp4', '.avi', '.mov', '.webm', '.mkv']
+        # Skip analyzer work on frames that are unchanged from the previous one
+        self.deduplicate_frames = True
+        # Run motion, content and thumbnails on the low-res proxy when there is one
+        self.use_analysis_proxy = True
+        # Long videos are split into segments analyzed by this many processes
+        self.analysis_workers = ANALYSIS_WORKERS
+        self._segment_pool: Optional[ProcessPoolExecutor] = None
+        # memfd_create is Linux only; elsewhere every video goes through the disk cache
+        self.in_memory_max_bytes = IN_MEMORY_MAX_BYTES if hasattr(os, 'memfd_create') else 0
+
+    def _plan_segments(self, total_frames: int, fps: float, keyframes: Optional[List[int]]) -> List[Tuple[int, Optional[int]]]:
+        """
+        Split a long video into [start, end) frame ranges for parallel analysis,
+        with every boundary moved back onto a keyframe so seeking is cheap
+        """
+        if self.analysis_workers < 2 or fps <= 0 or total_frames <= 0:
+            return [(0, None)]
+        duration = total_frames / fps
+        if duration < SEGMENT_MIN_VIDEO_SECONDS:
+            return [(0, None)]
+
+        segment_count = max(1, min(self.analysis_workers, int(duration // SEGMENT_MIN_SECONDS)))
+        boundaries = []
+        for i in range(1, segment_count):
+            boundary = total_frames * i // segment_count
+            if keyframes:
+                position = bisect.bisect_right(keyframes, boundary) - 1
+                boundary = keyframes[position] if position >= 0 else 0
+            if boundary > (boundaries[-1] if boundaries else 0):
+                boundaries.append(boundary)
+
+        starts = [0] + boundaries
+        ends: List[Optional[int]] = boundaries + [None]
+        return list(zip(starts, ends))
+
+    async def _run_segmented_pass(
+        self,
+        video_path: str,
+        operations: List[VideoOperation],
+        fps: float,
+        total_frames: int,
+        segments: List[Tuple[int, Optional[int]]],
+        motion_detail: bool = False
+    ) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Analyze the segments in worker processes and merge them in order
+        """
+        if self._segment_pool is None:
+            # spawn keeps the workers free of the event loop and GCS client state
+            self._segment_pool = ProcessPoolExecutor(
+                max_workers=self.analysis_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+        # The workers share the job's part of the thread budget
+        worker_threads = decode_config.worker_threads(min(len(segments), self.analysis_workers))
+        loop = asyncio.get_running_loop()
+        segment_results = await asyncio.gather(*[
+            loop.run_in_executor(
+                self._segment_pool,
+                analyze_segment,
+                video_path,
+                list(operations),
+                fps,
+                total_frames,
+                start_frame,
+                end_frame,
+                self.deduplicate_frames,
+                worker_threads,
+                motion_detail
+            )
+            for start_frame, end_frame in segments
+        ])
+
+        analyzers, first_report = segment_results[0]
+        for segment_analyzers, _ in segment_results[1:]:
+            for analyzer, segment_analyzer in zip(analyzers, segment_analyzers):
+                analyzer.merge(segment_analyzer)
+
+        report = merge_pass_reports([report for _, report in segment_results])
+        report['segments'] = len(segments)
+        return analyzers, report
     
-    async def process_video(self, gcs_filename: str, operations: List[VideoOperation]) -> Dict[str, Any]:
+    async def process_video(
+        self,
+        gcs_filename: str,
+        operations: List[VideoOperation],
+        frame_count: int = 10,
+        frame_format: FrameFormat = "jpg",
+        motion_detail: bool = False,
+        profile: bool = False
+    ) -> Dict[str, Any]:
         """
         Process a video from GCS with specified operations
         
+        Every stage is emitted as a tracing span.
+        
         Args:
             gcs_filename: The filename in GCS
             operations: List of operations to perform
+            frame_count: Number of key frames to extract for extract_frames
+            frame_format: Image format for extracted frames
+            motion_detail: Include every motion frame in detect_motion results,
+                not just the merged intervals
+            profile: Add a 'profile' with download, decode, per-analyzer and
+                memory figures and the timing of every stage
             
         Returns:
             Dict containing processing results
         """
         try:
-            # Download video to temp file
-            temp_video_path = await gcs_service.get_video_for_processing(gcs_filename, use_temp_file=True)
-            
-            results = {}
-            
-            # Open video
-            cap = cv2.VideoCapture(temp_video_path)
-            if not cap.isOpened():
-                raise HTTPException(status_code=400, detail="Could not open video file")
-            
-            try:
-                # Get video properties
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                duration = frame_count / fps if fps > 0 else 0
-                
-                results['video_info'] = {
-                    'fps': fps,
-                    'frame_count': frame_count,
-                    'width': width,
-                    'height': height,
-                    'duration': duration,
-                    'resolution': f"{width}x{height}"
-                }
-                
-                # Perform requested operations
-                for operation in operations:
-                    if operation == 'extract_frames':
-                        results['frames'] = await self._extract_frames(cap, temp_video_path)
-                    elif operation == 'detect_motion':
-                        results['motion_detection'] = await self._detect_motion(cap)
-                    elif operation == 'generate_thumbnail':
-                        results['thumbnail'] = await self._generate_thumbnail(cap, gcs_filename)
-                    elif operation == 'analyze_content':
-                        results['content_analysis'] = await self._analyze_content(cap)
-                    elif operation == 'extract_audio_info':
-                        results['audio_info'] = await self._extract_audio_info(temp_video_path)
-                
-            finally:
-                cap.release()
-                
-            # Clean up temp file
-            if os.path.exists(temp_video_path):
-                os.unlink(temp_video_path)
-            
+            async with collect_profile(profile) as processing_profile:
+                with span("video.process", filename=gcs_filename, operations=",".join(operations)) as stage:
+                    file_info = await gcs_service.get_file_info(gcs_filename)
+                    key = result_cache.key(
+                        gcs_filename, file_info['generation'], operations, frame_count, frame_format, motion_detail
+                    )
+                    # Profiles measure the processing, so they never come from the cache
+                    results = None if profile else result_cache.get(key)
+                    stage.set(cached=results is not None)
+                    if results is None:
+                        results = await self._process_video(
+                            gcs_filename, file_info, operations, frame_count, frame_format, motion_detail
+                        )
+                        result_cache.put(key, results)
+                if processing_profile is not None:
+                    results = {**results, 'profile': processing_profile.result()}
             return results
             
         except Exception as e:
-            logger.error(f"Error processing video {gcs_filename}: {e}")
+            logger.error("Error processing video %s: %s", gcs_filename, e)
             raise HTTPException(status_code=500, detail=f"Video processing failed: {str(e)}")
-    
-    async def _extract_frames(self, cap: cv2.VideoCapture, video_path: str) -> Dict[str, Any]:
+
+    async def _process_video(
+        self,
+        gcs_filename: str,
+        file_info: Dict[str, Any],
+        operations: List[VideoOperation],
+        frame_count: int,
+        frame_format: FrameFormat,
+        motion_detail: bool
+    ) -> Dict[str, Any]:
+        """
+        Probe the video and run the operations on the original and its proxy
+        """
+        with span("video.probe"):
+            probe = await self._probe_or_none(gcs_filename, include_keyframes=True, file_info=file_info)
+
+        # Motion, content and thumbnails use the low-res proxy when there is one
+        proxy = None
+        if self.use_analysis_proxy and any(op in PROXY_OPERATIONS for op in operations):
+            with span("video.proxy_lookup") as stage:
+                proxy = await self._analysis_proxy(gcs_filename)
+                stage.set(found=proxy is not None)
+        proxy_operations = [op for op in operations if op in PROXY_OPERATIONS] if proxy else []
+        source_operations = [op for op in operations if op not in proxy_operations]
+
+        # Container headers, or failing those the proxy's record of its source,
+        # answer metadata-only requests without downloading the original
+        if (probe is not None or proxy is not None) and not any(op in DECODE_OPERATIONS for op in source_operations):
+            if probe is not None:
+                results = {'video_info': self._video_info_from_probe(probe)}
+            else:
+                results = {'video_info': self._video_info_from_proxy(proxy[1])}
+            if 'extract_audio_info' in source_operations:
+                results['audio_info'] = self._extract_audio_info(probe)
+        else:
+            async with self._local_video(gcs_filename, file_info) as video_path, decode_config.job_slot():
+                results = await self._process_local_video(
+                    video_path, gcs_filename, source_operations, probe, frame_count, frame_format, motion_detail
+                )
+
+        if proxy is not None:
+            proxy_file_info, proxy_info = proxy
+            async with self._local_video(proxy_filename(gcs_filename), proxy_file_info) as proxy_path, decode_config.job_slot():
+                proxy_results = await self._process_local_video(
+                    proxy_path, gcs_filename, proxy_operations, None, frame_count, frame_format, motion_detail
+                )
+            results.update(self._map_proxy_results(proxy_results, proxy_info))
+
+        return results
+
+    async def _analysis_proxy(self, gcs_filename: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        File info and proxy info of the video's analysis proxy, or None if it has none
+        """
+        try:
+            file_info = await gcs_service.get_file_info(proxy_filename(gcs_filename))
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+        proxy_info = parse_proxy_metadata(file_info['metadata'])
+        if proxy_info is None:
+            logger.warning("Ignoring analysis proxy of %s without proxy metadata", gcs_filename)
+            return None
+        return file_info, proxy_info
+
+    def _map_proxy_results(self, results: Dict[str, Any], proxy_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Translate frame numbers in results computed on the proxy to frames of
+        the original video. Timestamps already match
+        """
+        def source_frame(proxy_frame: int) -> int:
+            return proxy_source_frame(proxy_frame, proxy_info['source_fps'], proxy_info['fps'])
+
+        # video_info describes the original, not the proxy
+        results.pop('video_info', None)
+
+        motion = results.get('motion_detection')
+        if motion:
+            for interval in motion['motion_intervals']:
+                interval['start_frame'] = source_frame(interval['start_frame'])
+                interval['end_frame'] = source_frame(interval['end_frame'])
+            for frame in motion.get('motion_frames', []):
+                frame['frame_number'] = source_frame(frame['frame_number'])
+
+        content = results.get('content_analysis')
+        if content:
+            content['sample_interval'] = max(1, round(content['sample_interval'] * proxy_info['source_fps'] / proxy_info['fps']))
+
+        results['analysis_proxy'] = {
+            'resolution': f"{proxy_info['width']}x{proxy_info['height']}",
+            'fps': proxy_info['fps']
+        }
+        return results
+
+    @asynccontextmanager
+    async def _local_video(self, gcs_filename: str, file_info: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Local path to decode a video from, in memory for short clips and from
+        the disk cache otherwise
+        """
+        if file_info['size'] is not None and file_info['size'] <= self.in_memory_max_bytes:
+            # Short clips are downloaded straight into memory and decoded from there
+            async with _memory_file(os.path.basename(gcs_filename)) as video_path:
+                with span("video.download", filename=gcs_filename, bytes=file_info['size'], destination="memory"):
+                    await gcs_service.download_to_path(gcs_filename, video_path, generation=file_info['generation'])
+                yield video_path
+        else:
+            # Reuse a locally cached copy, downloading it only on a miss
+            async with video_cache.open(gcs_filename, file_info) as video_path:
+                yield video_path
+
+    async def _process_local_video(
+        self,
+        video_path: str,
+        gcs_filename: str,
+        operations: List[VideoOperation],
+        probe: Optional[Dict[str, Any]],
+        frame_count: int,
+        frame_format: FrameFormat,
+        motion_detail: bool = False
+    ) -> Dict[str, Any]:
         """
-        Extract key frames from video
+        Run the requested operations on a local copy of the video
         """
-        frames = []
-        frame_interval = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / 10))  # Extract 10 frames
+        results = {}
         
-        frame_idx = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            if frame_idx % frame_interval == 0:
-                # Convert frame to base64 for storage
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_data = buffer.tobytes()
-                
-                frames.append({
-                    'frame_number': frame_idx,
-                    'timestamp': frame_idx / cap.get(cv2.CAP_PROP_FPS),
-                    'size': len(frame_data)
-                })
+        # Open video
+        cap = decode_config.open_capture(video_path)
+        if not cap.isOpened():
+            raise HTTPException(status_code=400, detail="Could not open video file")
+        
+        try:
+            # Get video properties
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            duration = total_frames / fps if fps > 0 else 0
+            
+            results['video_info'] = {
+                'fps': fps,
+                'frame_count': total_frames,
+                'width': width,
+                'height': height,
+                'duration': duration,
+                'resolution': f"{width}x{height}"
+            }
+            if probe is not None:
+                # Container duration is exact; frame count based ones aren't for VFR video
+                probe_info = self._video_info_from_probe(probe)
+                for key in ('duration', 'duration_ms', 'codec', 'container'):
+                    if probe_info[key] is not None:
+                        results['video_info'][key] = probe_info[key]
+                # Browser WebM often reports a bogus frame count to the decoder
+                if total_frames <= 0 and probe_info['frame_count']:
+                    total_frames = probe_info['frame_count']
+                    results['video_info']['frame_count'] = total_frames
+            
+            keyframes = probe['video'].get('keyframes') if probe and probe['video'] else None
+
+            # Frame-by-frame analyzers share a single decode pass
+            analyzers = build_frame_analyzers(operations, fps, total_frames, motion_detail)
+            if analyzers:
+                segments = self._plan_segments(total_frames, fps, keyframes)
+                with span("video.frame_pass", operations=",".join(a.operation for a in analyzers), segments=len(segments)) as stage:
+                    if len(segments) > 1:
+                        analyzers, report = await self._run_segmented_pass(
+                            video_path, operations, fps, total_frames, segments, motion_detail
+                        )
+                    else:
+                        report = await decode_config.run(
+                            run_frame_pass, cap, analyzers, self.deduplicate_frames
+                        )
+                    stage.set(frames_decoded=report['frames_decoded'])
+
+                # Per-analyzer figures only go into profiles
+                analyzer_figures = report.pop('analyzers')
+                processing_profile = current_profile()
+                if processing_profile is not None:
+                    processing_profile.add_analyzers(analyzer_figures)
+                results['deduplication'] = report
+
+                for analyzer in analyzers:
+                    record_video_frames(analyzer.operation, report['frames_decoded'], stage.seconds)
+                    results[analyzer.result_key] = analyzer.result()
+
+            # Perform the remaining requested operations
+            for operation in operations:
+                if operation == 'extract_frames':
+                    with span("video.extract_frames", frame_count=frame_count):
+                        results['frames'] = await self._extract_frames(
+                            cap, gcs_filename, total_frames, frame_count, frame_format, keyframes
+                        )
+                elif operation == 'generate_thumbnail':
+                    with span("video.generate_thumbnail"):
+                        results['thumbnail'] = await self._generate_thumbnail(cap, gcs_filename, total_frames, keyframes)
+                elif operation == 'extract_audio_info':
+                    results['audio_info'] = self._extract_audio_info(probe)
             
-            frame_idx += 1
+        finally:
+            cap.release()
         
+        return results
+    
+    async def _extract_frames(
+        self,
+        cap: cv2.VideoCapture,
+        gcs_filename: str,
+        total_frames: int,
+        frame_count: int = 10,
+        frame_format: FrameFormat = "jpg",
+        keyframes: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract key frames at evenly spaced timestamps and upload them to GCS.
+        With fast seek enabled the timestamps are moved back onto keyframes
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = max(1, min(frame_count, MAX_EXTRACTED_FRAMES))
+        frame_interval = max(1, total_frames // frame_count)
+        target_frames = sorted({
+            decode_config.seek_target(min(total_frames - 1, i * frame_interval), keyframes)
+            for i in range(frame_count)
+        }) if total_frames > 0 else []
+
+        # Seeking and encoding are blocking, so keep them off the event loop
+        encoded_frames = await decode_config.run(
+            self._read_encoded_frames, cap, target_frames, frame_format
+        )
+
+        base_name = os.path.splitext(gcs_filename)[0]
+        content_type = FRAME_CONTENT_TYPES[frame_format]
+        upload_slots = asyncio.Semaphore(MAX_PARALLEL_FRAME_UPLOADS)
+
+        async def upload_frame(frame_number: int, frame_data: bytes) -> Dict[str, Any]:
+            frame_filename = f"{base_name}_frames/frame_{frame_number:06d}.{frame_format}"
+            async with upload_slots:
+                await gcs_service.upload_file(frame_data, frame_filename, content_type=content_type)
+            return {
+                'frame_number': frame_number,
+                'timestamp': frame_number / fps if fps > 0 else 0,
+                'size': len(frame_data),
+                'filename': frame_filename
+            }
+
+        frames = await asyncio.gather(*[
+            upload_frame(frame_number, frame_data)
+            for frame_number, frame_data in encoded_frames
+        ])
+
         return {
             'total_frames_extracted': len(frames),
             'frame_interval': frame_interval,
+            'format': frame_format,
             'frames': frames
         }
-    
-    async def _detect_motion(self, cap: cv2.VideoCapture) -> Dict[str, Any]:
+
+    def _read_encoded_frames(
+        self,
+        cap: cv2.VideoCapture,
+        target_frames: List[int],
+        frame_format: FrameFormat
+    ) -> List[Tuple[int, bytes]]:
         """
-        Detect motion in video
+        Decode only the target frames, skipping short gaps with grab() and
+        seeking over long ones, and encode each one as an image
         """
-        motion_frames = []
-        prev_frame = None
-        motion_threshold = 30
-        
-        frame_idx = 0
-        while True:
-            ret, frame = cap.read()
+        encoded_frames = []
+        encode_params = FRAME_ENCODE_PARAMS[frame_format]
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+        for target in target_frames:
+            gap = target - position
+            if 0 <= gap <= SEEK_GRAB_THRESHOLD:
+                # grab() demuxes and decodes without the costly colour
+                # conversion; all() stops at the first one that fails
+                grabbed = all(cap.grab() for _ in range(gap))
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                grabbed = True
+
+            # After a failed grab or read the position no longer matches the
+            # counter, so any later frame would be read under the wrong number
+            ret, frame = cap.read() if grabbed else (False, None)
             if not ret:
+                logger.warning("Could not read frame %s, stopping extraction", target)
                 break
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-            
-            if prev_frame is not None:
-                # Calculate frame difference
-                frame_delta = cv2.absdiff(prev_frame, gray)
-                thresh = cv2.threshold(frame_delta, 25, 255, cv2.THRESH_BINARY)[1]
-                
-                # Count non-zero pixels (motion)
-                motion_pixels = cv2.countNonZero(thresh)
-                motion_percentage = (motion_pixels / (gray.shape[0] * gray.shape[1])) * 100
-                
-                if motion_percentage > motion_threshold:
-                    motion_frames.append({
-                        'frame_number': frame_idx,
-                        'timestamp': frame_idx / cap.get(cv2.CAP_PROP_FPS),
-                        'motion_percentage': motion_percentage
-                    })
-            
-            prev_frame = gray
-            frame_idx += 1
-        
-        return {
-            'total_motion_frames': len(motion_frames),
-            'motion_threshold': motion_threshold,
-            'motion_frames': motion_frames
-        }
+            position = target + 1
+
+            ok, buffer = cv2.imencode(f".{frame_format}", frame, encode_params)
+            if ok:
+                encoded_frames.append((target, buffer.tobytes()))
+
+        return encoded_frames
     
-    async def _generate_thumbnail(self, cap: cv2.VideoCapture, gcs_filename: str) -> str:
+    async def _generate_thumbnail(
+        self,
+        cap: cv2.VideoCapture,
+        gcs_filename: str,
+        total_frames: int,
+        keyframes: Optional[List[int]] = None
+    ) -> str:
         """
         Generate and upload thumbnail
         """
         # Read middle frame
-        middle_frame = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / 2)
+        middle_frame = decode_config.seek_target(max(0, total_frames // 2), keyframes)
         cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
         ret, frame = cap.read()
         
         if not ret:
             raise HTTPException(status_code=400, detail="Could not read frame for thumbnail")
         
-        # Resize thumbnail
-        thumbnail = cv2.resize(frame, (320, 240))
-        
-        # Save to temp file
-        temp_thumb_path = tempfile.mktemp(suffix='.jpg')
-        cv2.imwrite(temp_thumb_path, thumbnail)
-        
-        try:
-            # Upload thumbnail to GCS
-            with open(temp_thumb_path, 'rb') as f:
-                thumbnail_content = f.read()
-            
-            # Generate thumbnail filename
-            base_name = os.path.splitext(gcs_filename)[0]
-            thumbnail_filename = f"{base_name}_thumbnail.jpg"
-            
-            # Upload to GCS
-            await gcs_service.upload_file(
-                thumbnail_content,
-                thumbnail_filename,
-                content_type='image/jpeg'
-            )
-            
-            return thumbnail_filename
-            
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_thumb_path):
-                os.unlink(temp_thumb_path)
+        # Encode in memory like the upload thumbnail, no temp file needed
+        ok, buffer = cv2.imencode('.jpg', cv2.resize(frame, THUMBNAIL_SIZE))
+        if not ok:
+            raise HTTPException(status_code=500, detail="Could not encode thumbnail")
+
+        thumbnail_filename = self.thumbnail_filename(gcs_filename)
+        await gcs_service.upload_file(
+            buffer.tobytes(),
+            thumbnail_filename,
+            content_type='image/jpeg'
+        )
+        return thumbnail_filename
     
-    async def _analyze_content(self, cap: cv2.VideoCapture) -> Dict[str, Any]:
+    def thumbnail_filename(self, gcs_filename: str) -> str:
         """
-        Analyze video content (basic analysis)
+        GCS filename of the thumbnail belonging to a video
         """
-        brightness_values = []
-        contrast_values = []
-        
-        frame_count = 0
-        while True:
+        base_name = os.path.splitext(gcs_filename)[0]
+        return f"{base_name}_thumbnail.jpg"
+
+    def encode_first_frame_thumbnail(self, video_path: str) -> Optional[bytes]:
+        """
+        JPEG thumbnail of the first frame. It is always a keyframe, so nothing
+        else has to be decoded to produce it
+        """
+        cap = decode_config.open_capture(video_path)
+        try:
             ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Calculate brightness (mean pixel value)
-            brightness = np.mean(frame)
-            brightness_values.append(brightness)
-            
-            # Calculate contrast (standard deviation)
-            contrast = np.std(frame)
-            contrast_values.append(contrast)
-            
-            frame_count += 1
-            if frame_count > 100:  # Limit analysis to first 100 frames
-                break
-        
+        finally:
+            cap.release()
+
+        if not ret:
+            return None
+        ok, buffer = cv2.imencode('.jpg', cv2.resize(frame, THUMBNAIL_SIZE))
+        return buffer.tobytes() if ok else None
+
+    def _extract_audio_info(self, probe: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Audio stream information from the container headers
+        """
+        audio = probe['audio'] if probe else None
+        if audio is None:
+            return {
+                'has_audio': False if probe else None,
+                'audio_codec': None,
+                'sample_rate': None,
+                'channels': None
+            }
         return {
-            'average_brightness': np.mean(brightness_values) if brightness_values else 0,
-            'average_contrast': np.mean(contrast_values) if contrast_values else 0,
-            'brightness_range': {
-                'min': np.min(brightness_values) if brightness_values else 0,
-                'max': np.max(brightness_values) if brightness_values else 0
-            },
-            'frames_analyzed': len(brightness_values)
+            'has_audio': True,
+            'audio_codec': audio['codec'],
+            'sample_rate': audio['sample_rate'],
+            'channels': audio['channels']
         }
-    
-    async def _extract_audio_info(self, video_path: str) -> Dict[str, Any]:
+
+    def _video_info_from_probe(self, probe: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build video_info from container headers instead of an opened decoder
         """
-        Extract basic audio information (requires additional audio processing library)
+        video = probe['video'] or {}
+        duration_ms = probe['duration_ms']
+        fps = video.get('fps')
+        width = video.get('width')
+        height = video.get('height')
+        return {
+            'fps': fps,
+            'frame_count': int(round(duration_ms / 1000 * fps)) if fps and duration_ms else None,
+            'width': width,
+            'height': height,
+            'duration': duration_ms / 1000 if duration_ms is not None else None,
+            'duration_ms': duration_ms,
+            'resolution': f"{width}x{height}" if width and height else None,
+            'codec': video.get('codec'),
+            'container': probe['container']
+        }
+
+    def _video_info_from_proxy(self, proxy_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build video_info of the original from what its analysis proxy recorded
         """
-        # This is a placeholder - you'd need to use a library like ffmpeg-python
-        # or moviepy to extract audio information
+        fps = proxy_info['source_fps']
+        frame_count = proxy_info['source_frames']
+        width = proxy_info['source_width']
+        height = proxy_info['source_height']
         return {
-            'has_audio': True,  # Placeholder
-            'audio_codec': 'unknown',
-            'sample_rate': 0,
-            'channels': 0
+            'fps': fps,
+            'frame_count': frame_count,
+            'width': width,
+            'height': height,
+            'duration': frame_count / fps,
+            'resolution': f"{width}x{height}" if width and height else None
         }
+
+    async def probe_video(
+        self,
+        gcs_filename: str,
+        include_keyframes: bool = False,
+        file_info: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Read container metadata with ranged reads of the object's head and tail
+
+        Raises:
+            ContainerProbeError: If the container can't be parsed
+        """
+        if file_info is None:
+            file_info = await gcs_service.get_file_info(gcs_filename)
+
+        async def read_range(start: int, end: int) -> bytes:
+            return await gcs_service.download_range(gcs_filename, start, end)
+
+        return await probe_container(read_range, file_info['size'], include_keyframes)
+
+    async def _probe_or_none(
+        self,
+        gcs_filename: str,
+        include_keyframes: bool = False,
+        file_info: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.probe_video(gcs_filename, include_keyframes, file_info)
+        except ContainerProbeError as e:
+            logger.warning("Could not probe container of %s: %s", gcs_filename, e)
+            return None
     
-    async def create_video_summary(self, gcs_filename: str) -> Dict[str, Any]:
+    def shutdown(self) -> None:
+        """
+        Stop the segment worker processes
+        """
+        if self._segment_pool is not None:
+            self._segment_pool.shutdown(cancel_futures=True)
+            self._segment_pool = None
+
+    async def create_video_summary(self, gcs_filename: str, profile: bool = False) -> Dict[str, Any]:
         """
         Create a comprehensive video summary
         """
-        operations = [
-            'extract_frames',
-            'detect_motion', 
-            'generate_thumbnail',
-            'analyze_content'
-        ]
-        
-        return await self.process_video(gcs_filename, operations)
+        return await self.process_video(gcs_filename, SUMMARY_OPERATIONS, profile=profile)
 
 # Global instance
 video_processor = VideoProcessor() 
\ No newline at end of file
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark matrix for the video decode configuration (app/services/decode_config.py)
+
+Runs N concurrent analysis jobs (motion + content, as process_video does)
+for every combination of concurrent jobs, decoder threads and backend under a
+fixed thread budget, and times frame extraction with accurate and fast seek.
+Use the fastest aggregate frames/sec for a node size to pick
+VIDEO_MAX_CONCURRENT_JOBS and VIDEO_DECODER_THREADS.
+
+    python benchmarks/decode_matrix.py --budget 4 --jobs 1 2 4 --decoder-threads 0 1 2
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+import cv2
+
+from frame_pass import make_video
+from app.services.container_probe import probe_container
+from app.services.decode_config import DecodeConfig
+from app.services.frame_analyzers import build_frame_analyzers, run_frame_pass
+
+EXTRACTED_FRAMES = 10
+
+
+def run_analysis(config: DecodeConfig, video_path: str, jobs: int) -> dict:
+    """
+    Run `jobs` analyses at once in threads, like concurrent requests do
+    """
+    config.apply()
+    frames = [0] * jobs
+
+    def job(i: int) -> None:
+        cap = config.open_capture(video_path)
+        analyzers = build_frame_analyzers(
+            ['detect_motion', 'analyze_content'],
+            cap.get(cv2.CAP_PROP_FPS),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        )
+        run_frame_pass(cap, analyzers, deduplicate=False)
+        frames[i] = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        cap.release()
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(jobs)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {'fps': sum(frames) / elapsed, 'job_seconds': elapsed}
+
+
+def read_keyframes(video_path: str) -> list:
+    def read_range(start: int, end: int) -> bytes:
+        with open(video_path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    async def async_read_range(start: int, end: int) -> bytes:
+        return read_range(start, end)
+
+    probe = asyncio.run(probe_container(async_read_range, os.path.getsize(video_path), include_keyframes=True))
+    return probe['video'].get('keyframes') or []
+
+
+def run_extraction(config: DecodeConfig, video_path: str) -> dict:
+    """
+    Seek to and decode evenly spaced frames, as extract_frames does
+    """
+    config.apply()
+    keyframes = read_keyframes(video_path)
+    cap = config.open_capture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Offset by half an interval so targets don't happen to line up with keyframes
+    offset = total_frames // (2 * EXTRACTED_FRAMES)
+    targets = sorted({
+        config.seek_target(i * total_frames // EXTRACTED_FRAMES + offset, keyframes) for i in range(EXTRACTED_FRAMES)
+    })
+
+    start = time.perf_counter()
+    for target in targets:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        cap.read()
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return {'frames': len(targets), 'seconds': elapsed}
+
+
+def run_child(args: argparse.Namespace, mode: str, **options) -> dict:
+    command = [
+        sys.executable, __file__, "--child", mode, "--video", args.video,
+        "--options", json.dumps(options)
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=os.cpu_count() or 1, help="VIDEO_THREAD_BUDGET")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4], help="concurrent jobs")
+    parser.add_argument("--decoder-threads", type=int, nargs="+", default=[0, 1, 2], help="0 = even split")
+    parser.add_argument("--backends", nargs="+", default=["ffmpeg"])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--video", help="video file to use instead of a synthetic one")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        config = DecodeConfig(**json.loads(args.options))
+        if args.child == "analysis":
+            result = run_analysis(config, args.video, config.max_concurrent_jobs)
+        else:
+            result = run_extraction(config, args.video)
+        print(json.dumps(result))
+        return
+
+    args.video = args.video or make_video(args.width, args.height, 30, args.seconds)
+    print(f"Video: {args.video}, thread budget: {args.budget}\n")
+
+    print(f"{'backend':<10}{'jobs':>6}{'threads/job':>13}{'decoder':>9}{'frames/s':>11}{'wall s':>9}")
+    results = []
+    for backend, jobs, decoder_threads in itertools.product(args.backends, args.jobs, args.decoder_threads):
+        options = {
+            'backend': backend,
+            'thread_budget': args.budget,
+            'max_concurrent_jobs': jobs,
+            'decoder_threads': decoder_threads
+        }
+        result = run_child(args, "analysis", **options)
+        config = DecodeConfig(**options)
+        results.append((result['fps'], options))
+        print(
+            f"{backend:<10}{jobs:>6}{config.threads_per_job:>13}{config.decoder_threads:>9}"
+            f"{result['fps']:>11.1f}{result['job_seconds']:>9.2f}"
+        )
+
+    best_fps, best = max(results, key=lambda r: r[0])
+    print(
+        f"\nbest: VIDEO_DECODE_BACKEND={best['backend']} VIDEO_MAX_CONCURRENT_JOBS={best['max_concurrent_jobs']} "
+        f"VIDEO_DECODER_THREADS={best['decoder_threads']} ({best_fps:.1f} frames/s)\n"
+    )
+
+    for fast_seek in (False, True):
+        result = run_child(args, "extraction", thread_budget=args.budget, fast_seek=fast_seek)
+        print(
+            f"extract {EXTRACTED_FRAMES} frames, fast_seek={fast_seek!s:<5}: "
+            f"{result['seconds'] * 1000:7.1f} ms ({result['frames']} distinct frames)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass frame analyzers (detect_motion, analyze_content)
+
+Decodes a synthetic video through run_frame_pass and reports frames/sec and
+peak RSS. Each run happens in a fresh subprocess so peak RSS is not shared
+between runs.
+
+To compare against another revision, point --source at a checkout of it:
+
+    git worktree add /tmp/before <revision>
+    python benchmarks/frame_pass.py --source /tmp/before/service
+    python benchmarks/frame_pass.py
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_video(width: int, height: int, fps: int, seconds: int) -> str:
+    """
+    Write (or reuse) a synthetic video where every frame differs, so frame
+    deduplication can't skip any analyzer work
+    """
+    path = os.path.join(tempfile.gettempdir(), f"delphi-bench-{width}x{height}-{fps}fps-{seconds}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    box = max(16, height // 6)
+    try:
+        for i in range(fps * seconds):
+            frame = np.roll(background, i * 4, axis=1)
+            x = (i * 12) % (width - box)
+            cv2.rectangle(frame, (x, height // 3), (x + box, height // 3 + box), (255, 255, 255), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def run_worker(source: str, video_path: str, operations: list, deduplicate: bool) -> dict:
+    sys.path.insert(0, source)
+    from app.services.frame_analyzers import build_frame_analyzers, run_frame_pass
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    analyzers = build_frame_analyzers(operations, fps, total_frames)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    report = run_frame_pass(cap, analyzers, deduplicate)
+    elapsed = time.perf_counter() - start
+    frames = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    cap.release()
+
+    return {
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed else 0,
+        'analyzer_seconds': report['analyzer_seconds'],
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'rss_before_pass_mb': rss_before / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=str(SERVICE_DIR), help="service directory to import app from")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--operations", nargs="+", default=["detect_motion", "analyze_content"])
+    parser.add_argument("--deduplicate", action="store_true", help="enable frame deduplication")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.source, args.worker, args.operations, args.deduplicate)))
+        return
+
+    video_path = make_video(args.width, args.height, args.fps, args.seconds)
+    print(f"Video: {video_path} ({args.width}x{args.height}, {args.fps * args.seconds} frames)")
+    print(f"Source: {args.source}")
+    print(f"Operations: {', '.join(args.operations)}\n")
+
+    results = []
+    for run in range(args.runs):
+        command = [
+            sys.executable, __file__, "--worker", video_path, "--source", args.source,
+            "--operations", *args.operations
+        ]
+        if args.deduplicate:
+            command.append("--deduplicate")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(
+            f"run {run + 1}: {result['fps']:7.1f} frames/s  "
+            f"analyzers {result['analyzer_seconds']:6.2f}s  "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB"
+        )
+
+    fps = sorted(r['fps'] for r in results)
+    print(
+        f"\nmedian: {fps[len(fps) // 2]:.1f} frames/s, best: {fps[-1]:.1f} frames/s, "
+        f"peak RSS {min(r['peak_rss_mb'] for r in results):.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the API with local stand-ins
+
+Boots the app under uvicorn against SQLite (or any DATABASE_URL, e.g. a
+local Postgres) and the local storage backend (STORAGE_BACKEND=local), seeds
+it with recordings through the upload endpoint and drives each scenario
+with --concurrency closed-loop clients for --duration seconds:
+
+    upload      POST /api/recordings/ with a --upload-mb video
+    list        GET /api/recordings/ paging through with --page-size
+    search      GET /api/recordings/?search=... paged the same way
+    signed_url  GET /api/recordings/{id}/signed-url
+    stats       GET /api/recordings/storage/stats
+    mixed       all of the above, weighted like a reviewer-heavy day
+
+Prints one JSON object per scenario with throughput, latency percentiles,
+errors (of which `rejected` were turned away by admission control with a
+429) and the server's resident memory (sampled every 100 ms):
+
+    python benchmarks/load_test.py --concurrency 32 --duration 30
+    python benchmarks/load_test.py --scenarios upload --upload-mb 50 --concurrency 4
+    python benchmarks/load_test.py --database-url postgresql+asyncpg://localhost/delphi_load
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from video_processing import _environment, make_screen_recording
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = ["upload", "list", "search", "signed_url", "stats", "mixed"]
+MIXED_WEIGHTS = {"list": 40, "search": 20, "signed_url": 25, "stats": 5, "upload": 10}
+SEARCH_TERMS = ["interview", "coding", "design", "review", "screen"]
+RSS_SAMPLE_SECONDS = 0.1
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _process_tree_rss(pid: int) -> int:
+    """
+    Resident bytes of a process and its children (uvicorn workers)
+    """
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class MemorySampler:
+    """
+    Track the peak resident memory of the server while a scenario runs
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _process_tree_rss(self.pid))
+            self._stop.wait(RSS_SAMPLE_SECONDS)
+
+    def __enter__(self) -> "MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class UploadPayload:
+    """
+    A valid MP4 of about the requested size that is different every time,
+    so uploads aren't deduplicated: the base video is followed by a `free`
+    box, which players and the container probe skip, holding a unique prefix
+    and padding
+    """
+
+    def __init__(self, size: int):
+        with open(make_screen_recording(640, 360, 30, 2), "rb") as f:
+            self.video = f.read()
+        self.padding = os.urandom(max(0, size - len(self.video) - 24))
+
+    def create(self) -> bytes:
+        body = uuid.uuid4().bytes + self.padding
+        return self.video + struct.pack(">I4s", 8 + len(body), b"free") + body
+
+
+def _percentile(latencies: list, percentile: float) -> float:
+    index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+    return latencies[index]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, payload: UploadPayload, page_size: int):
+        self.client = client
+        self.payload = payload
+        self.page_size = page_size
+        self.recording_ids: list = []
+        self.total_recordings = 0
+
+    async def upload(self) -> httpx.Response:
+        video = self.payload.create()
+        title = f"{random.choice(SEARCH_TERMS)} session {uuid.uuid4().hex[:8]}"
+        metadata = {
+            "title": title,
+            "filename": "recording.mp4",
+            "fileSize": len(video),
+            "duration": 2,
+            "format": "mp4",
+            "hasAudio": False,
+            "thumbnailUrl": None
+        }
+        response = await self.client.post(
+            "/api/recordings/",
+            files={"video": ("recording.mp4", video, "video/mp4")},
+            data={"metadata": json.dumps(metadata)}
+        )
+        if response.status_code == 200:
+            self.recording_ids.append(response.json()["id"])
+            self.total_recordings += 1
+        return response
+
+    def _random_page(self) -> int:
+        pages = max(1, self.total_recordings // self.page_size)
+        return random.randrange(pages) * self.page_size
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get("/api/recordings/", params={"skip": self._random_page(), "limit": self.page_size})
+
+    async def search(self) -> httpx.Response:
+        return await self.client.get(
+            "/api/recordings/",
+            params={"search": random.choice(SEARCH_TERMS), "skip": 0, "limit": self.page_size}
+        )
+
+    async def signed_url(self) -> httpx.Response:
+        return await self.client.get(f"/api/recordings/{random.choice(self.recording_ids)}/signed-url")
+
+    async def stats(self) -> httpx.Response:
+        return await self.client.get("/api/recordings/storage/stats")
+
+    async def mixed(self) -> httpx.Response:
+        operation = random.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        return await getattr(self, operation)()
+
+    async def run(self, scenario: str, concurrency: int, duration: float) -> dict:
+        """
+        Run `concurrency` clients issuing the scenario's requests back to
+        back for `duration` seconds
+        """
+        request = getattr(self, scenario)
+        latencies = []
+        errors = 0
+        rejected = 0
+        deadline = time.perf_counter() + duration
+
+        async def client() -> None:
+            nonlocal errors, rejected
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await request()
+                    failed = response.status_code >= 400
+                    rejected += response.status_code == 429
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append(time.perf_counter() - start)
+                errors += failed
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'rejected': rejected,
+            'seconds': elapsed,
+            'requests_per_second': len(latencies) / elapsed,
+            'latency_ms': {
+                'mean': sum(latencies) / len(latencies) * 1000,
+                'p50': _percentile(latencies, 50) * 1000,
+                'p90': _percentile(latencies, 90) * 1000,
+                'p99': _percentile(latencies, 99) * 1000,
+                'max': latencies[-1] * 1000
+            } if latencies else None
+        }
+
+
+def start_server(args, data_dir: str, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{os.path.join(data_dir, 'load_test.db')}",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+        "VIDEO_CACHE_DIR": os.path.join(data_dir, "cache"),
+        "CORS_ALLOWED_ORIGINS": os.environ.get("CORS_ALLOWED_ORIGINS", "*")
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--no-access-log"
+    ]
+    server = subprocess.Popen(
+        command, cwd=args.source, env=env,
+        stdout=subprocess.DEVNULL, stderr=None if args.server_output else subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}; rerun with --server-output")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not start within 60 seconds")
+
+
+async def run_scenarios(args, server: subprocess.Popen, port: int) -> None:
+    environment = _environment(args.source)
+    payload = UploadPayload(int(args.upload_mb * 1024 ** 2))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    output = open(args.output, "a") if args.output else None
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300) as client:
+        load_test = LoadTest(client, payload, args.page_size)
+
+        # Seed the database so listing, search and signed URLs have data
+        seed = args.seed_recordings
+        for start in range(0, seed, args.concurrency):
+            await asyncio.gather(*(load_test.upload() for _ in range(min(args.concurrency, seed - start))))
+        if not load_test.recording_ids:
+            raise RuntimeError("Seeding failed, no recording was created; rerun with --server-output")
+        print(f"Seeded {len(load_test.recording_ids)} recordings", file=sys.stderr)
+
+        try:
+            for scenario in args.scenarios:
+                with MemorySampler(server.pid) as sampler:
+                    result = await load_test.run(scenario, args.concurrency, args.duration)
+                result = {
+                    **environment,
+                    'scenario': scenario,
+                    'concurrency': args.concurrency,
+                    'workers': args.workers,
+                    'upload_bytes': len(payload.video) + len(payload.padding) + 24,
+                    'recordings': load_test.total_recordings,
+                    **result,
+                    'server_peak_rss_mb': sampler.peak / 1024 ** 2,
+                    'server_rss_mb': _process_tree_rss(server.pid) / 1024 ** 2
+                }
+                line = json.dumps(result)
+                print(line, flush=True)
+                if output is not None:
+                    output.write(line + "\n")
+                    output.flush()
+        finally:
+            if output is not None:
+                output.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=str(SERVICE_DIR), help="service directory to run the app from")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per scenario")
+    parser.add_argument("--upload-mb", type=float, default=5, help="size of each uploaded video")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed-recordings", type=int, default=100, help="recordings uploaded before the scenarios")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="database to use instead of a fresh SQLite file")
+    parser.add_argument("--output", help="also append the results to this JSON lines file")
+    parser.add_argument("--server-output", action="store_true", help="show the server's log output")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="delphi-load-test-")
+    port = _free_port()
+    server = start_server(args, data_dir, port)
+    try:
+        asyncio.run(run_scenarios(args, server, port))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark response encodings for a realistic video summary
+
+Builds the result of create_video_summary for a one-hour 30 fps recording
+(frames, motion intervals and histogram, content analysis, dedup report)
+with numpy scalars mixed in, as the analyzers produce them, and reports
+encode time and bytes on the wire for FastAPI's default JSON path, orjson
+and MessagePack, each uncompressed, gzip and Brotli.
+
+    python benchmarks/response_encoding.py [--motion-detail]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from app.responses import compress, encode_json, encode_msgpack
+
+FPS = 30
+DURATION_SECONDS = 3600
+
+
+def build_summary(motion_detail: bool) -> dict:
+    rng = np.random.default_rng(0)
+    total_frames = FPS * DURATION_SECONDS
+
+    motion_frames = np.sort(rng.choice(total_frames, size=total_frames // 5, replace=False))
+    intervals = []
+    for start in np.sort(rng.choice(total_frames - 300, size=400, replace=False)):
+        count = int(rng.integers(5, 300))
+        percentages = rng.uniform(30, 100, count)
+        intervals.append({
+            'start_frame': int(start),
+            'end_frame': int(start) + count,
+            'start_time': round(start / FPS, 3),
+            'end_time': round((start + count) / FPS, 3),
+            'motion_frames': count,
+            'peak_motion_percentage': round(float(percentages.max()), 3),
+            'mean_motion_percentage': round(float(percentages.mean()), 3)
+        })
+
+    motion = {
+        'total_motion_frames': len(motion_frames),
+        'motion_threshold': 30,
+        'motion_intervals': intervals,
+        'activity_histogram': {
+            'bins': 100,
+            'bin_seconds': DURATION_SECONDS / 100,
+            'mean_motion_percentage': rng.uniform(0, 60, 100).round(3).tolist()
+        }
+    }
+    if motion_detail:
+        motion['motion_frames'] = [
+            {
+                'frame_number': frame,
+                'timestamp': frame / FPS,
+                # Analyzer values come out of numpy
+                'motion_percentage': np.float64(rng.uniform(30, 100))
+            }
+            for frame in motion_frames.tolist()
+        ]
+
+    histogram = rng.dirichlet(np.ones(32))
+    return {
+        'recording_id': 1,
+        'filename': 'recordings/benchmark.webm',
+        'summary': {
+            'video_info': {
+                'fps': np.float64(FPS),
+                'frame_count': total_frames,
+                'width': 1920,
+                'height': 1080,
+                'duration': float(DURATION_SECONDS),
+                'duration_ms': DURATION_SECONDS * 1000,
+                'resolution': '1920x1080',
+                'codec': 'vp9',
+                'container': 'webm'
+            },
+            'deduplication': {
+                'frames_checked': total_frames,
+                'duplicate_frames': int(total_frames * 0.7),
+                'dedup_ratio': 0.7,
+                'analyzer_seconds': 412.5,
+                'signature_seconds': 38.2,
+                'estimated_seconds_saved': 901.7,
+                'segments': 8
+            },
+            'frames': {
+                'total_frames_extracted': 10,
+                'frame_interval': total_frames // 10,
+                'format': 'jpg',
+                'frames': [
+                    {
+                        'frame_number': i * total_frames // 10,
+                        'timestamp': i * DURATION_SECONDS / 10,
+                        'size': int(rng.integers(40_000, 120_000)),
+                        'filename': f"recordings/benchmark_frames/frame_{i * total_frames // 10:06d}.jpg"
+                    }
+                    for i in range(10)
+                ]
+            },
+            'motion_detection': motion,
+            'thumbnail': 'recordings/benchmark_thumbnail.jpg',
+            'content_analysis': {
+                'average_brightness': np.float64(rng.uniform(80, 200)),
+                'brightness_std': np.float64(rng.uniform(0, 20)),
+                'average_contrast': np.float64(rng.uniform(20, 80)),
+                'brightness_range': {'min': np.float64(40.1), 'max': np.float64(231.7)},
+                'frames_analyzed': 300,
+                'sample_interval': total_frames // 300,
+                'analysis_resolution': '320x180',
+                'brightness_histogram': histogram.round(6).tolist()
+            }
+        }
+    }
+
+
+def fastapi_default(content: dict) -> bytes:
+    # What a plain dict return goes through: jsonable_encoder, then JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(function, *args, repeat: int) -> tuple:
+    result = None
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--motion-detail", action="store_true", help="include every motion frame")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    content = build_summary(args.motion_detail)
+    encoders = {
+        'fastapi default json': fastapi_default,
+        'orjson': encode_json,
+        'msgpack': encode_msgpack
+    }
+
+    print(f"{'format':<22}{'compression':<13}{'encode ms':>11}{'bytes':>12}")
+    for name, encoder in encoders.items():
+        body, encode_seconds = timed(encoder, content, repeat=args.repeat)
+        for encoding in (None, 'gzip', 'br'):
+            compressed, compress_seconds = timed(compress, body, encoding, repeat=args.repeat)
+            print(
+                f"{name:<22}{encoding or 'none':<13}"
+                f"{(encode_seconds + compress_seconds) * 1000:>11.2f}{len(compressed[0]):>12,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark how long the app takes to import and to serve its first requests
+
+For each run, in fresh processes:
+
+    import          seconds to import app.main, and which heavy modules
+                    (OpenCV, numpy, the GCS client) were loaded by it
+    first request   seconds from starting uvicorn to the first response
+                    of GET / and GET /api/recordings/ (which needs the DB)
+    warm            seconds from starting uvicorn until the background
+                    warm-up has loaded the video stack and storage client
+
+    memory          resident memory of the server processes once warm
+    shutdown        seconds from SIGTERM until the server has exited
+
+The app runs against SQLite and local storage. To compare against another
+revision, point --source at a checkout of it:
+
+    git worktree add /tmp/before <revision>
+    python benchmarks/startup.py --source /tmp/before/service
+    python benchmarks/startup.py
+
+To compare server configurations, pass each as the arguments to start the
+production entrypoint (main.py) with; one JSON line is printed per config:
+
+    python benchmarks/startup.py --configs "--workers 1" "--workers 4" "--workers 4 --backlog 512"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from load_test import _free_port, _process_tree_rss
+from video_processing import _environment
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["cv2", "numpy", "google.cloud.storage"]
+# Revisions before the background warm-up never log it
+WARM_UP_TIMEOUT = 30
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _app_env(data_dir: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(data_dir, 'startup.db')}",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+        "VIDEO_CACHE_DIR": os.path.join(data_dir, "cache"),
+        "CORS_ALLOWED_ORIGINS": "*",
+        "LOG_LEVEL": "INFO",
+        "LOG_FORMAT": "json"
+    }
+
+
+def measure_import(source: str, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=source, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"No response from {url}")
+
+
+def measure_server(source: str, env: dict, config: str = None) -> dict:
+    """
+    Start the server, with uvicorn directly or with the production
+    entrypoint and the config's arguments, and time it
+    """
+    port = _free_port()
+    if config is None:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app"]
+    else:
+        command = [sys.executable, "main.py", *shlex.split(config)]
+    command += ["--host", "127.0.0.1", "--port", str(port)]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=source, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    # The warm-up logs when it's done, in the first worker to finish
+    warmed = threading.Event()
+    warm_time = []
+
+    def read_logs() -> None:
+        for line in server.stdout:
+            if "Warmed up" in line and not warmed.is_set():
+                warm_time.append(time.perf_counter())
+                warmed.set()
+
+    reader = threading.Thread(target=read_logs, daemon=True)
+    reader.start()
+    try:
+        deadline = start + 120
+        root = _wait_for(f"http://127.0.0.1:{port}/", deadline)
+        recordings = _wait_for(f"http://127.0.0.1:{port}/api/recordings/", deadline)
+        warmed.wait(min(WARM_UP_TIMEOUT, max(0, deadline - time.perf_counter())))
+        rss = _process_tree_rss(server.pid)
+    finally:
+        stopping = time.perf_counter()
+        server.terminate()
+        server.wait(timeout=60)
+    return {
+        'first_response_seconds': root - start,
+        'first_db_response_seconds': recordings - start,
+        'warm_seconds': warm_time[0] - start if warm_time else None,
+        'rss_mb': rss / 1024 ** 2,
+        'shutdown_seconds': time.perf_counter() - stopping
+    }
+
+
+def _median(results: list, key: str):
+    values = [result[key] for result in results if result[key] is not None]
+    return statistics.median(values) if values else None
+
+
+def benchmark(source: str, runs: int, config: str = None) -> dict:
+    imports = []
+    servers = []
+    for run in range(runs):
+        with tempfile.TemporaryDirectory(prefix="delphi-startup-") as data_dir:
+            env = _app_env(data_dir)
+            imports.append(measure_import(source, env))
+            servers.append(measure_server(source, env, config))
+        print(
+            f"{config or 'uvicorn'} run {run + 1}: import {imports[-1]['seconds']:.3f}s  "
+            f"first response {servers[-1]['first_response_seconds']:.3f}s  "
+            f"first DB response {servers[-1]['first_db_response_seconds']:.3f}s",
+            file=sys.stderr
+        )
+
+    return {
+        **_environment(source),
+        'config': config,
+        'runs': runs,
+        'import_seconds': _median(imports, 'seconds'),
+        'modules_loaded_by_import': imports[-1]['loaded'],
+        'first_response_seconds': _median(servers, 'first_response_seconds'),
+        'first_db_response_seconds': _median(servers, 'first_db_response_seconds'),
+        'warm_seconds': _median(servers, 'warm_seconds'),
+        'rss_mb': _median(servers, 'rss_mb'),
+        'shutdown_seconds': _median(servers, 'shutdown_seconds')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=str(SERVICE_DIR), help="service directory to run the app from")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--configs", nargs="+", help="arguments to start main.py with, one string per config; default runs uvicorn directly"
+    )
+    parser.add_argument("--output", help="also append the results to this JSON lines file")
+    args = parser.parse_args()
+
+    output = open(args.output, "a") if args.output else None
+    try:
+        for config in args.configs or [None]:
+            line = json.dumps(benchmark(args.source, args.runs, config))
+            print(line, flush=True)
+            if output is not None:
+                output.write(line + "\n")
+                output.flush()
+    finally:
+        if output is not None:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark every VideoProcessor operation on synthetic screen recordings
+
+Generates deterministic videos that look like screen recordings (static
+periods, typing bursts and window switches) at each resolution and length,
+stores them in a local storage backend (STORAGE_BACKEND=local) and runs each
+operation, plus create_video_summary, through process_video. Every
+operation runs in a fresh subprocess so peak RSS is its own; the first run
+downloads into the video cache (cold), the rest reuse it (warm).
+
+Prints one JSON object per video and operation with latency, frames/s, MB/s
+and peak RSS, tagged with the git revision and host, so results can be
+appended to a file and tracked over time:
+
+    python benchmarks/video_processing.py --resolutions 1280x720 1920x1080 --seconds 10 60
+    python benchmarks/video_processing.py --operations detect_motion summary --output results.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+OPERATIONS = ["extract_frames", "detect_motion", "generate_thumbnail", "analyze_content", "extract_audio_info", "summary"]
+
+# Seconds of each phase of the synthetic recording, repeated until it is long enough
+STATIC_SECONDS = 3
+TYPING_SECONDS = 2
+SWITCH_FRAMES = 3
+
+
+def _draw_window(height: int, width: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    A desktop with one application window in front: title bar, a sidebar and
+    lines of text in the content area
+    """
+    frame = np.full((height, width, 3), rng.integers(40, 90, 3, dtype=np.uint8), dtype=np.uint8)
+    left, top = int(rng.integers(0, width // 10)), int(rng.integers(0, height // 10))
+    right, bottom = width - int(rng.integers(0, width // 10)), height - int(rng.integers(0, height // 10))
+    cv2.rectangle(frame, (left, top), (right, bottom), (245, 245, 245), -1)
+    cv2.rectangle(frame, (left, top), (right, top + height // 20), [int(c) for c in rng.integers(60, 200, 3)], -1)
+    cv2.rectangle(frame, (left, top + height // 20), (left + width // 6, bottom), (225, 225, 230), -1)
+
+    scale = height / 1080
+    line_height = max(12, int(32 * scale))
+    for y in range(top + height // 20 + 2 * line_height, bottom - line_height, line_height):
+        words = " ".join("x" * int(rng.integers(2, 9)) for _ in range(int(rng.integers(3, 12))))
+        cv2.putText(frame, words, (left + width // 6 + line_height, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8 * scale, (60, 60, 60), 1)
+    return frame
+
+
+def make_screen_recording(width: int, height: int, fps: int, seconds: int) -> str:
+    """
+    Write (or reuse) a synthetic screen recording: the screen sits still,
+    then text is typed into the window a character per frame, then another
+    window is switched to, and so on
+    """
+    path = os.path.join(tempfile.gettempdir(), f"delphi-screen-{width}x{height}-{fps}fps-{seconds}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    scale = height / 1080
+    total_frames = fps * seconds
+    written = 0
+    try:
+        while written < total_frames:
+            frame = _draw_window(height, width, rng)
+            # A couple of frames of the switch animation
+            for step in range(1, SWITCH_FRAMES + 1):
+                writer.write((frame * (step / SWITCH_FRAMES)).astype(np.uint8))
+            written += SWITCH_FRAMES
+
+            for _ in range(fps * STATIC_SECONDS):
+                writer.write(frame)
+            written += fps * STATIC_SECONDS
+
+            x, y = width // 4, height - int(120 * scale)
+            for _ in range(fps * TYPING_SECONDS):
+                character = chr(int(rng.integers(97, 123)))
+                cv2.putText(frame, character, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8 * scale, (20, 20, 20), 1)
+                x += max(8, int(18 * scale))
+                if x > width * 3 // 4:
+                    x, y = width // 4, y - int(32 * scale)
+                writer.write(frame)
+            written += fps * TYPING_SECONDS
+    finally:
+        writer.release()
+    return path
+
+
+def run_worker(source: str, video_path: str, operation: str, runs: int) -> dict:
+    """
+    Store the video in a fresh local storage directory and run the operation
+    `runs` times
+    """
+    storage_dir = tempfile.mkdtemp(prefix="delphi-bench-storage-")
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_DIR"] = storage_dir
+    os.environ["VIDEO_CACHE_DIR"] = os.path.join(storage_dir, "cache")
+    sys.path.insert(0, source)
+
+    import asyncio
+    from app.services.gcs_service import gcs_service
+    from app.services.video_processor import video_processor
+
+    filename = f"recordings/{os.path.basename(video_path)}"
+
+    async def run() -> list:
+        await gcs_service.upload_video_from_path(video_path, filename)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            if operation == "summary":
+                await video_processor.create_video_summary(filename)
+            else:
+                await video_processor.process_video(filename, [operation])
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    try:
+        timings = asyncio.run(run())
+    finally:
+        video_processor.shutdown()
+
+    return {
+        'timings': timings,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def _environment(source: str) -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=source, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': revision,
+        'host': platform.node(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=str(SERVICE_DIR), help="service directory to import app from")
+    parser.add_argument("--resolutions", nargs="+", default=["1280x720", "1920x1080"])
+    parser.add_argument("--seconds", nargs="+", type=int, default=[10, 60], help="video lengths")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--runs", type=int, default=3, help="runs per operation; the first one is cold")
+    parser.add_argument("--output", help="also append the results to this JSON lines file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.source, args.worker, args.operations[0], args.runs)))
+        return
+
+    environment = _environment(args.source)
+    output = open(args.output, "a") if args.output else None
+    try:
+        for resolution in args.resolutions:
+            width, height = (int(size) for size in resolution.split("x"))
+            for seconds in args.seconds:
+                video_path = make_screen_recording(width, height, args.fps, seconds)
+                video_bytes = os.path.getsize(video_path)
+                frames = args.fps * seconds
+
+                for operation in args.operations:
+                    command = [
+                        sys.executable, __file__, "--worker", video_path, "--source", args.source,
+                        "--operations", operation, "--runs", str(args.runs)
+                    ]
+                    worker_output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                    worker = json.loads(worker_output.strip().splitlines()[-1])
+
+                    timings = worker['timings']
+                    warm = timings[1:] or timings
+                    median = statistics.median(warm)
+                    result = {
+                        **environment,
+                        'operation': operation,
+                        'resolution': resolution,
+                        'fps': args.fps,
+                        'seconds': seconds,
+                        'frames': frames,
+                        'video_bytes': video_bytes,
+                        'runs': len(timings),
+                        'cold_seconds': timings[0],
+                        'median_seconds': median,
+                        'min_seconds': min(warm),
+                        'frames_per_second': frames / median if median else None,
+                        'megabytes_per_second': video_bytes / 1024 ** 2 / median if median else None,
+                        'peak_rss_mb': worker['peak_rss_mb']
+                    }
+                    line = json.dumps(result)
+                    print(line, flush=True)
+                    if output is not None:
+                        output.write(line + "\n")
+                        output.flush()
+    finally:
+        if output is not None:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,155 @@
-def main():
-    print("Hello from service!")
+#!/usr/bin/env python3
+"""
+Run the service in production
+
+    python main.py                  # one worker per available core
+    python main.py --workers 4 --port 8080
+    python main.py --reload         # development, single process
+
+Every option can also be set with the environment variable in brackets in
+--help. With several workers, the video thread budget, analysis processes,
+video cache budget and admission memory budget are divided among them so
+the workers together use what one process would, unless they are set
+explicitly, and /metrics adds up the metrics of all workers.
+"""
+
+import argparse
+import glob
+import math
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import uvicorn
+from dotenv import load_dotenv
+
+from app.admission import default_memory_budget
+from app.logging_config import configure_logging
+
+# Seconds a stopping worker keeps serving in-flight requests (uploads, video
+# jobs and their background tasks) before they are cut off
+GRACEFUL_TIMEOUT_SECONDS = 300
+# Idle connections are kept open longer than a load balancer would, so the
+# balancer never sends a request on a connection the server is closing
+KEEP_ALIVE_SECONDS = 75
+
+
+def available_cores() -> int:
+    """
+    Cores this process may use: the CPU affinity mask, further limited by a
+    cgroup v2 CPU quota when running in a container
+    """
+    cores = os.process_cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def share_budgets(workers: int, cores: int) -> None:
+    """
+    Divide the per-process video and admission budgets among the workers,
+    through the environment the workers inherit
+    """
+    per_worker_cores = str(max(1, cores // workers))
+    os.environ.setdefault("VIDEO_THREAD_BUDGET", per_worker_cores)
+    os.environ.setdefault("VIDEO_ANALYSIS_WORKERS", per_worker_cores)
+    if "VIDEO_CACHE_MAX_BYTES" not in os.environ:
+        os.environ["VIDEO_CACHE_MAX_BYTES"] = str(5 * 1024 ** 3 // workers)
+    if not os.getenv("ADMISSION_MEMORY_BUDGET_MB"):
+        os.environ["ADMISSION_MEMORY_BUDGET_MB"] = str(default_memory_budget() // workers // 1024 ** 2)
+
+
+def share_metrics(workers: int) -> Optional[str]:
+    """
+    Have the workers write their metrics to files in PROMETHEUS_MULTIPROC_DIR,
+    so /metrics adds up all workers rather than showing whichever one
+    answers. Returns the directory if it was created here, to be removed
+    """
+    if workers <= 1:
+        return None
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Metrics of a previous run would be added to this one's
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+        return None
+    metrics_dir = tempfile.mkdtemp(prefix="prometheus-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    return metrics_dir
+
+
+def _env_int(name: str, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"), help="[HOST]")
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000), help="[PORT]")
+    parser.add_argument(
+        "--workers", type=int, default=_env_int("WEB_CONCURRENCY", None),
+        help="worker processes, default one per available core [WEB_CONCURRENCY]"
+    )
+    parser.add_argument(
+        "--keep-alive", type=int, default=_env_int("SERVER_KEEP_ALIVE_SECONDS", KEEP_ALIVE_SECONDS),
+        help="seconds idle connections are kept open [SERVER_KEEP_ALIVE_SECONDS]"
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=_env_int("SERVER_BACKLOG", 2048),
+        help="connections waiting to be accepted [SERVER_BACKLOG]"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=_env_int("SERVER_GRACEFUL_TIMEOUT_SECONDS", GRACEFUL_TIMEOUT_SECONDS),
+        help="seconds in-flight requests get to finish on shutdown [SERVER_GRACEFUL_TIMEOUT_SECONDS]"
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=_env_int("SERVER_MAX_REQUESTS", None),
+        help="restart a worker after this many requests, to return memory [SERVER_MAX_REQUESTS]"
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="proxies whose X-Forwarded-* headers are trusted [FORWARDED_ALLOW_IPS]"
+    )
+    parser.add_argument("--reload", action="store_true", help="reload on code changes (development)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    # The supervisor logs like the workers do
+    configure_logging()
+    cores = available_cores()
+    workers = 1 if args.reload else max(1, args.workers or cores)
+    share_budgets(workers, cores)
+    metrics_dir = share_metrics(workers)
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers if workers > 1 else None,
+            reload=args.reload,
+            backlog=args.backlog,
+            timeout_keep_alive=args.keep_alive,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            limit_max_requests=args.max_requests,
+            proxy_headers=True,
+            forwarded_allow_ips=args.forwarded_allow_ips,
+            # Logging is set up by configure_logging, in here and in each worker
+            log_config=None
+        )
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
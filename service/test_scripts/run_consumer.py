@@ -3,7 +3,6 @@
 Script to run the candidate invitation consumer
 """
 
-import logging
 import os
 import sys
 from pathlib import Path
@@ -14,11 +13,5 @@ sys.path.insert(0, str(Path(__file__).parent / "app"))
 from app.messaging.candidate_invitation_consumer import main
 
 if __name__ == "__main__":
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Run the consumer
+    # Run the consumer; it sets up logging from the LOG_* settings
     main() 
\ No newline at end of file
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Services read their settings at import; keep tests off real databases and buckets
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="delphi-test-storage-"))
@@ -0,0 +1,85 @@
+import struct
+import unittest
+
+from app.services.container_probe import ContainerProbeError, probe_container
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def ebml_element(element_id: bytes, payload: bytes) -> bytes:
+    # One-byte size, so payloads stay under 127 bytes
+    return element_id + bytes([0x80 | len(payload)]) + payload
+
+
+FTYP = box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2')
+# Version 0 mvhd: flags, creation and modification time, timescale, duration
+MVHD = box(b'mvhd', struct.pack('>IIIII', 0, 0, 0, 1000, 5000) + b'\x00' * 80)
+
+
+async def probe(data: bytes, include_keyframes: bool = False):
+    async def read_range(start: int, end: int) -> bytes:
+        return data[start:end + 1]
+
+    return await probe_container(read_range, len(data), include_keyframes)
+
+
+class Mp4ProbeTest(unittest.IsolatedAsyncioTestCase):
+    async def test_duration_from_mvhd(self):
+        result = await probe(FTYP + box(b'moov', MVHD))
+        self.assertEqual(result['container'], 'mp4')
+        self.assertEqual(result['duration_ms'], 5000)
+
+    async def test_truncated_mvhd(self):
+        with self.assertRaises(ContainerProbeError):
+            await probe(FTYP + box(b'moov', box(b'mvhd', b'\x00' * 8)))
+
+    async def test_truncated_track(self):
+        # The track's mdhd is empty and ends the file
+        stsd = box(b'stsd', b'\x00' * 8 + b'\x00' * 36)
+        minf = box(b'minf', box(b'stbl', stsd))
+        trak = box(b'trak', box(b'mdia', box(b'hdlr', b'\x00' * 8 + b'vide') + minf + box(b'mdhd', b'')))
+        with self.assertRaises(ContainerProbeError):
+            await probe(FTYP + box(b'moov', MVHD + trak), include_keyframes=True)
+
+    async def test_truncated_largesize_header(self):
+        # A 64-bit box size whose size field is cut off by the end of the file
+        with self.assertRaises(ContainerProbeError):
+            await probe(FTYP + struct.pack('>I4s', 1, b'mdat') + b'\x00\x00')
+
+    async def test_missing_moov(self):
+        with self.assertRaises(ContainerProbeError):
+            await probe(FTYP + box(b'free', b'\x00' * 16))
+
+
+class MatroskaProbeTest(unittest.IsolatedAsyncioTestCase):
+    EBML = ebml_element(b'\x1a\x45\xdf\xa3', ebml_element(b'\x42\x82', b'webm'))
+
+    async def test_tracks_from_header(self):
+        video = ebml_element(b'\xe0', ebml_element(b'\xb0', b'\x05\x00') + ebml_element(b'\xba', b'\x02\xd0'))
+        track = ebml_element(b'\xae', ebml_element(b'\x83', b'\x01') + ebml_element(b'\x86', b'V_VP8') + video)
+        info = ebml_element(b'\x15\x49\xa9\x66', ebml_element(b'\x44\x89', struct.pack('>d', 2000.0)))
+        segment = ebml_element(b'\x18\x53\x80\x67', info + ebml_element(b'\x16\x54\xae\x6b', track))
+        result = await probe(self.EBML + segment)
+        self.assertEqual(result['container'], 'webm')
+        self.assertEqual(result['duration_ms'], 2000)
+        self.assertEqual((result['video']['width'], result['video']['height']), (1280, 720))
+
+    async def test_truncated_header(self):
+        with self.assertRaises(ContainerProbeError):
+            await probe(self.EBML[:6])
+
+    async def test_truncated_segment(self):
+        # The segment claims more bytes than the file has, and its tracks are cut off
+        segment = b'\x18\x53\x80\x67' + b'\x88' + b'\x16\x54\xae\x6b\x85\xae'
+        with self.assertRaises(ContainerProbeError):
+            await probe(self.EBML + segment)
+
+    async def test_invalid_vint(self):
+        with self.assertRaises(ContainerProbeError):
+            await probe(self.EBML + b'\x18\x53\x80\x67\x00\x00')
+
+
+if __name__ == "__main__":
+    unittest.main()
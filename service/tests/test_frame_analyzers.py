@@ -0,0 +1,84 @@
+import unittest
+from typing import List
+
+import numpy as np
+
+from app.services.frame_analyzers import ContentAnalyzer, MotionAnalyzer, _pass_report, merge_pass_reports
+
+FPS = 10.0
+TOTAL_FRAMES = 40
+
+
+def frames() -> List[np.ndarray]:
+    """
+    A still scene with a square that jumps every 7 frames, so some jumps
+    land exactly on a segment boundary
+    """
+    result = []
+    for frame_idx in range(TOTAL_FRAMES):
+        luma = np.full((120, 160), 40, dtype=np.uint8)
+        offset = (frame_idx // 7) % 2 * 70
+        luma[20:100, offset:offset + 80] = 220
+        result.append(luma)
+    return result
+
+
+def analyze(analyzer_type, start: int, end: int):
+    analyzer = analyzer_type(FPS, TOTAL_FRAMES) if analyzer_type is MotionAnalyzer else analyzer_type(TOTAL_FRAMES, FPS)
+    for frame_idx, luma in enumerate(frames()[start:end], start):
+        if analyzer.wants(frame_idx):
+            analyzer.update(frame_idx, luma)
+    return analyzer
+
+
+def analyze_in_segments(analyzer_type, boundaries: List[int]):
+    segments = [analyze(analyzer_type, start, end) for start, end in zip(boundaries, boundaries[1:])]
+    merged = segments[0]
+    for segment in segments[1:]:
+        merged.merge(segment)
+    return merged
+
+
+class MotionMergeTest(unittest.TestCase):
+    def test_segments_match_single_pass(self):
+        expected = analyze(MotionAnalyzer, 0, TOTAL_FRAMES).result()
+        for boundaries in ([0, 20, TOTAL_FRAMES], [0, 7, 14, 33, TOTAL_FRAMES]):
+            with self.subTest(boundaries=boundaries):
+                self.assertEqual(analyze_in_segments(MotionAnalyzer, boundaries).result(), expected)
+
+    def test_motion_on_segment_boundary_found(self):
+        # Frame 14 only differs from frame 13, which is in the previous segment
+        merged = analyze_in_segments(MotionAnalyzer, [0, 14, TOTAL_FRAMES])
+        starts = [interval['start_frame'] for interval in merged.result()['motion_intervals']]
+        self.assertIn(14, starts)
+        self.assertNotIn(14, [interval['start_frame'] for interval in analyze(MotionAnalyzer, 14, TOTAL_FRAMES).result()['motion_intervals']])
+
+
+class ContentMergeTest(unittest.TestCase):
+    def test_segments_match_single_pass(self):
+        expected = analyze(ContentAnalyzer, 0, TOTAL_FRAMES).result()
+        merged = analyze_in_segments(ContentAnalyzer, [0, 13, 27, TOTAL_FRAMES]).result()
+        for key in ('frames_analyzed', 'brightness_range', 'analysis_resolution', 'brightness_histogram'):
+            self.assertEqual(merged[key], expected[key], key)
+        self.assertAlmostEqual(merged['average_brightness'], expected['average_brightness'])
+        self.assertAlmostEqual(merged['brightness_std'], expected['brightness_std'])
+
+
+class MergePassReportsTest(unittest.TestCase):
+    def test_sums_segments(self):
+        analyzers = lambda frames, seconds: {'detect_motion': {'frames': frames, 'repeated_frames': 0, 'seconds': seconds, 'cpu_seconds': seconds}}
+        merged = merge_pass_reports([
+            _pass_report(10, 10, 5, 1.0, 0.1, 0.4, analyzers(5, 1.0)),
+            _pass_report(30, 30, 5, 2.0, 0.2, 0.3, analyzers(25, 2.0))
+        ])
+        self.assertEqual(merged['frames_decoded'], 40)
+        self.assertEqual(merged['duplicate_frames'], 10)
+        # The ratio is recomputed over the whole video, not averaged per segment
+        self.assertEqual(merged['dedup_ratio'], 0.25)
+        self.assertAlmostEqual(merged['estimated_seconds_saved'], 0.7)
+        self.assertEqual(merged['analyzers']['detect_motion']['frames'], 30)
+        self.assertAlmostEqual(merged['analyzers']['detect_motion']['seconds'], 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
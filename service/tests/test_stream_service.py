@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services import stream_service
+from app.services.stream_service import HotSegmentCache, RangeNotSatisfiable, parse_range
+
+DATA = bytes(range(256)) * 10
+
+
+class ParseRangeTest(unittest.TestCase):
+    def test_no_header(self):
+        self.assertIsNone(parse_range(None, 100))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range("bytes=10-19", 100), (10, 19))
+
+    def test_open_range(self):
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+
+    def test_end_clamped_to_size(self):
+        self.assertEqual(parse_range("bytes=90-500", 100), (90, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+
+    def test_suffix_longer_than_object(self):
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+
+    def test_whole_object_sent_for_unsupported_ranges(self):
+        for header in ("items=0-10", "bytes=0-1,5-6", "bytes=abc-"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 100))
+
+    def test_unsatisfiable(self):
+        # The route answers these with 416 and Content-Range: bytes */size
+        for header in ("bytes=100-", "bytes=200-300", "bytes=20-10", "bytes=-0"):
+            with self.subTest(header=header):
+                with self.assertRaises(RangeNotSatisfiable):
+                    parse_range(header, 100)
+
+
+class HotSegmentCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = HotSegmentCache(max_bytes=1024, block_bytes=100)
+        self.requests = []
+        self.release = asyncio.Event()
+        self.release.set()
+        patcher = mock.patch.object(stream_service.gcs_service, "download_range", self.download_range, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def download_range(self, filename: str, start: int, end: int, generation=None) -> bytes:
+        self.requests.append((start, end))
+        await self.release.wait()
+        return DATA[start:end + 1]
+
+    async def read(self, start: int, end: int) -> bytes:
+        chunks = [chunk async for chunk in self.cache.iter_range("video.mp4", 1, len(DATA), start, end)]
+        return b"".join(chunks)
+
+    async def test_range_across_blocks(self):
+        self.assertEqual(await self.read(150, 420), DATA[150:421])
+        self.assertEqual(self.requests, [(100, 199), (200, 299), (300, 399), (400, 499)])
+
+    async def test_repeated_range_served_from_cache(self):
+        await self.read(0, 250)
+        self.requests.clear()
+        self.assertEqual(await self.read(50, 150), DATA[50:151])
+        self.assertEqual(self.requests, [])
+
+    async def test_cancelled_reader_leaves_shared_fetch_running(self):
+        self.release.clear()
+        first = asyncio.create_task(self.cache.read_block("video.mp4", 1, 0, len(DATA)))
+        second = asyncio.create_task(self.cache.read_block("video.mp4", 1, 0, len(DATA)))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await second, DATA[:100])
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_fetch_cancelled_with_its_last_reader(self):
+        self.release.clear()
+        reader = asyncio.create_task(self.cache.read_block("video.mp4", 1, 0, len(DATA)))
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.release.set()
+        # Nothing was cached, so the next read starts a new fetch
+        self.assertEqual(await self.cache.read_block("video.mp4", 1, 0, len(DATA)), DATA[:100])
+        self.assertEqual(len(self.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
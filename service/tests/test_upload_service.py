@@ -0,0 +1,146 @@
+import unittest
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.data.schemas.uploads import UploadSession
+from app.repositories.uploads_repository import start_composing_upload_session
+from app.services.gcs_service import COMPOSE_MAX_SOURCES
+from app.services.upload_service import (
+    UPLOAD_COMPOSE_TIMEOUT,
+    UPLOAD_MAX_CHUNK_BYTES,
+    UPLOAD_MAX_CHUNKS,
+    UPLOAD_MIN_CHUNK_BYTES,
+    chunk_filename,
+    chunk_layout,
+    compose_upload,
+    expected_chunk_size,
+    is_compose_abandoned,
+)
+
+MB = 1024 ** 2
+
+
+def upload_session(file_size: int, chunk_size: int, **fields) -> UploadSession:
+    _, chunk_count = chunk_layout(file_size, chunk_size)
+    return UploadSession(
+        id="upload", filename="recordings/video.mp4", fileSize=file_size,
+        chunkSize=chunk_size, chunkCount=chunk_count, **fields
+    )
+
+
+class ChunkLayoutTest(unittest.TestCase):
+    def test_requested_size_rounds_up_to_minimum_multiple(self):
+        self.assertEqual(chunk_layout(10 * MB, 300 * 1024), (512 * 1024, 20))
+
+    def test_small_request_clamped_to_minimum(self):
+        self.assertEqual(chunk_layout(MB, 1), (UPLOAD_MIN_CHUNK_BYTES, 4))
+
+    def test_large_file_grows_chunks_to_stay_under_max_chunks(self):
+        chunk_size, chunk_count = chunk_layout(20 * 1024 * MB, MB)
+        self.assertEqual(chunk_size, 20 * MB)
+        self.assertLessEqual(chunk_count, UPLOAD_MAX_CHUNKS)
+
+    def test_requested_size_clamped_to_maximum(self):
+        self.assertEqual(chunk_layout(100 * MB, 1024 * MB), (UPLOAD_MAX_CHUNK_BYTES, 2))
+
+    def test_file_beyond_limit_rejected(self):
+        with self.assertRaises(ValueError):
+            chunk_layout(UPLOAD_MAX_CHUNK_BYTES * UPLOAD_MAX_CHUNKS + 1)
+
+    def test_empty_file_rejected(self):
+        with self.assertRaises(ValueError):
+            chunk_layout(0)
+
+    def test_last_chunk_holds_the_remainder(self):
+        upload = upload_session(10 * MB + 5, 4 * MB)
+        self.assertEqual(upload.chunkCount, 3)
+        self.assertEqual(expected_chunk_size(upload, 0), 4 * MB)
+        self.assertEqual(expected_chunk_size(upload, 2), 2 * MB + 5)
+
+
+class FakeStorage:
+    def __init__(self, objects: Dict[str, bytes]):
+        self.objects = objects
+        self.composed: List[List[str]] = []
+
+    async def compose_files(self, sources: List[str], filename: str, content_type: Optional[str] = None) -> None:
+        assert len(sources) <= COMPOSE_MAX_SOURCES, len(sources)
+        self.composed.append(sources)
+        self.objects[filename] = b"".join(self.objects[source] for source in sources)
+
+
+class ComposeUploadTest(unittest.IsolatedAsyncioTestCase):
+    async def compose(self, chunk_count: int) -> FakeStorage:
+        upload = upload_session(chunk_count * UPLOAD_MIN_CHUNK_BYTES, UPLOAD_MIN_CHUNK_BYTES)
+        storage = FakeStorage({
+            chunk_filename(upload.id, index): index.to_bytes(2, "big") for index in range(chunk_count)
+        })
+        await compose_upload(storage, upload)
+        expected = b"".join(index.to_bytes(2, "big") for index in range(chunk_count))
+        self.assertEqual(storage.objects[upload.filename], expected)
+        return storage
+
+    async def test_single_level(self):
+        storage = await self.compose(COMPOSE_MAX_SOURCES)
+        self.assertEqual(len(storage.composed), 1)
+
+    async def test_two_levels_keep_chunk_order(self):
+        storage = await self.compose(COMPOSE_MAX_SOURCES + 1)
+        # Two groups, then the final compose of both
+        self.assertEqual(len(storage.composed), 3)
+
+    async def test_max_chunks(self):
+        storage = await self.compose(UPLOAD_MAX_CHUNKS)
+        self.assertEqual(len(storage.composed), UPLOAD_MAX_CHUNKS // COMPOSE_MAX_SOURCES + 1)
+
+
+class StaleComposeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(UploadSession.__table__.create)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def add(self, upload: UploadSession) -> None:
+        async with self.sessionmaker() as session:
+            session.add(upload)
+            await session.commit()
+
+    async def start_composing(self) -> bool:
+        stale_before = datetime.now() - UPLOAD_COMPOSE_TIMEOUT
+        async with self.sessionmaker() as session:
+            return await start_composing_upload_session(session, "upload", stale_before)
+
+    async def test_pending_session_starts_once(self):
+        await self.add(upload_session(MB, MB, status="pending"))
+        self.assertTrue(await self.start_composing())
+        self.assertFalse(await self.start_composing())
+
+    async def test_abandoned_session_taken_over(self):
+        since = datetime.now() - UPLOAD_COMPOSE_TIMEOUT - timedelta(minutes=1)
+        upload = upload_session(MB, MB, status="composing", composingSince=since)
+        self.assertTrue(is_compose_abandoned(upload))
+        await self.add(upload)
+        self.assertTrue(await self.start_composing())
+        # The takeover restarts the clock, so nobody else takes it over
+        self.assertFalse(await self.start_composing())
+
+    async def test_recent_session_left_alone(self):
+        upload = upload_session(MB, MB, status="composing", composingSince=datetime.now())
+        self.assertFalse(is_compose_abandoned(upload))
+        await self.add(upload)
+        self.assertFalse(await self.start_composing())
+
+    async def test_completed_session_never_taken_over(self):
+        since = datetime.now() - UPLOAD_COMPOSE_TIMEOUT - timedelta(minutes=1)
+        await self.add(upload_session(MB, MB, status="completed", composingSince=since))
+        self.assertFalse(await self.start_composing())
+
+
+if __name__ == "__main__":
+    unittest.main()